@@ -0,0 +1,292 @@
+"""
+Per-turn accounting of LLM tokens, cost, latency, tool calls and DB queries.
+
+Each agent turn (one process_message call) gets a TurnRecord held in a
+context variable, so everything the turn does — including work in asyncio
+tasks and worker threads, which copy the context — is charged to it:
+
+- LLM calls, tokens and latency come from AccountingCallbackHandler, which
+  llm_clients.py attaches to every shared chat model
+- tool calls are recorded by tools.invoke_structured
+- DB queries are recorded by EcommerceDB.execute_query/execute_update
+
+Agents keep a SessionAccounting with their recent turns and running totals.
+Phase durations are summed per call, so overlapping calls (concurrent tools,
+speculative LLM calls) can add up to more than the turn's wall time.
+"""
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import functools
+import threading
+import time
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from tool_results import dumps
+
+# USD per million (input, output) tokens, matched by model-name prefix (longest first)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Number of turns kept per session for export
+MAX_TURNS_PER_SESSION = 500
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost in USD of one LLM call (0 for models without a known price)."""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            input_price, output_price = MODEL_PRICES[prefix]
+            return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+class TurnRecord:
+    """What one agent turn consumed."""
+
+    def __init__(self, message: str = ""):
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.message = message
+        self.path: Optional[str] = None  # cache, fast_path, llm or confirmation
+        self.wall_seconds: Optional[float] = None
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+    def record_llm(self, model: str, prompt_tokens: int, completion_tokens: int, seconds: float, error: bool = False):
+        with self._lock:
+            self.llm_calls.append({
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "seconds": round(seconds, 4),
+                "cost_usd": llm_cost(model, prompt_tokens, completion_tokens),
+                "error": error
+            })
+
+    def record_tool(self, name: str, seconds: float, success: bool):
+        with self._lock:
+            self.tool_calls.append({"name": name, "seconds": round(seconds, 4), "success": success})
+
+    def record_query(self, seconds: float):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def finish(self):
+        self.wall_seconds = time.monotonic() - self._start
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        """Seconds spent per phase (LLM, tools, DB) and the turn's wall time."""
+        wall = self.wall_seconds if self.wall_seconds is not None else time.monotonic() - self._start
+        return {
+            "total": round(wall, 4),
+            "llm": round(sum(c["seconds"] for c in self.llm_calls), 4),
+            "tools": round(sum(c["seconds"] for c in self.tool_calls), 4),
+            "db": round(self.db_seconds, 4)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "message": self.message,
+                "path": self.path,
+                "phases": self.phases,
+                "llm_calls": len(self.llm_calls),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in self.llm_calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in self.llm_calls),
+                "cost_usd": round(sum(c["cost_usd"] for c in self.llm_calls), 6),
+                "tool_calls": len(self.tool_calls),
+                "db_queries": self.db_queries,
+                "llm": list(self.llm_calls),
+                "tools": list(self.tool_calls)
+            }
+
+
+def server_timing(turn: Dict[str, Any]) -> str:
+    """A turn's phases as a Server-Timing header value (milliseconds)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in turn["phases"].items())
+
+
+_current_turn: ContextVar[Optional[TurnRecord]] = ContextVar("current_turn", default=None)
+
+
+def current_turn() -> Optional[TurnRecord]:
+    """The record of the turn being processed, if any."""
+    return _current_turn.get()
+
+
+def set_path(path: str):
+    """Label how the current turn was answered."""
+    record = _current_turn.get()
+    if record is not None and record.path is None:
+        record.path = path
+
+
+def record_tool(name: str, seconds: float, success: bool):
+    record = _current_turn.get()
+    if record is not None:
+        record.record_tool(name, seconds, success)
+
+
+def record_query(seconds: float):
+    record = _current_turn.get()
+    if record is not None:
+        record.record_query(seconds)
+
+
+class SessionAccounting:
+    """Recent turn records and running totals for one conversation."""
+
+    def __init__(self, max_turns: int = MAX_TURNS_PER_SESSION):
+        self._lock = threading.Lock()
+        self.turns = deque(maxlen=max_turns)
+        self._turn_bytes = deque(maxlen=max_turns)  # Serialized size of each kept turn
+        self.state_bytes = 0
+        self.totals = self._empty_totals()
+
+    @staticmethod
+    def _empty_totals() -> Dict[str, Any]:
+        return {
+            "turns": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "cost_usd": 0.0, "tool_calls": 0, "db_queries": 0, "wall_seconds": 0.0
+        }
+
+    def add(self, record: TurnRecord):
+        data = record.to_dict()
+        size = len(dumps(data))
+        with self._lock:
+            if len(self._turn_bytes) == self._turn_bytes.maxlen:
+                self.state_bytes -= self._turn_bytes[0]
+            self.turns.append(data)
+            self._turn_bytes.append(size)
+            self.state_bytes += size
+            self.totals["turns"] += 1
+            for key in ("llm_calls", "prompt_tokens", "completion_tokens", "cost_usd", "tool_calls", "db_queries"):
+                self.totals[key] += data[key]
+            self.totals["wall_seconds"] += data["phases"]["total"]
+
+    @property
+    def last_turn(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.turns[-1] if self.turns else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Running totals plus averages per turn."""
+        with self._lock:
+            totals = dict(self.totals)
+        turns = totals["turns"]
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        totals["wall_seconds"] = round(totals["wall_seconds"], 4)
+        totals["avg_wall_seconds"] = round(totals["wall_seconds"] / turns, 4) if turns else None
+        totals["avg_cost_usd"] = round(totals["cost_usd"] / turns, 6) if turns else None
+        return totals
+
+    def export(self) -> List[Dict[str, Any]]:
+        """The recorded turns, oldest first."""
+        with self._lock:
+            return list(self.turns)
+
+    def export_jsonl(self) -> str:
+        """The recorded turns as JSON lines."""
+        return "".join(dumps(turn) + "\n" for turn in self.export())
+
+    def export_state(self) -> Dict[str, Any]:
+        """Turn records and totals as plain data (see load_state)."""
+        with self._lock:
+            return {"turns": list(self.turns), "totals": dict(self.totals)}
+
+    def load_state(self, state: Dict[str, Any]):
+        """Restore what export_state returned."""
+        with self._lock:
+            self.turns.clear()
+            self.turns.extend(state["turns"])
+            self._turn_bytes.clear()
+            self._turn_bytes.extend(len(dumps(turn)) for turn in self.turns)
+            self.state_bytes = sum(self._turn_bytes)
+            self.totals = dict(state["totals"])
+
+    def reset(self):
+        with self._lock:
+            self.turns.clear()
+            self._turn_bytes.clear()
+            self.state_bytes = 0
+            self.totals = self._empty_totals()
+
+
+def accounted_turn(method):
+    """Decorate an agent's process_message to record the turn in self.accounting."""
+    @functools.wraps(method)
+    async def wrapper(self, user_message: str, *args, **kwargs):
+        record = TurnRecord(user_message)
+        token = _current_turn.set(record)
+        try:
+            return await method(self, user_message, *args, **kwargs)
+        finally:
+            record.finish()
+            _current_turn.reset(token)
+            self.accounting.add(record)
+    return wrapper
+
+
+class AccountingCallbackHandler(BaseCallbackHandler):
+    """Charges every chat model call's tokens and latency to the current turn."""
+
+    # Run in the caller's context so the current turn is visible
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.monotonic()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.monotonic()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        seconds = time.monotonic() - self._starts.pop(run_id, time.monotonic())
+        record = _current_turn.get()
+        if record is None:
+            return
+
+        llm_output = response.llm_output or {}
+        prompt_tokens = completion_tokens = 0
+        model = llm_output.get("model_name") or ""
+
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) if message is not None else None
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+                if message is not None and not model:
+                    model = message.response_metadata.get("model_name", "")
+
+        # Older providers only report usage in llm_output
+        if not prompt_tokens and not completion_tokens:
+            usage = llm_output.get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+
+        record.record_llm(model, prompt_tokens, completion_tokens, seconds)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        seconds = time.monotonic() - self._starts.pop(run_id, time.monotonic())
+        record = _current_turn.get()
+        if record is not None:
+            record.record_llm("", 0, 0, seconds, error=True)
+
+
+# Shared handler attached to every chat model in llm_clients.py
+accounting_handler = AccountingCallbackHandler()
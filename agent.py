@@ -2,16 +2,30 @@
 LangGraph-based conversational agent for e-commerce customer support.
 Handles intent detection, state management, and CRUD operations with confirmation.
 """
-from typing import TypedDict, Annotated, Literal, Optional
+from typing import Any, AsyncIterator, Dict, TypedDict, Annotated, Literal, Optional
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+import asyncio
 import json
 import os
-
-from tools import ALL_TOOLS
+import re
+
+from llm_clients import get_llm, get_llm_with_tools, prebuild_tool_variants, tool_schema_tokens
+from tools import (
+    ALL_TOOLS, READ_TOOL_NAMES, DESTRUCTIVE_TOOL_NAMES, TOOLS_BY_INTENT, tools_for_turn,
+    ainvoke_structured, ainvoke_structured_batch, canonicalize_tool_args
+)
+from result_shaping import shape_for_llm
+from formatting import format_confirmation, render_tool_result
+from fast_path import route_message
+from response_cache import response_cache, is_cacheable_message
+from history import ConversationHistory
+from intent_classifier import intent_classifier, INTENT_MIN_CONFIDENCE
+from speculation import Speculation
+from accounting import SessionAccounting, accounted_turn, set_path
+from call_policy import TRANSIENT_ERRORS, get_policy
+from streaming import Emit, stream_turn
 
 
 # ==================== STATE DEFINITION ====================
@@ -72,8 +86,15 @@ async def detect_intent(state: AgentState) -> str:
         else:
             return "CONFIRMATION_UNCLEAR"
 
+    # Use the local classifier when it is confident enough
+    prediction = intent_classifier.predict(state["messages"][-1].content)
+    if prediction.confidence >= INTENT_MIN_CONFIDENCE:
+        intent_classifier.record(used_local=True)
+        return prediction.intent
+    intent_classifier.record(used_local=False)
+
     # Otherwise, use LLM to detect intent
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_llm("gpt-4o-mini")
 
     # Get recent conversation context (last 3 messages)
     recent_messages = state["messages"][-3:] if len(state["messages"]) > 3 else state["messages"]
@@ -92,7 +113,11 @@ USER'S LATEST MESSAGE:
 
 INTENT:"""
 
-    response = await llm.ainvoke([HumanMessage(content=prompt)])
+    try:
+        response = await get_policy("intent").run(lambda: llm.ainvoke([HumanMessage(content=prompt)]))
+    except TRANSIENT_ERRORS:
+        # Out of time or retries: go with the local classifier's best guess
+        return prediction.intent
     intent = response.content.strip().upper()
 
     # Validate intent
@@ -107,8 +132,27 @@ INTENT:"""
 
 async def intent_detection_node(state: AgentState) -> AgentState:
     """Node that detects user intent."""
-    intent = await detect_intent(state)
+    context = state["conversation_context"]
+
+    # When intent detection will need the LLM, start the agent call under the
+    # local classifier's best guess in parallel (kept only if the guess holds)
+    speculation = None
+    if context.get("speculative") and not state.get("awaiting_confirmation"):
+        guess = intent_classifier.predict(state["messages"][-1].content)
+        if guess.confidence < INTENT_MIN_CONFIDENCE:
+            speculation = Speculation(guess.intent, call_agent_llm(state, guess.intent, record=False))
+
+    try:
+        intent = await detect_intent(state)
+    except BaseException:
+        if speculation is not None:
+            speculation.cancel()
+        raise
     state["detected_intent"] = intent
+
+    if speculation is not None and speculation.confirm(intent):
+        context["speculation"] = speculation
+
     return state
 
 
@@ -117,25 +161,15 @@ async def handle_confirmation_node(state: AgentState) -> AgentState:
     intent = state["detected_intent"]
 
     if intent == "CONFIRMATION_YES":
-        # User confirmed - execute the pending action
+        # User confirmed - execute the pending actions in order
         pending = state.get("pending_action")
         if pending:
-            # Execute the tool
-            tool_node = ToolNode(ALL_TOOLS)
+            state["conversation_context"]["turn_used_tools"] = True
+            for action in pending["actions"]:
+                result = await ainvoke_structured(action["tool_name"], action["tool_args"])
 
-            # Create a tool call message
-            tool_call_id = "confirm_action"
-            tool_message = ToolMessage(
-                content=pending["params"],
-                tool_call_id=tool_call_id,
-                name=pending["tool_name"]
-            )
-
-            # Execute the tool
-            result = pending["tool"](**pending["params"])
-
-            # Add result to messages
-            state["messages"].append(AIMessage(content=f"Action executed. Result: {result}"))
+                # Add result to messages
+                state["messages"].append(AIMessage(content=f"Action executed. Result: {result.to_json()}"))
 
         state["awaiting_confirmation"] = False
         state["pending_action"] = None
@@ -153,12 +187,7 @@ async def handle_confirmation_node(state: AgentState) -> AgentState:
     return state
 
 
-async def agent_node(state: AgentState) -> AgentState:
-    """Main agent reasoning node with tool calling."""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
-    llm_with_tools = llm.bind_tools(ALL_TOOLS)
-
-    system_message = SystemMessage(content="""You are a helpful e-commerce customer support agent. You assist customers with:
+AGENT_SYSTEM_PROMPT = """You are a helpful e-commerce customer support agent. You assist customers with:
 - Searching for orders and products (READ operations)
 - Creating new orders (CREATE operations - ALWAYS ask for confirmation first)
 - Updating order status, prices, stock (UPDATE operations - ALWAYS ask for confirmation first)
@@ -172,48 +201,107 @@ IMPORTANT RULES:
 5. Provide clear, structured information when displaying results
 6. Handle errors gracefully and suggest alternatives
 
-Current Intent: {intent}""")
+Current Intent: {intent}"""
+
+
+def latest_question(state: AgentState) -> str:
+    """The latest user message."""
+    return next((m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
+
+
+def build_agent_prompt(state: AgentState, intent: str) -> tuple:
+    """Return (prompt messages, bound tools) for the agent LLM under the given intent."""
+    # Only the tools relevant to the intent are bound, to keep the prompt small
+    context = state["conversation_context"]
+    tools = tools_for_turn(intent, latest_question(state), context.get("previous_turn_used_tools", False))
 
+    # Build prompt with system message and the summary of older turns
+    system_message = SystemMessage(content=AGENT_SYSTEM_PROMPT.format(intent=intent))
+    history = context.get("history")
+    if history is not None:
+        return history.build_prompt(system_message, state["messages"]), tools
+    return [system_message] + state["messages"], tools
+
+
+def record_agent_prompt(state: AgentState, prompt_messages: list, tools: list):
+    """Record the size of an agent prompt whose response is used."""
+    history = state["conversation_context"].get("history")
+    if history is not None:
+        tool_tokens = tool_schema_tokens(tools)
+        history.record_prompt(prompt_messages, tool_tokens, tool_schema_tokens(ALL_TOOLS) - tool_tokens)
+
+
+async def call_agent_llm(state: AgentState, intent: str, record: bool = True):
+    """
+    Call the agent LLM for the current messages under the given intent.
+
+    Speculative calls pass record=False; their prompt is recorded only once
+    the speculation is accepted, so a miss isn't counted twice.
+    """
+    prompt_messages, tools = build_agent_prompt(state, intent)
+    if record:
+        record_agent_prompt(state, prompt_messages, tools)
+    llm_with_tools = get_llm_with_tools(tools, "gpt-4o")
+
+    # A hedged duplicate would interleave its tokens into a streamed reply
+    policy = get_policy("agent")
+    streaming = state["conversation_context"].get("emit") is not None
+    return await policy.run(lambda: llm_with_tools.ainvoke(prompt_messages), hedge=policy.hedge and not streaming)
+
+
+async def agent_node(state: AgentState) -> AgentState:
+    """Main agent reasoning node with tool calling."""
     intent = state.get("detected_intent", "GENERAL")
 
-    # Build prompt with system message
-    prompt_messages = [
-        SystemMessage(content=system_message.content.format(intent=intent))
-    ] + state["messages"]
+    # Use the call started during intent detection if its assumed intent held
+    speculation = state["conversation_context"].pop("speculation", None)
+    if speculation is not None and speculation.assumption == intent:
+        response = await speculation.result()
+        record_agent_prompt(state, *build_agent_prompt(state, intent))
 
-    # Call LLM
-    response = await llm_with_tools.ainvoke(prompt_messages)
+        # Its tokens streamed under intent detection, where they aren't shown
+        emit = state["conversation_context"].get("emit")
+        if emit is not None and response.content:
+            emit("token", response.content)
+    else:
+        if speculation is not None:
+            speculation.cancel()
+        response = await call_agent_llm(state, intent)
 
     # Check if there are tool calls
     if response.tool_calls:
-        tool_call = response.tool_calls[0]
-        tool_name = tool_call["name"]
-
-        # Determine if this is a destructive operation
-        destructive_tools = [
-            "create_order", "add_product",
-            "update_order_status", "update_product_price", "update_product_stock",
-            "cancel_order", "delete_product"
-        ]
-
-        if tool_name in destructive_tools and not state.get("awaiting_confirmation"):
-            # Ask for confirmation
-            state["pending_action"] = {
-                "tool_name": tool_name,
-                "tool": [t for t in ALL_TOOLS if t.name == tool_name][0],
-                "params": tool_call["args"]
-            }
+        read_calls = [c for c in response.tool_calls if c["name"] not in DESTRUCTIVE_TOOL_NAMES]
+        destructive_calls = [c for c in response.tool_calls if c["name"] in DESTRUCTIVE_TOOL_NAMES]
+
+        # Determine if any call is a destructive operation
+        if destructive_calls and not state.get("awaiting_confirmation"):
+            replies = []
+            history = []
+
+            # Read calls from the same response still run now, concurrently
+            if read_calls:
+                results = await ainvoke_structured_batch(read_calls)
+                state["conversation_context"]["turn_used_tools"] = True
+                for result in results:
+                    display, stored = render_tool_result(result)
+                    replies.append(display)
+                    history.append(stored)
+
+            # Ask for a single confirmation covering every destructive call. Resolving
+            # product names and previewing bulk rows query SQLite, so both run off the loop.
+            actions = await asyncio.to_thread(lambda: [
+                {"tool_name": c["name"], "tool_args": canonicalize_tool_args(c["name"], c["args"])}
+                for c in destructive_calls
+            ])
+            state["pending_action"] = {"actions": actions}
             state["awaiting_confirmation"] = True
+            confirmation_msg = await asyncio.to_thread(format_confirmation, actions)
+            replies.append(confirmation_msg)
+            history.append(confirmation_msg)
 
-            # Generate confirmation message
-            confirmation_msg = f"""I'm about to perform the following action:
-
-**Action**: {tool_name.replace('_', ' ').title()}
-**Details**: {json.dumps(tool_call['args'], indent=2)}
-
-This action will modify your data. Would you like me to proceed? (Please confirm with 'yes' or 'no')"""
-
-            state["messages"].append(AIMessage(content=confirmation_msg))
+            # The reply shows full results; history keeps them within the LLM budget
+            state["messages"].append(AIMessage(content="\n".join(history)))
+            state["conversation_context"]["display"] = "\n".join(replies)
 
         else:
             # Execute read operations immediately
@@ -226,10 +314,25 @@ This action will modify your data. Would you like me to proceed? (Please confirm
 
 
 async def tool_node(state: AgentState) -> AgentState:
-    """Execute tools that have been called."""
-    tool_executor = ToolNode(ALL_TOOLS)
-    result = await tool_executor.ainvoke(state)
-    return result
+    """Execute every tool call of the last AI message concurrently."""
+    tool_calls = state["messages"][-1].tool_calls
+    results = await ainvoke_structured_batch(tool_calls)
+    state["conversation_context"]["turn_used_tools"] = True
+
+    for tool_call, result in zip(tool_calls, results):
+        state["messages"].append(ToolMessage(
+            content=shape_for_llm(result).to_json(),
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"]
+        ))
+
+    # Render the results locally unless the question needs the LLM to reason over them
+    if state["conversation_context"].get("format_read_results") and not needs_reasoning(state):
+        displays, stored = zip(*(render_tool_result(r) for r in results))
+        state["messages"].append(AIMessage(content="\n".join(stored)))
+        state["conversation_context"]["display"] = "\n".join(displays)
+
+    return state
 
 
 # ==================== ROUTING LOGIC ====================
@@ -252,20 +355,35 @@ def route_after_agent(state: AgentState) -> Literal["tools", "end"]:
     if state.get("awaiting_confirmation"):
         return "end"
 
-    # If the last message has tool calls and it's a read operation, execute
+    # If the last message has tool calls and they are all read operations, execute
     if isinstance(last_message, AIMessage) and hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-        tool_name = last_message.tool_calls[0]["name"]
-        read_tools = ["search_orders", "search_products", "get_order_details"]
-
-        if tool_name in read_tools:
+        if all(call["name"] in READ_TOOL_NAMES for call in last_message.tool_calls):
             return "tools"
 
     return "end"
 
 
+# Questions that ask for more than the rows themselves
+REASONING_PATTERN = re.compile(
+    r"\b(why|how many|how much|compare|comparison|versus|vs|difference|better|best|worst|"
+    r"cheapest|most|least|recommend|suggest|should|total|sum|average|explain|summar\w*|"
+    r"than|between|enough|which one|any of)\b"
+)
+
+
+def needs_reasoning(state: AgentState) -> bool:
+    """Whether the latest user question needs the LLM to reason over tool results."""
+    return bool(REASONING_PATTERN.search(latest_question(state).lower()))
+
+
 def route_after_tools(state: AgentState) -> Literal["agent", "end"]:
     """Route after tool execution."""
-    # After tools execute, go back to agent to generate response
+    # Results already rendered by the formatter end the turn
+    last_message = state["messages"][-1]
+    if isinstance(last_message, AIMessage) and not last_message.tool_calls:
+        return "end"
+
+    # Otherwise go back to agent to generate response
     return "agent"
 
 
@@ -321,38 +439,122 @@ def create_agent_graph():
 class EcommerceAgent:
     """High-level interface for the e-commerce support agent."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        use_fast_path: bool = True,
+        use_response_cache: bool = True,
+        speculative: bool = True,
+        format_read_results: bool = True
+    ):
         self.graph = create_agent_graph()
-        self.state = {
-            "messages": [],
-            "detected_intent": None,
-            "pending_action": None,
-            "awaiting_confirmation": False,
-            "conversation_context": {}
-        }
-
-    async def process_message(self, user_message: str) -> str:
-        """Process a user message and return the agent's response."""
+        prebuild_tool_variants(list(TOOLS_BY_INTENT.values()) + [ALL_TOOLS], "gpt-4o")
+        self.use_fast_path = use_fast_path
+        self.use_response_cache = use_response_cache
+        self.speculative = speculative
+        self.format_read_results = format_read_results
+        self.history = ConversationHistory()
+        self.accounting = SessionAccounting()
+        self.reset()
+
+    @accounted_turn
+    async def process_message(self, user_message: str, emit: Optional[Emit] = None) -> str:
+        """
+        Process a user message and return the agent's response.
+
+        When `emit` is given, the agent node's LLM tokens are passed to it as
+        they arrive (see streaming.py).
+        """
         # Add user message to state
         self.state["messages"].append(HumanMessage(content=user_message))
+        context = self.state["conversation_context"]
+        context["previous_turn_used_tools"] = context.get("turn_used_tools", False)
+        context["turn_used_tools"] = False
+        context.pop("display", None)
+
+        # Keep the history within its token budget (and the confirmation turn, if any)
+        awaiting = self.state.get("awaiting_confirmation")
+        self.history.compact(self.state["messages"], keep_turns=2 if awaiting else 1)
+
+        # Serve self-contained read questions from the shared response cache
+        cache_key = None
+        if self.use_response_cache and not self.state.get("awaiting_confirmation") and is_cacheable_message(user_message):
+            cache_key = response_cache.make_key(user_message)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                set_path("cache")
+                reply, stored = cached
+                self.state["messages"].append(AIMessage(content=stored))
+                context["turn_used_tools"] = True
+                return reply
+
+        # Answer simple read requests directly, skipping intent detection and the agent LLM
+        # (the rules query SQLite, so they run in a worker thread, off the event loop)
+        if self.use_fast_path and not self.state.get("awaiting_confirmation"):
+            match = await asyncio.to_thread(route_message, user_message)
+            if match:
+                set_path("fast_path")
+                result = await ainvoke_structured(match.tool_name, match.tool_args)
+                context["turn_used_tools"] = True
+                reply, stored = render_tool_result(result)
+                self.state["messages"].append(AIMessage(content=stored))
+                if cache_key is not None:
+                    response_cache.put(cache_key, (reply, stored))
+                return reply
+
+        set_path("confirmation" if self.state.get("awaiting_confirmation") else "llm")
+        turn_start = len(self.state["messages"])
 
         # Run the graph
-        result = await self.graph.ainvoke(self.state)
+        context["emit"] = emit
+        if emit is None:
+            result = await self.graph.ainvoke(self.state)
+        else:
+            result = await self._astream_graph(emit)
 
         # Update state
         self.state = result
 
-        # Get last AI message
+        # Get last AI message, and the full results it stands for if they were rendered locally
         last_message = [msg for msg in result["messages"] if isinstance(msg, AIMessage)][-1]
+        reply = result["conversation_context"].pop("display", last_message.content)
 
-        return last_message.content
+        # Cache turns that only ran read tools and left nothing to confirm
+        ran_tools = any(isinstance(msg, ToolMessage) for msg in result["messages"][turn_start:])
+        if cache_key is not None and ran_tools and not result.get("awaiting_confirmation"):
+            response_cache.put(cache_key, (reply, last_message.content))
+
+        return reply
+
+    async def _astream_graph(self, emit: Emit) -> dict:
+        """Run the graph, passing the agent node's LLM tokens to emit."""
+        result = self.state
+        async for mode, payload in self.graph.astream(self.state, stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = payload
+                continue
+
+            chunk, metadata = payload
+            # Intent detection also calls an LLM; only the agent's answer is shown
+            if metadata.get("langgraph_node") == "agent" and isinstance(chunk, AIMessageChunk) and chunk.content:
+                emit("token", chunk.content)
+
+        return result
+
+    def stream_message(self, user_message: str) -> AsyncIterator[Dict[str, Any]]:
+        """Process a user message, yielding streamed events and finally the response."""
+        return stream_turn(lambda emit: self.process_message(user_message, emit))
 
     def reset(self):
         """Reset conversation state."""
+        self.history.reset()
         self.state = {
             "messages": [],
             "detected_intent": None,
             "pending_action": None,
             "awaiting_confirmation": False,
-            "conversation_context": {}
+            "conversation_context": {
+                "history": self.history,
+                "speculative": self.speculative,
+                "format_read_results": self.format_read_results
+            }
         }
\ No newline at end of file
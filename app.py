@@ -2,13 +2,22 @@
 Flask Web Application for E-Commerce AI Customer Support.
 Modern, responsive chat interface with real-time AI responses.
 """
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 from flask_cors import CORS
-import asyncio
 import os
 import secrets
 from datetime import datetime
 from simple_agent import SimpleEcommerceAgent
+from llm_clients import client_stats, requires_api_key
+from response_cache import response_cache
+from streaming import sse_event
+from intent_classifier import intent_classifier
+from speculation import speculation_stats
+from accounting import server_timing
+from call_policy import policy_stats
+from event_loop import background_loop
+from session_dispatch import SessionBusy, session_dispatcher
+from session_store import SessionStore
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -19,22 +28,65 @@ app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
 CORS(app)
 
-# Store agent instances per session
-agents = {}
+# Agent instances per session; idle ones are spilled to disk.
+# Agents are only looked up inside a session's turn, so one in use is never evicted.
+agents = SessionStore(SimpleEcommerceAgent, is_busy=session_dispatcher.is_active)
+agents.start_sweeper(background_loop.run)
 
 
-def get_agent():
-    """Get or create agent for current session."""
+def get_session_id():
+    """Get or create the id of the current session."""
     session_id = session.get('session_id')
 
     if not session_id:
         session_id = secrets.token_hex(8)
         session['session_id'] = session_id
 
-    if session_id not in agents:
-        agents[session_id] = SimpleEcommerceAgent()
+    return session_id
 
-    return agents[session_id]
+
+def get_chat_message():
+    """The request's chat message, or None when the body isn't a JSON object with a string message."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('message', ''), str):
+        return None
+    return data.get('message', '').strip()
+
+
+async def run_turn(session_id, user_message):
+    """One chat turn, with the stats read before the session's next turn can start."""
+    agent = await agents.get(session_id)
+    response = await agent.process_message(user_message)
+    return response, agent.history.stats(), agent.accounting.last_turn
+
+
+async def stream_turn(session_id, user_message):
+    """One streamed chat turn; the done event gets the turn's stats."""
+    agent = await agents.get(session_id)
+    events = agent.stream_message(user_message)
+    try:
+        async for event in events:
+            if event['type'] == 'done':
+                event['history'] = agent.history.stats()
+                event['accounting'] = agent.accounting.last_turn
+            yield event
+    finally:
+        await events.aclose()
+
+
+async def reset_agent(session_id):
+    agent = await agents.get(session_id, create=False)
+    if agent is not None:
+        agent.reset()
+
+
+async def export_accounting(session_id, jsonl):
+    agent = await agents.get(session_id, create=False)
+    if agent is None:
+        return None
+    if jsonl:
+        return agent.accounting.export_jsonl()
+    return {'summary': agent.accounting.summary(), 'turns': agent.accounting.export()}
 
 
 @app.route('/')
@@ -47,25 +99,31 @@ def index():
 def chat():
     """Handle chat messages from the user."""
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
+        user_message = get_chat_message()
 
+        if user_message is None:
+            return jsonify({'error': 'Expected a JSON body with a "message" string'}), 400
         if not user_message:
             return jsonify({'error': 'Empty message'}), 400
 
-        # Get agent for this session
-        agent = get_agent()
+        session_id = get_session_id()
 
-        # Process message synchronously using asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(agent.process_message(user_message))
-        loop.close()
+        # Run the turn on the shared event loop, after this session's earlier turns
+        response, history, turn = background_loop.run(
+            session_dispatcher.run(session_id, run_turn(session_id, user_message))
+        )
 
-        return jsonify({
+        reply = jsonify({
             'response': response,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'history': history,
+            'accounting': turn
         })
+        reply.headers['Server-Timing'] = server_timing(turn)
+        return reply
+
+    except SessionBusy as e:
+        return jsonify({'error': str(e)}), 429
 
     except Exception as e:
         import traceback
@@ -74,34 +132,119 @@ def chat():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the reply to a chat message as Server-Sent Events."""
+    user_message = get_chat_message()
+
+    if user_message is None:
+        return jsonify({'error': 'Expected a JSON body with a "message" string'}), 400
+    if not user_message:
+        return jsonify({'error': 'Empty message'}), 400
+
+    session_id = get_session_id()
+
+    # The turn runs on the shared event loop, after this session's earlier
+    # turns; this thread relays its events. The first one is awaited before
+    # responding, so a full queue is still a plain 429 rather than a stream.
+    events = background_loop.iterate(session_dispatcher.stream(session_id, stream_turn(session_id, user_message)))
+    try:
+        first = next(events)
+    except SessionBusy as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        print(f"Error in chat stream: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        event = first
+        try:
+            while True:
+                if event['type'] == 'done':
+                    event['timestamp'] = datetime.now().isoformat()
+                yield sse_event(event)
+                event = next(events, None)
+                if event is None:
+                    break
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield sse_event({'type': 'error', 'error': str(e)})
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Ends the turn (and frees the session) however the response ends, e.g. a client disconnect
+    response.call_on_close(events.close)
+    return response
+
+
 @app.route('/api/reset', methods=['POST'])
 def reset():
     """Reset the conversation."""
     try:
         session_id = session.get('session_id')
 
-        if session_id and session_id in agents:
-            agents[session_id].reset()
+        if session_id:
+            # Queued like a turn, so it can't clear state under a running one
+            background_loop.run(session_dispatcher.run(session_id, reset_agent(session_id)))
 
         return jsonify({'message': 'Conversation reset successfully'})
 
+    except SessionBusy as e:
+        return jsonify({'error': str(e)}), 429
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/accounting', methods=['GET'])
+def accounting():
+    """Per-turn token, latency and cost records for this session (?format=jsonl to download)."""
+    session_id = session.get('session_id')
+    jsonl = request.args.get('format') == 'jsonl'
+    records = None
+    if session_id:
+        try:
+            records = background_loop.run(session_dispatcher.run(session_id, export_accounting(session_id, jsonl)))
+        except SessionBusy as e:
+            return jsonify({'error': str(e)}), 429
+
+    if records is None:
+        return jsonify({'summary': None, 'turns': []})
+
+    if jsonl:
+        return Response(
+            records,
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename=accounting-{session_id}.jsonl'}
+        )
+
+    return jsonify(records)
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'active_sessions': len(agents)
+        'active_sessions': len(agents),
+        'sessions': agents.stats(),
+        'llm_clients': client_stats(),
+        'response_cache': response_cache.stats(),
+        'intent_classifier': intent_classifier.stats(),
+        'speculation': speculation_stats.snapshot(),
+        'llm_call_policies': policy_stats(),
+        'event_loop': background_loop.stats(),
+        'session_dispatch': session_dispatcher.snapshot()
     })
 
 
 if __name__ == '__main__':
     # Check for OpenAI API key
-    if not os.getenv("OPENAI_API_KEY"):
+    if requires_api_key() and not os.getenv("OPENAI_API_KEY"):
         print("\nERROR: OPENAI_API_KEY environment variable not set!")
         print("Please check your .env file.\n")
         print("Current .env file should contain:")
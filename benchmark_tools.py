@@ -0,0 +1,415 @@
+"""
+Benchmark suite for the tools in tools.py across database sizes.
+
+Builds databases with 1k to 10M orders (cached under bench_data/, so each
+size is generated once), times every tool on a scratch copy of each through
+the same invoke_structured() path the agents use, and writes the results as
+JSON. Compared against a stored baseline, any case whose median got slower
+than the regression threshold is reported (and fails the run), so every
+schema or query change shows its scaling impact. A case whose tool call
+fails is not timed at all; it is reported and fails the run.
+
+Usage:
+    python benchmark_tools.py                                  # 1k and 100k orders
+    python benchmark_tools.py --sizes 1k,100k,1m,10m --save-baseline
+    python benchmark_tools.py --baseline bench_baseline.json --threshold 0.25
+"""
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DATA_DIR = "bench_data"
+DEFAULT_RESULTS = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+
+# Number of catalog products in every benchmark database
+CATALOG_SIZE = 1000
+
+# Orders per status in generated data
+STATUS_WEIGHTS = {"Processing": 0.20, "Shipped": 0.30, "Delivered": 0.45, "Cancelled": 0.05}
+
+# A case is slower than its baseline if its median grew by more than the
+# threshold and by more than the noise floor (small timings jitter a lot)
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR_MS = 0.5
+
+FIRST_NAMES = ["John", "Jane", "Bob", "Alice", "Carlos", "Mei", "Priya", "Omar", "Sven", "Aiko",
+               "Liam", "Emma", "Noah", "Olivia", "Lucas", "Sofia", "Arjun", "Fatima", "Ivan", "Zoe"]
+LAST_NAMES = ["Doe", "Smith", "Johnson", "Garcia", "Chen", "Patel", "Hassan", "Berg", "Tanaka", "Brown",
+              "Wilson", "Martin", "Lopez", "Kim", "Nguyen", "Silva", "Rossi", "Novak", "Ivanov", "Khan"]
+CATEGORIES = ["Electronics", "Accessories", "Office", "Audio", "Storage", "Networking", "Gaming", "Home"]
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '10m' -> 10_000_000."""
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def size_label(orders: int) -> str:
+    if orders >= 1_000_000 and orders % 1_000_000 == 0:
+        return f"{orders // 1_000_000}m"
+    if orders >= 1_000 and orders % 1_000 == 0:
+        return f"{orders // 1_000}k"
+    return str(orders)
+
+
+# ==================== DATA GENERATION ====================
+
+def build_database(path: str, orders: int, seed: int = 0):
+    """Create a database with the app's schema, CATALOG_SIZE products and `orders` orders."""
+    from database import EcommerceDB
+
+    # The app's own schema, indexes and seed rows (5 products, 3 orders)
+    EcommerceDB(path)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    # No journal for the bulk load; WAL (the app's mode) is restored afterwards
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    now = datetime.now()
+
+    existing = [row[0] for row in conn.execute("SELECT product_name FROM products")]
+    products = [
+        (f"Product {i:04d}", f"Benchmark product {i} for {rng.choice(CATEGORIES).lower()} use",
+         round(rng.uniform(5, 2000), 2), rng.randint(50_000, 500_000), rng.choice(CATEGORIES), now.isoformat())
+        for i in range(CATALOG_SIZE - len(existing))
+    ]
+    conn.executemany(
+        "INSERT INTO products (product_name, description, price, stock, category, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        products
+    )
+    catalog = [(row[0], row[1]) for row in conn.execute("SELECT product_name, price FROM products")]
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    start = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def rows():
+        for i in range(start, orders):
+            name, price = catalog[rng.randrange(len(catalog))]
+            created = (now - timedelta(minutes=orders - i)).isoformat()
+            # Numbered the way create_order numbers them: ORD-1001, ORD-1002, ...
+            yield (f"ORD-{1001 + i:04d}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", name,
+                   rng.randint(1, 5), price, rng.choices(statuses, weights)[0], created, created)
+
+    conn.executemany("""
+        INSERT INTO orders (order_number, customer_name, product_name, quantity, price, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows())
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+
+
+def cached_database(orders: int, data_dir: str) -> str:
+    """Path of the generated database for a size, building it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"orders-{size_label(orders)}.db")
+    if not os.path.exists(path):
+        print(f"  Building {path} ({orders:,} orders)...", flush=True)
+        started = time.perf_counter()
+        partial = path + ".part"
+        if os.path.exists(partial):
+            os.remove(partial)
+        build_database(partial, orders)
+        os.replace(partial, path)
+        print(f"  Built in {time.perf_counter() - started:.1f}s", flush=True)
+    return path
+
+
+# ==================== CASES ====================
+
+class BenchData:
+    """Values from the database under test that cases draw their arguments from."""
+
+    def __init__(self, orders: int):
+        from database import db
+
+        self.orders = orders
+        self.rng = random.Random(1)
+        ids = sorted(self.rng.sample(range(1, orders + 1), min(200, orders)))
+        self.sample = db.execute_query(
+            f"SELECT order_number, customer_name, status FROM orders WHERE id IN ({','.join('?' * len(ids))})",
+            tuple(ids)
+        )
+        self.sample_orders = [row["order_number"] for row in self.sample]
+        self.processing = [
+            row["order_number"] for row in db.execute_query(
+                "SELECT order_number FROM orders WHERE status = 'Processing' ORDER BY id DESC LIMIT 2000"
+            )
+        ]
+        self.products = [row["product_name"] for row in db.execute_query("SELECT product_name FROM products")]
+        self._counter = 0
+
+    def unique(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix} {os.getpid()}-{self._counter}"
+
+
+class Case:
+    """One timed tool call; `make_args(data, i)` gives the arguments of run i (prepared untimed)."""
+
+    def __init__(self, name: str, tool: str, make_args: Callable[[BenchData, int], Dict[str, Any]],
+                 prepare: Optional[Callable[[BenchData, int], None]] = None):
+        self.name = name
+        self.tool = tool
+        self.make_args = make_args
+        self.prepare = prepare
+
+
+def _add_throwaway_products(data: BenchData, runs: int):
+    from tools import invoke_structured
+    data.throwaway = []
+    for _ in range(runs):
+        name = data.unique("Throwaway")
+        invoke_structured("add_product", {"product_name": name, "price": 9.99, "stock": 1, "category": "Home"})
+        data.throwaway.append(name)
+
+
+def _search_orders_cases() -> List[Case]:
+    # Filter values come from one sampled order, so every combination matches
+    filters = {
+        "order_number": lambda d, i: d.sample[i % len(d.sample)]["order_number"],
+        "customer_name": lambda d, i: d.sample[i % len(d.sample)]["customer_name"],
+        "status": lambda d, i: d.sample[i % len(d.sample)]["status"],
+    }
+    cases = []
+    for n in range(len(filters) + 1):
+        for combo in combinations(filters, n):
+            def make_args(d, i, combo=combo):
+                return {key: filters[key](d, i) for key in combo}
+            cases.append(Case(f"search_orders[{'+'.join(combo) or 'all'}]", "search_orders", make_args))
+    cases.append(Case("search_orders[status,fields=order_number]", "search_orders",
+                      lambda d, i: {"status": "Processing", "fields": ["order_number"]}))
+    return cases
+
+
+def _search_products_cases() -> List[Case]:
+    filters = {
+        "product_name": lambda d, i: "Product 01",
+        "category": lambda d, i: "Accessories",
+        "max_price": lambda d, i: 100.0,
+    }
+    cases = []
+    for n in range(len(filters) + 1):
+        for combo in combinations(filters, n):
+            def make_args(d, i, combo=combo):
+                return {key: filters[key](d, i) for key in combo}
+            cases.append(Case(f"search_products[{'+'.join(combo) or 'all'}]", "search_products", make_args))
+    return cases
+
+
+def all_cases() -> List[Case]:
+    """Every benchmarked tool call."""
+    return _search_orders_cases() + _search_products_cases() + [
+        Case("find_products", "find_products", lambda d, i: {"query": "something to type on for gaming"}),
+        Case("get_order_details", "get_order_details",
+             lambda d, i: {"order_number": d.sample_orders[i % len(d.sample_orders)]}),
+        Case("create_order[auto_number]", "create_order",
+             lambda d, i: {"customer_name": "Bench User", "product_name": "Product 0042", "quantity": 1}),
+        Case("create_order[order_number]", "create_order",
+             lambda d, i: {"customer_name": "Bench User", "product_name": "Product 0042", "quantity": 1,
+                           "order_number": d.unique("BENCH")}),
+        Case("add_product", "add_product",
+             lambda d, i: {"product_name": d.unique("Bench Product"), "price": 19.99, "stock": 10,
+                           "category": "Office"}),
+        Case("update_order_status", "update_order_status",
+             lambda d, i: {"order_number": d.sample_orders[i % len(d.sample_orders)],
+                           "new_status": "Shipped" if i % 2 else "Delivered"}),
+        Case("update_product_price", "update_product_price",
+             lambda d, i: {"product_name": "Product 0007", "new_price": 100.0 + i % 7}),
+        Case("update_product_stock", "update_product_stock",
+             lambda d, i: {"product_name": "Product 0007", "new_stock": 1000 + i}),
+        Case("cancel_order", "cancel_order", lambda d, i: {"order_number": d.processing[i % len(d.processing)]}),
+        Case("delete_product", "delete_product", lambda d, i: {"product_name": d.throwaway[i]},
+             prepare=_add_throwaway_products),
+        Case("bulk_update_order_status[20 orders]", "bulk_update_order_status",
+             lambda d, i: {"new_status": "Shipped", "order_numbers": d.sample_orders[i % 180:i % 180 + 20]}),
+        Case("bulk_update_product_price[category]", "bulk_update_product_price",
+             lambda d, i: {"percent_change": 1 if i % 2 else -1, "category": "Audio"}),
+    ]
+
+
+# ==================== RUNNER ====================
+
+def time_case(case: Case, data: BenchData, repeat: int, warmup: int, max_seconds: float) -> Dict[str, Any]:
+    """Run a case up to `repeat` times (at least 3, within `max_seconds`) and summarize."""
+    from tools import invoke_structured
+
+    runs = warmup + repeat
+    if case.prepare:
+        case.prepare(data, runs)
+    arguments = [case.make_args(data, i) for i in range(runs)]
+
+    timings: List[float] = []
+    budget_end = time.perf_counter() + max_seconds
+    for i, args in enumerate(arguments):
+        started = time.perf_counter()
+        result = invoke_structured(case.tool, args)
+        elapsed = time.perf_counter() - started
+        if not result.success:
+            # A failed call returns early, so its timing would only flatter the case
+            return {"failed": True, "error": str(result.message)[:200]}
+        if i >= warmup:
+            timings.append(elapsed)
+            if len(timings) >= 3 and time.perf_counter() > budget_end:
+                break
+
+    timings_ms = sorted(t * 1000 for t in timings)
+    summary = {
+        "runs": len(timings_ms),
+        "median_ms": round(statistics.median(timings_ms), 3),
+        "p95_ms": round(timings_ms[min(int(0.95 * len(timings_ms)), len(timings_ms) - 1)], 3),
+        "min_ms": round(timings_ms[0], 3),
+        "mean_ms": round(statistics.fmean(timings_ms), 3)
+    }
+    return summary
+
+
+def run_size(orders: int, args) -> Dict[str, Any]:
+    """Benchmark every selected case on a scratch copy of the database for one size."""
+    from database import use_database
+
+    source = cached_database(orders, args.data_dir)
+    scratch = tempfile.mkdtemp(prefix="bench-")
+    path = os.path.join(scratch, "ecommerce.db")
+    shutil.copyfile(source, path)
+
+    try:
+        use_database(path)
+        data = BenchData(orders)
+        cases = {}
+        for case in all_cases():
+            if args.cases and not any(pattern in case.name for pattern in args.cases):
+                continue
+            cases[case.name] = time_case(case, data, args.repeat, args.warmup, args.max_seconds)
+            row = cases[case.name]
+            if row.get("failed"):
+                print(f"  {case.name:<50}    FAILED: {row['error'][:60]}", flush=True)
+                continue
+            print(f"  {case.name:<50}{row['median_ms']:>10.3f} ms  (p95 {row['p95_ms']:.3f}, n={row['runs']})",
+                  flush=True)
+        return {"orders": orders, "cases": cases}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+# ==================== BASELINE COMPARISON ====================
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            noise_floor_ms: float = NOISE_FLOOR_MS) -> List[Dict[str, Any]]:
+    """Cases slower than the baseline, per size."""
+    regressions = []
+    for size, current in results["sizes"].items():
+        base_size = baseline.get("sizes", {}).get(size)
+        if not base_size:
+            continue
+        for name, row in current["cases"].items():
+            base = base_size["cases"].get(name)
+            # Failed cases have no timings; main() reports them before comparing
+            if not base or "median_ms" not in base or "median_ms" not in row:
+                continue
+            change = row["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+            if change > threshold and row["median_ms"] - base["median_ms"] > noise_floor_ms:
+                regressions.append({
+                    "size": size, "case": name, "reason": "slower",
+                    "baseline_ms": base["median_ms"], "median_ms": row["median_ms"], "change": round(change, 3)
+                })
+    return regressions
+
+
+def failed_cases(results: Dict[str, Any]) -> List[tuple]:
+    """(size, case, error) for every case whose tool call failed."""
+    return [
+        (size, name, row["error"])
+        for size, current in results["sizes"].items()
+        for name, row in current["cases"].items()
+        if row.get("failed")
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tools.py across database sizes.")
+    parser.add_argument("--sizes", default="1k,100k", help="order counts, e.g. 1k,100k,1m,10m (default 1k,100k)")
+    parser.add_argument("--cases", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case (default 20)")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per case (default 2)")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="time budget per case (default 5)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help=f"where generated databases are cached ({DATA_DIR})")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help=f"results file ({DEFAULT_RESULTS})")
+    parser.add_argument("--baseline", help=f"compare against this baseline (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of a median before it counts as a regression (default 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also store the results as {DEFAULT_BASELINE}")
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+
+    # The tools' database is switched per size; never touch the app's own file
+    scratch_import = tempfile.mkdtemp(prefix="bench-import-")
+    os.environ["ECOMMERCE_DB"] = os.path.join(scratch_import, "ecommerce.db")
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "warmup": args.warmup
+        },
+        "sizes": {}
+    }
+    try:
+        for orders in sizes:
+            print(f"\n{size_label(orders)} orders", flush=True)
+            results["sizes"][size_label(orders)] = run_size(orders, args)
+    finally:
+        shutil.rmtree(scratch_import, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    failed = failed_cases(results)
+    if failed:
+        print(f"\n{len(failed)} case(s) failed, so they have no timings:")
+        for size, name, error in failed:
+            print(f"  {size:>5} {name:<50} {error}")
+        sys.exit(1)
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, DEFAULT_BASELINE)
+        print(f"Baseline saved to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if not regressions:
+            print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+            return
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for r in regressions:
+            print(f"  {r['size']:>5} {r['case']:<50} {r['baseline_ms']:.3f} -> {r['median_ms']:.3f} ms "
+                  f"(+{r['change']:.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Deadline, hedging and retry policy for LLM calls.
+
+One slow or failed upstream response used to set the latency of the whole
+turn: calls had no deadline, and ChatOpenAI's own retries waited out every
+backoff. Each graph node / agent step now calls the LLM through a CallPolicy:
+
+- deadline: the whole call (all attempts) must finish within this many
+  seconds, and each attempt within attempt_timeout
+- hedging: if an attempt has not answered after the p95 of this node's recent
+  latencies, a duplicate request is sent; the first response wins and the
+  other is cancelled
+- retries: transient errors (connection errors, timeouts, 429s, 5xx) are
+  retried with exponentially growing, jittered backoff while the deadline allows
+
+Policies are configured per node in POLICIES ("intent" and "agent").
+"""
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import random
+import threading
+import time
+
+import openai
+
+# Errors worth retrying: the request may well succeed if sent again
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError
+)
+
+# Number of recent latencies kept per node for the hedge delay
+LATENCY_WINDOW = 200
+
+
+def _quantile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class CallPolicy:
+    """How one node calls the LLM: deadline, hedging and retries, plus its stats."""
+
+    def __init__(
+        self,
+        deadline: float = 60.0,
+        attempt_timeout: Optional[float] = 30.0,
+        max_retries: int = 2,
+        backoff: float = 0.25,
+        max_backoff: float = 4.0,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_default_delay: float = 5.0,
+        hedge_min_delay: float = 0.05,
+        min_samples: int = 20
+    ):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        # Used until min_samples latencies have been observed
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for an attempt before sending a duplicate request."""
+        with self._lock:
+            latencies = list(self.latencies)
+        if len(latencies) < self.min_samples:
+            return self.hedge_default_delay
+        return max(_quantile(latencies, self.hedge_quantile), self.hedge_min_delay)
+
+    def backoff_delay(self, retry: int) -> float:
+        """Jittered exponential backoff before the given retry (1-based)."""
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (retry - 1))
+        # Equal jitter: at least half the ceiling, so retries still spread out
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    async def _timed(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        result = await call()
+        with self._lock:
+            self.latencies.append(time.monotonic() - start)
+        return result
+
+    async def _attempt(self, call: Callable[[], Awaitable[Any]], hedge: bool) -> Any:
+        """One attempt: the request, plus a hedged duplicate if it is slow."""
+        tasks = [asyncio.ensure_future(self._timed(call))]
+        try:
+            if hedge:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+                if not done:
+                    with self._lock:
+                        self.hedges += 1
+                    tasks.append(asyncio.ensure_future(self._timed(call)))
+
+            # First successful response wins; fail only when every request failed
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        hedge: Optional[bool] = None,
+        can_retry: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        Run `call` (a function returning a fresh awaitable) under this policy.
+
+        `hedge` overrides the policy's hedging (streamed calls must not be
+        duplicated) and `can_retry` can veto retries, e.g. once streamed output
+        has been shown. Raises TimeoutError when the deadline is exceeded and
+        the last error when retries are exhausted.
+        """
+        hedge = self.hedge if hedge is None else hedge
+        with self._lock:
+            self.calls += 1
+        deadline_at = time.monotonic() + self.deadline
+        retry = 0
+
+        while True:
+            remaining = deadline_at - time.monotonic()
+            timeout = min(remaining, self.attempt_timeout) if self.attempt_timeout else remaining
+            try:
+                return await asyncio.wait_for(self._attempt(call, hedge), timeout)
+            except TRANSIENT_ERRORS as error:
+                is_timeout = isinstance(error, asyncio.TimeoutError)
+                retry += 1
+                delay = self.backoff_delay(retry)
+                out_of_time = time.monotonic() + delay >= deadline_at
+                if retry > self.max_retries or out_of_time or (can_retry is not None and not can_retry()):
+                    with self._lock:
+                        if is_timeout:
+                            self.timeouts += 1
+                        else:
+                            self.failures += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+                await asyncio.sleep(delay)
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and latency percentiles for the health endpoint."""
+        with self._lock:
+            latencies = list(self.latencies)
+            stats = {
+                "calls": self.calls,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "timeouts": self.timeouts,
+                "failures": self.failures
+            }
+        p50 = _quantile(latencies, 0.5)
+        p95 = _quantile(latencies, 0.95)
+        stats["p50_ms"] = round(p50 * 1000, 1) if p50 is not None else None
+        stats["p95_ms"] = round(p95 * 1000, 1) if p95 is not None else None
+        stats["hedge_delay_ms"] = round(self.hedge_delay() * 1000, 1) if self.hedge else None
+        return stats
+
+
+# Intent detection is a tiny gpt-4o-mini call and has a local fallback, so it
+# gets a short deadline; the agent call carries the whole answer
+POLICIES: Dict[str, CallPolicy] = {
+    "intent": CallPolicy(deadline=6.0, attempt_timeout=3.0, max_retries=1, hedge_default_delay=1.5),
+    "agent": CallPolicy(deadline=60.0, attempt_timeout=30.0, max_retries=2, hedge_default_delay=8.0)
+}
+
+
+def get_policy(node: str) -> CallPolicy:
+    """The call policy of a node (the agent's policy for unknown nodes)."""
+    return POLICIES.get(node, POLICIES["agent"])
+
+
+def policy_stats() -> Dict[str, Any]:
+    """Per-node call policy stats."""
+    return {node: policy.snapshot() for node, policy in POLICIES.items()}
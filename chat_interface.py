@@ -8,6 +8,7 @@ import sys
 import io
 from datetime import datetime
 from simple_agent import SimpleEcommerceAgent as EcommerceAgent
+from llm_clients import requires_api_key
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -21,6 +22,24 @@ if sys.platform == 'win32':
 
 # ==================== CLI INTERFACE ====================
 
+def unprinted_text(response: str, tokens: str, results: list) -> str:
+    """
+    The part of a final response that streaming didn't already print.
+
+    Streamed tokens are the model's own text, which a plain reply repeats
+    as-is; result events are whole tool results, which a tool reply repeats
+    among its other lines (e.g. a confirmation prompt). The two are matched
+    separately so neither is printed twice.
+    """
+    if response.startswith(tokens):
+        response = response[len(tokens):]
+    for text in results:
+        index = response.find(text)
+        if index >= 0:
+            response = response[:index] + response[index + len(text):]
+    return response.strip("\n")
+
+
 class CLIChatInterface:
     """Command-line interface for the chat agent."""
 
@@ -108,11 +127,27 @@ SPECIAL COMMANDS:
                 # Show typing indicator
                 print("\nAssistant: ", end="", flush=True)
 
-                # Process message
-                response = await self.agent.process_message(user_input)
-
-                # Print response with formatting
-                print(f"{response}\n")
+                # Process message, printing tokens and tool results as they arrive
+                tokens = ""
+                results = []
+                response = ""
+                line_open = False
+                async for event in self.agent.stream_message(user_input):
+                    if event["type"] == "token":
+                        tokens += event["text"]
+                        print(event["text"], end="", flush=True)
+                        line_open = not event["text"].endswith("\n")
+                    elif event["type"] == "result":
+                        # Results start on their own line after streamed text
+                        print(("\n" if line_open else "") + event["text"], flush=True)
+                        results.append(event["text"])
+                        line_open = False
+                    else:
+                        response = event["response"]
+
+                # Print whatever the stream didn't already show
+                rest = unprinted_text(response, tokens, results)
+                print(f"{rest}\n" if rest else "")
 
             except KeyboardInterrupt:
                 print("\n\nInterrupted. Goodbye!\n")
@@ -469,7 +504,7 @@ async def main():
 
 if __name__ == "__main__":
     # Check for OpenAI API key
-    if not os.getenv("OPENAI_API_KEY"):
+    if requires_api_key() and not os.getenv("OPENAI_API_KEY"):
         print("\nWARNING: OPENAI_API_KEY environment variable not set!")
         print("Please set it with: set OPENAI_API_KEY=your-key-here\n")
         exit(1)
@@ -5,6 +5,22 @@ import sqlite3
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import json
+import os
+import re
+import threading
+import time
+from accounting import record_query
+
+# Times a stepped backup may start over (because another connection wrote to
+# the database) before it falls back to copying everything in one step
+MAX_BACKUP_RESTARTS = 3
+
+# Snapshot timestamps, as written by EcommerceDB.backup
+SNAPSHOT_TIMESTAMP = r"\d{8}-\d{6}-\d{6}"
+
+
+class _TooManyRestarts(Exception):
+    pass
 
 
 class EcommerceDB:
@@ -12,6 +28,9 @@ class EcommerceDB:
 
     def __init__(self, db_path: str = "ecommerce.db"):
         self.db_path = db_path
+        # In-process change counters per table, used to invalidate caches
+        self.versions = {"orders": 0, "products": 0}
+        self._version_lock = threading.Lock()
         self.init_db()
 
     def get_connection(self):
@@ -23,6 +42,10 @@ class EcommerceDB:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # WAL lets readers (including online backups) run alongside writers.
+        # The setting is stored in the database file.
+        cursor.execute("PRAGMA journal_mode = WAL")
+
         # Create orders table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS orders (
@@ -51,6 +74,18 @@ class EcommerceDB:
             )
         """)
 
+        # Covering indexes for narrow reads (e.g. order numbers by status)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, order_number)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category, product_name, price)")
+
+        # Case-insensitive customer name prefixes (LIKE 'john%'), for the fast path
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_customer_name ON orders (customer_name COLLATE NOCASE)")
+
+        # Numeric value of "ORD-<n>", so the next order number is one index lookup
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_number_value ON orders (CAST(SUBSTR(order_number, 5) AS INTEGER))"
+        )
+
         conn.commit()
         conn.close()
 
@@ -103,24 +138,45 @@ class EcommerceDB:
 
     def execute_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
         """Execute a SELECT query and return results as list of dicts."""
+        start = time.monotonic()
         conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        try:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            results = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        record_query(time.monotonic() - start)
         return results
 
     def execute_update(self, query: str, params: tuple = ()) -> int:
         """Execute INSERT/UPDATE/DELETE and return affected rows."""
+        start = time.monotonic()
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            affected = cursor.rowcount
+            conn.commit()
+        finally:
+            # A failed statement must not keep its write lock (close() rolls back)
+            conn.close()
+        record_query(time.monotonic() - start)
         return affected
 
+    def bump_version(self, *tables: str):
+        """Record that the given tables changed."""
+        with self._version_lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+    def data_version(self, *tables: str) -> tuple:
+        """Current change counters for the given tables (all tables if none given)."""
+        with self._version_lock:
+            names = tables or sorted(self.versions)
+            return tuple(self.versions.get(table, 0) for table in names)
+
     def get_last_insert_id(self) -> int:
         """Get the last inserted row ID."""
         conn = self.get_connection()
@@ -130,6 +186,173 @@ class EcommerceDB:
         conn.close()
         return last_id
 
+    # ==================== BACKUPS ====================
+
+    def backup(
+        self,
+        backup_dir: str = "backups",
+        pages_per_step: int = 256,
+        max_mb_per_sec: Optional[float] = None,
+        step_pause: float = 0.0,
+        keep: int = 7,
+        verify: bool = True,
+        max_restarts: int = MAX_BACKUP_RESTARTS
+    ) -> Dict[str, Any]:
+        """
+        Take an online snapshot of the database using the SQLite backup API.
+
+        The copy is done in steps of `pages_per_step` pages. The source is only
+        read-locked while a step runs, so writers can commit between steps.
+        Use `max_mb_per_sec` and/or `step_pause` to throttle the copy.
+
+        SQLite starts a stepped backup over whenever another connection writes
+        to the database, so on a busy database it might never finish. After
+        `max_restarts` restarts the copy is redone in a single step, which
+        holds one read transaction; with WAL (enabled by init_db) that does
+        not block writers.
+
+        Args:
+            backup_dir: Directory the snapshots are written to
+            pages_per_step: Number of pages copied per backup step
+            max_mb_per_sec: Optional copy rate limit in MB/s
+            step_pause: Minimum pause in seconds between steps
+            keep: Number of snapshots to retain (older ones are removed)
+            verify: Run an integrity check on the snapshot before keeping it
+            max_restarts: Restarts allowed before falling back to a single step
+
+        Returns:
+            Dict with the snapshot path, size, throughput, writer-stall time and
+            restart count
+        """
+        if keep < 1:
+            raise ValueError("keep must be at least 1 (the snapshot being taken)")
+
+        os.makedirs(backup_dir, exist_ok=True)
+
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        snapshot_path = os.path.join(backup_dir, f"{stem}-{timestamp}.db")
+        partial_path = snapshot_path + ".part"
+
+        source = self.get_connection()
+        target = sqlite3.connect(partial_path)
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+
+        started = time.perf_counter()
+        stats = {"steps": 0, "pages": 0, "restarts": 0, "stall": 0.0, "paused": 0.0, "step_started": started}
+
+        def progress(status, remaining, total):
+            now = time.perf_counter()
+            stats["stall"] += now - stats["step_started"]
+            stats["steps"] += 1
+            if stats["pages"] and total - remaining <= stats["pages"]:
+                # No more pages copied than before the step: the backup started over
+                stats["restarts"] += 1
+                if stats["restarts"] > max_restarts:
+                    raise _TooManyRestarts()
+            stats["pages"] = total - remaining
+
+            if remaining:
+                pause = step_pause
+                if max_mb_per_sec:
+                    # Sleep until the copied bytes fit within the rate limit
+                    target_elapsed = stats["pages"] * page_size / (max_mb_per_sec * 1_000_000)
+                    pause = max(pause, target_elapsed - (now - started))
+                if pause > 0:
+                    time.sleep(pause)
+                    stats["paused"] += pause
+
+            stats["step_started"] = time.perf_counter()
+
+        single_step = False
+        try:
+            try:
+                source.backup(target, pages=pages_per_step, progress=progress)
+            except _TooManyRestarts:
+                single_step = True
+                stats["step_started"] = time.perf_counter()
+                source.backup(target)
+                stats["stall"] += time.perf_counter() - stats["step_started"]
+                stats["steps"] += 1
+                stats["pages"] = source.execute("PRAGMA page_count").fetchone()[0]
+        except Exception:
+            target.close()
+            os.remove(partial_path)
+            raise
+        finally:
+            source.close()
+
+        target.close()
+        elapsed = time.perf_counter() - started
+
+        if verify:
+            check = sqlite3.connect(partial_path)
+            integrity = check.execute("PRAGMA integrity_check").fetchone()[0]
+            check.close()
+
+            if integrity != "ok":
+                os.remove(partial_path)
+                raise sqlite3.DatabaseError(f"Backup verification failed: {integrity}")
+
+        os.replace(partial_path, snapshot_path)
+        removed = self.prune_backups(backup_dir, keep)
+
+        size = os.path.getsize(snapshot_path)
+        return {
+            "path": snapshot_path,
+            "bytes": size,
+            "pages": stats["pages"],
+            "steps": stats["steps"],
+            "elapsed_seconds": round(elapsed, 4),
+            "mb_per_sec": round(size / 1_000_000 / elapsed, 2) if elapsed > 0 else None,
+            "writer_stall_seconds": round(stats["stall"], 4),
+            "throttle_seconds": round(stats["paused"], 4),
+            "restarts": stats["restarts"],
+            "single_step": single_step,
+            "verified": verify,
+            "removed": removed
+        }
+
+    def list_backups(self, backup_dir: str = "backups") -> List[str]:
+        """List snapshot paths for this database, oldest first."""
+        if not os.path.isdir(backup_dir):
+            return []
+
+        # Match the exact <stem>-<timestamp>.db name so that snapshots of
+        # another database sharing the prefix (ecommerce-archive.db) are left alone
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        pattern = re.compile(re.escape(stem) + "-" + SNAPSHOT_TIMESTAMP + r"\.db")
+        return sorted(
+            os.path.join(backup_dir, name)
+            for name in os.listdir(backup_dir)
+            if pattern.fullmatch(name)
+        )
+
+    def prune_backups(self, backup_dir: str = "backups", keep: int = 7) -> List[str]:
+        """Remove all but the `keep` most recent snapshots and return the removed paths."""
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+
+        snapshots = self.list_backups(backup_dir)
+        removed = snapshots[:-keep]
+
+        for path in removed:
+            os.remove(path)
+
+        return removed
+
+
+def use_database(path: str):
+    """Point the global db (and the product indexes built from it) at another database file."""
+    # Imported here: both modules import this one
+    from product_resolver import product_index
+    from semantic_search import product_vectors
+
+    db.db_path = path
+    db.bump_version("orders", "products")
+    product_index.invalidate()
+    product_vectors.invalidate()
+
 
 # Initialize global database instance
-db = EcommerceDB()
\ No newline at end of file
+db = EcommerceDB(os.getenv("ECOMMERCE_DB", "ecommerce.db"))
\ No newline at end of file
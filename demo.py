@@ -5,6 +5,7 @@ This demonstrates the agent's capabilities programmatically.
 import asyncio
 import os
 from simple_agent import SimpleEcommerceAgent as EcommerceAgent
+from llm_clients import requires_api_key
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -96,7 +97,7 @@ async def demo():
 
 if __name__ == "__main__":
     # Check for OpenAI API key
-    if not os.getenv("OPENAI_API_KEY"):
+    if requires_api_key() and not os.getenv("OPENAI_API_KEY"):
         print("\nERROR: OPENAI_API_KEY environment variable not set!")
         print("Please check your .env file.\n")
         exit(1)
@@ -0,0 +1,131 @@
+"""
+Long-lived asyncio event loop for running agent coroutines from Flask threads.
+
+Flask views are synchronous, and app.py used to create and close a new event
+loop for every request. That paid the loop setup each time, and it threw
+away the pooled async HTTP connections of the shared LLM clients. Those
+connections (like the asyncio primitives in tools.py) belong to the loop
+that created them.
+
+BackgroundLoop runs a single loop in a daemon thread. Request threads submit
+coroutines to it with run_coroutine_threadsafe and wait for the result, so
+all in-flight LLM calls share one loop and one connection pool.
+"""
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterator, Optional
+import asyncio
+import atexit
+import threading
+import time
+
+
+async def _anext(iterator: AsyncIterator) -> Any:
+    return await iterator.__anext__()
+
+
+class BackgroundLoop:
+    """An event loop running forever in its own thread, started on first use."""
+
+    def __init__(self, name: str = "agent-event-loop"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop (started if needed)."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(target=self._run_forever, args=(loop, ready), name=self.name, daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    @staticmethod
+    def _run_forever(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self.completed += 1
+            # StopAsyncIteration just ends an iterate()
+            if not future.cancelled() and not isinstance(future.exception(), (type(None), StopAsyncIteration)):
+                self.failed += 1
+
+    def submit(self, coroutine: Coroutine) -> Future:
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block the calling thread until it finishes."""
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timed out, or the waiting thread was interrupted: don't leave the work running
+            future.cancel()
+            raise
+
+    def iterate(self, iterator: AsyncIterator) -> Iterator[Any]:
+        """Drive an async iterator on the loop from a synchronous generator."""
+        try:
+            while True:
+                try:
+                    item = self.run(_anext(iterator))
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            # Runs on exhaustion and when the consumer goes away (e.g. client disconnect)
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                self.run(aclose())
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, plus how long the loop takes to pick up new work (lag)."""
+        with self._lock:
+            loop = self._loop
+            stats = {
+                "running": loop is not None,
+                "submitted": self.submitted,
+                "in_flight": self.submitted - self.completed,
+                "failed": self.failed
+            }
+        stats["lag_ms"] = None
+        if loop is not None:
+            started = time.monotonic()
+            # Not submit(): the probe should not show up in the counters
+            probe = asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop)
+            try:
+                probe.result(timeout=1.0)
+                stats["lag_ms"] = round((time.monotonic() - started) * 1000, 2)
+            except Exception:
+                probe.cancel()  # A loop stalled for over 1s shows as lag_ms None
+        return stats
+
+    def stop(self):
+        """Stop the loop and wait for its thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+
+
+# Global loop shared by every request thread
+background_loop = BackgroundLoop()
+atexit.register(background_loop.stop)
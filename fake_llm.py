@@ -0,0 +1,460 @@
+"""
+Offline stand-in for the OpenAI chat models.
+
+ScriptedChatModel implements the LangChain chat model interface (invoke,
+ainvoke, astream, bind_tools, tool_calls, usage metadata, callbacks), so the
+agents, demo.py and app.py run unchanged without a network or API key. It
+answers in one of three modes:
+
+- "fake": scripted responses, in order; once the script runs out (or without
+  one) a rule-based responder answers: intent prompts are classified with the
+  local intent classifier, simple read questions become tool calls through the
+  fast-path router, simple cancel/status/order requests become the matching
+  tool calls, tool results are echoed back and anything else gets a canned reply
+- "record": the real model answers and every response is saved to a cassette
+- "replay": responses come from the cassette, with no network at all; a
+  prompt that was never recorded raises CassetteMiss
+
+Every response waits for a delay drawn from a LatencyModel, so latency
+percentiles, hedging and timeouts can be exercised deterministically.
+
+The agents get these models through llm_clients.get_llm() when the LLM_MODE
+environment variable is "fake", "record" or "replay" (see use_offline_models).
+LLM_CASSETTE names the cassette file and LLM_LATENCY the latency model, e.g.
+"lognormal:0.8:0.5" (distribution:median:spread[:tail_probability:tail_seconds]).
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage,
+    message_to_dict, messages_from_dict
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from result_shaping import estimate_tokens
+from tool_results import dumps
+
+MODES = ("fake", "record", "replay")
+
+# Cassette used when LLM_CASSETTE is not set
+DEFAULT_CASSETTE = "llm_cassette.json"
+
+# Reply of the rule-based responder when nothing else applies
+CANNED_REPLY = "I can help you search, create, update or cancel orders and products. What would you like to do?"
+
+# A scripted response: text, an AIMessage, a {"content", "tool_calls"} dict, or
+# a callable (messages, tool names) -> one of those
+ScriptItem = Union[str, AIMessage, Dict[str, Any], Callable[[List[BaseMessage], List[str]], Any]]
+
+
+class CassetteMiss(LookupError):
+    """A prompt was replayed that the cassette has no recording for."""
+
+
+# ==================== LATENCY ====================
+
+class LatencyModel:
+    """Random response delays: fixed, uniform or lognormal, plus an optional slow tail."""
+
+    def __init__(
+        self,
+        distribution: str = "fixed",
+        median: float = 0.0,
+        spread: float = 0.0,
+        tail_probability: float = 0.0,
+        tail_seconds: float = 0.0,
+        per_token: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.median = median
+        self.spread = spread
+        self.tail_probability = tail_probability
+        self.tail_seconds = tail_seconds
+        # Delay between streamed chunks
+        self.per_token = per_token
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str, seed: Optional[int] = None) -> "LatencyModel":
+        """Parse "distribution:median[:spread[:tail_probability:tail_seconds]]"."""
+        parts = spec.split(":")
+        numbers = [float(p) for p in parts[1:]]
+        return cls(parts[0], *numbers, seed=seed)
+
+    def sample(self) -> float:
+        """Seconds to wait before answering."""
+        with self._lock:
+            if self.distribution == "uniform":
+                delay = self._random.uniform(self.median - self.spread, self.median + self.spread)
+            elif self.distribution == "lognormal":
+                delay = self.median * math.exp(self._random.gauss(0, self.spread))
+            else:
+                delay = self.median
+            if self.tail_probability and self._random.random() < self.tail_probability:
+                delay += self.tail_seconds
+        return max(delay, 0.0)
+
+
+# ==================== CASSETTES ====================
+
+class Cassette:
+    """Recorded model responses on disk, keyed by the prompt that produced them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.interactions: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", {})
+
+    @staticmethod
+    def key(model: str, messages: Sequence[BaseMessage], tool_names: Sequence[str]) -> str:
+        """Stable key of a prompt (message ids and tool call ids are ignored)."""
+        prompt = [
+            [m.type, m.content, [[c["name"], c["args"]] for c in getattr(m, "tool_calls", None) or []]]
+            for m in messages
+        ]
+        return hashlib.sha256(dumps([model, prompt, sorted(tool_names)]).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The recording for a prompt: {"message": AIMessage, "latency": seconds}."""
+        with self._lock:
+            entry = self.interactions.get(key)
+        if entry is None:
+            return None
+        return {"message": messages_from_dict([entry["message"]])[0], "latency": entry["latency"]}
+
+    def put(self, key: str, message: AIMessage, latency: float):
+        """Record a response and write the cassette to disk."""
+        with self._lock:
+            self.interactions[key] = {"message": message_to_dict(message), "latency": round(latency, 4)}
+            self._save()
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves half a cassette
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "interactions": self.interactions}, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+
+# ==================== RULE-BASED RESPONDER ====================
+
+# Simple change requests the responder turns into (confirmable) tool calls
+MUTATION_RULES = (
+    (re.compile(r"\bcancel (?:order )?(ORD-\d+)", re.I),
+     "cancel_order", lambda m: {"order_number": m.group(1).upper()}),
+    (re.compile(r"\b(?:mark|set|update|change) (?:order )?(ORD-\d+)\b.*?\b(processing|shipped|delivered|cancelled)\b", re.I),
+     "update_order_status", lambda m: {"order_number": m.group(1).upper(), "new_status": m.group(2).title()}),
+    (re.compile(r"\border (\d+) (.+?) for (.+?)[.!]?$", re.I),
+     "create_order", lambda m: {"customer_name": m.group(3), "product_name": m.group(2), "quantity": int(m.group(1))}),
+)
+
+
+def _tool_names(kwargs: Dict[str, Any]) -> List[str]:
+    return [t["function"]["name"] for t in kwargs.get("tools") or []]
+
+
+def rule_based_reply(messages: Sequence[BaseMessage], tool_names: Sequence[str]) -> AIMessage:
+    """A plausible answer for the agents' prompts, without a model."""
+    # Imported lazily: fast_path opens the database on import
+    from fast_path import route_message
+    from intent_classifier import intent_classifier
+
+    last = messages[-1]
+    text = last.content if isinstance(last.content, str) else ""
+
+    # Intent detection prompt (agent.py): classify the latest user message
+    if text.rstrip().endswith("INTENT:"):
+        match = re.search(r"USER'S LATEST MESSAGE:\n(.*)\n\nINTENT:", text, re.S)
+        return AIMessage(content=intent_classifier.predict(match.group(1) if match else text).intent)
+
+    # After tool calls, relay the results
+    if isinstance(last, ToolMessage):
+        results = [m.content for m in messages if isinstance(m, ToolMessage)]
+        return AIMessage(content="Here is what I found:\n" + "\n".join(str(r) for r in results[-3:]))
+
+    human = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+    match = route_message(human)
+    if match and match.tool_name in tool_names:
+        return _to_message({"tool_calls": [{"name": match.tool_name, "args": match.tool_args}]})
+
+    for pattern, tool_name, make_args in MUTATION_RULES:
+        found = pattern.search(human.strip())
+        if found and tool_name in tool_names:
+            return _to_message({"tool_calls": [{"name": tool_name, "args": make_args(found)}]})
+
+    return AIMessage(content=CANNED_REPLY)
+
+
+class Script:
+    """Scripted responses handed out in call order; one script can serve several models."""
+
+    def __init__(self, items: Sequence[ScriptItem] = ()):
+        self.items = list(items)
+        self.position = 0
+        self._lock = threading.Lock()
+
+    def next(self, messages: List[BaseMessage], tool_names: List[str]) -> Optional[AIMessage]:
+        """The next scripted response, or None once the script has run out."""
+        with self._lock:
+            if self.position >= len(self.items):
+                return None
+            item = self.items[self.position]
+            self.position += 1
+        if callable(item):
+            item = item(messages, tool_names)
+        return _to_message(item)
+
+    @property
+    def remaining(self) -> int:
+        return len(self.items) - self.position
+
+
+def _to_message(item: Any) -> AIMessage:
+    if isinstance(item, AIMessage):
+        return item
+    if isinstance(item, str):
+        return AIMessage(content=item)
+    tool_calls = [
+        {"name": c["name"], "args": c.get("args", {}), "id": c.get("id") or f"call_{uuid.uuid4().hex[:24]}",
+         "type": "tool_call"}
+        for c in item.get("tool_calls", [])
+    ]
+    return AIMessage(content=item.get("content", ""), tool_calls=tool_calls)
+
+
+# ==================== CHAT MODEL ====================
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model answering from a script, a cassette or rules, after a simulated delay."""
+
+    model_name: str = "fake-gpt-4o"
+    mode: str = "fake"
+    script: Optional[Any] = None  # Script
+    latency: Optional[Any] = None  # LatencyModel
+    cassette: Optional[Any] = None  # Cassette, for "record" and "replay"
+    upstream: Optional[Any] = None  # Real chat model, for "record"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "mode": self.mode}
+
+    def bind_tools(self, tools: Sequence, **kwargs: Any):
+        """Bind tools like ChatOpenAI does: they reach the responder as OpenAI schemas."""
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _respond(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> tuple:
+        """(message, delay) for a prompt, except for recordings (see _record)."""
+        tool_names = _tool_names(kwargs)
+
+        if self.mode == "replay":
+            recording = self.cassette.get(Cassette.key(self.model_name, messages, tool_names))
+            if recording is None:
+                raise CassetteMiss(f"No recording for this prompt in {self.cassette.path}")
+            delay = recording["latency"] if self.latency is None else self.latency.sample()
+            return recording["message"], delay
+
+        message = self.script.next(messages, tool_names) if self.script is not None else None
+        message = message or rule_based_reply(messages, tool_names)
+        return message, self.latency.sample() if self.latency is not None else 0.0
+
+    def _upstream(self, kwargs: Dict[str, Any]):
+        return self.upstream.bind_tools(kwargs["tools"]) if kwargs.get("tools") else self.upstream
+
+    def _record(self, messages: List[BaseMessage], kwargs: Dict[str, Any], message: AIMessage, seconds: float):
+        key = Cassette.key(self.model_name, messages, _tool_names(kwargs))
+        self.cassette.put(key, message, seconds)
+
+    async def _arespond(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> AIMessage:
+        if self.mode == "record":
+            start = time.monotonic()
+            message = await self._upstream(kwargs).ainvoke(messages)
+            self._record(messages, kwargs, message, time.monotonic() - start)
+            return message
+
+        message, delay = self._respond(messages, kwargs)
+        await asyncio.sleep(delay)
+        return message
+
+    def _finish(self, message: AIMessage, messages: List[BaseMessage]) -> ChatResult:
+        """Give the response usage metadata and a model name, like the real client."""
+        usage = message.usage_metadata
+        if not usage:
+            prompt_tokens = sum(estimate_tokens(m.content) for m in messages)
+            completion_tokens = estimate_tokens(message.content) + sum(
+                estimate_tokens(c["args"]) for c in message.tool_calls
+            )
+            usage = {
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        message = message.model_copy(update={
+            "usage_metadata": usage,
+            "response_metadata": {**message.response_metadata, "model_name": self.model_name}
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.mode == "record":
+            start = time.monotonic()
+            message = self._upstream(kwargs).invoke(messages)
+            self._record(messages, kwargs, message, time.monotonic() - start)
+            return self._finish(message, messages)
+
+        message, delay = self._respond(messages, kwargs)
+        time.sleep(delay)
+        return self._finish(message, messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        return self._finish(await self._arespond(messages, kwargs), messages)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ):
+        message = self._finish(await self._arespond(messages, kwargs), messages).generations[0].message
+        per_token = self.latency.per_token if self.latency is not None else 0.0
+
+        for token in _split_tokens(message.content):
+            if per_token:
+                await asyncio.sleep(per_token)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, id=message.id))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+        # Tool calls and usage arrive in the last chunk, as with OpenAI
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            id=message.id,
+            tool_call_chunks=[
+                {"name": c["name"], "args": dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+            response_metadata=message.response_metadata
+        ))
+
+
+def _split_tokens(content: str) -> Iterator[str]:
+    # Words with their whitespace, so the chunks add up to the content
+    return (token for token in re.split(r"(\s)", content or "") if token)
+
+
+# ==================== INSTALLATION ====================
+
+def llm_mode() -> str:
+    """The LLM backend selected by LLM_MODE: "openai" (default), "fake", "record" or "replay"."""
+    return os.getenv("LLM_MODE", "openai").lower()
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def _get_cassette(path: str) -> Cassette:
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+def build_offline_model(
+    mode: str,
+    model: str,
+    callbacks: Optional[list] = None,
+    upstream: Optional[Any] = None,
+    script: Union[Script, Sequence[ScriptItem], None] = None,
+    latency: Optional[LatencyModel] = None,
+    cassette_path: Optional[str] = None
+) -> ScriptedChatModel:
+    """Build the offline stand-in for one model (settings default to the LLM_* variables)."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown LLM mode: {mode}")
+    if mode == "record" and upstream is None:
+        raise ValueError("Recording needs the real model as upstream")
+
+    if latency is None and os.getenv("LLM_LATENCY"):
+        latency = LatencyModel.from_spec(os.getenv("LLM_LATENCY"))
+    cassette = None
+    if mode in ("record", "replay"):
+        cassette = _get_cassette(cassette_path or os.getenv("LLM_CASSETTE", DEFAULT_CASSETTE))
+
+    return ScriptedChatModel(
+        model_name=model,
+        mode=mode,
+        script=script if script is None or isinstance(script, Script) else Script(script),
+        latency=latency,
+        cassette=cassette,
+        upstream=upstream,
+        callbacks=callbacks
+    )
+
+
+def use_offline_models(
+    mode: str = "fake",
+    script: Union[Script, Sequence[ScriptItem], None] = None,
+    latency: Optional[LatencyModel] = None,
+    cassette_path: Optional[str] = None
+) -> Optional[Script]:
+    """
+    Make llm_clients.get_llm() return offline models from now on.
+
+    All models share one script, consumed in call order across models (the
+    intent model and the agent model alike); it is returned for inspection.
+    Call before creating agents, since existing agents keep their models.
+    """
+    import llm_clients
+
+    if script is not None and not isinstance(script, Script):
+        script = Script(script)
+
+    def factory(model: str, temperature: float, callbacks: list, upstream: Callable[[], Any]):
+        return build_offline_model(
+            mode, model, callbacks,
+            upstream=upstream() if mode == "record" else None,
+            script=script, latency=latency, cassette_path=cassette_path
+        )
+
+    llm_clients.set_model_factory(factory)
+    return script
@@ -0,0 +1,188 @@
+"""
+Rule-based fast path that answers common read requests without the LLM.
+
+Messages like "check order ORD-1042" or "show processing orders" are matched
+against compiled patterns. Their slots (order number, status, category,
+price) are extracted and mapped directly onto a read tool call. A match is
+only used when the pattern covers enough of the message (its confidence);
+everything else falls back to the LLM.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import re
+from database import db
+
+# Minimum share of the (cleaned) message a rule must cover to be used
+FAST_PATH_MIN_CONFIDENCE = 0.8
+
+# Messages mentioning these words may ask for a change; never fast-path them
+MUTATION_WORDS = re.compile(
+    r"\b(cancel|change|update|set|modify|delete|remove|create|place|add|buy|"
+    r"purchase|refund|return|ship|mark|reprice|increase|decrease|discount)\b"
+)
+
+# Politeness and filler the patterns don't need to cover
+FILLER = re.compile(
+    r"^(?:(?:hi|hello|hey|please|can you|could you|would you|will you|kindly)\b[\s,]*)+"
+    r"|(?:[\s,]*\b(?:please|thanks|thank you))+$"
+)
+
+STATUSES = {
+    "processing": "Processing",
+    "shipped": "Shipped",
+    "delivered": "Delivered",
+    "cancelled": "Cancelled",
+    "canceled": "Cancelled",
+}
+
+_VERB = r"(?:(?:show|list|get|find|view|display|give|tell)\s+(?:me\s+)?)?"
+_ALL = r"(?:(?:all|every|the|all the)\s+)?"
+_STATUS = r"(?P<status>processing|shipped|delivered|cancelled|canceled)"
+_PRICE = r"(?:\s+(?:under|below|less than|cheaper than|up to)\s+\$?(?P<max_price>\d+(?:\.\d+)?))?"
+
+
+class FastPathMatch:
+    """A message resolved to a read tool call by a fast-path rule."""
+
+    def __init__(self, rule: str, tool_name: str, tool_args: Dict[str, Any], confidence: float):
+        self.rule = rule
+        self.tool_name = tool_name
+        self.tool_args = tool_args
+        self.confidence = confidence
+
+    def __repr__(self) -> str:
+        return f"FastPathMatch({self.rule!r}, {self.tool_name}({self.tool_args}), confidence={self.confidence})"
+
+
+class Rule:
+    """A compiled pattern plus a function mapping its slots to tool arguments."""
+
+    def __init__(self, name: str, pattern: str, tool_name: str, build_args: Callable[[Dict[str, str]], Optional[Dict[str, Any]]]):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.tool_name = tool_name
+        self.build_args = build_args
+
+
+def _known_categories() -> Dict[str, str]:
+    """Map lowercase category names to their catalog spelling."""
+    rows = db.execute_query("SELECT DISTINCT category FROM products WHERE category IS NOT NULL")
+    return {row["category"].lower(): row["category"] for row in rows}
+
+
+def _order_lookup(slots):
+    number = re.sub(r"\D", "", slots["order_number"])
+    return {"order_number": f"ORD-{number}"}
+
+
+def _orders_by_status(slots):
+    return {"status": STATUSES[slots["status"]]}
+
+
+def _orders_for_customer(slots):
+    # Only names of existing customers: "john doe who is angry" must not become a name.
+    # A prefix match is answered from idx_orders_customer_name; "%name%" would scan every order.
+    name = slots["customer_name"].strip()
+    known = db.execute_query("SELECT 1 FROM orders WHERE customer_name LIKE ? LIMIT 1", (f"{name}%",))
+    if not known:
+        return None
+    return {"customer_name": name.title()}
+
+
+def _products(slots):
+    args: Dict[str, Any] = {}
+    if slots.get("category"):
+        category = _known_categories().get(slots["category"])
+        if category is None:
+            return None
+        args["category"] = category
+    if slots.get("max_price"):
+        args["max_price"] = float(slots["max_price"])
+    return args
+
+
+RULES: List[Rule] = [
+    Rule(
+        "order_lookup",
+        r"(?:(?:check|show|get|find|track|view|look up|lookup|what is|what's|where is|where's)\s+(?:me\s+)?)?"
+        r"(?:the\s+)?(?:(?:status|details|info|information)\s+(?:of|for|on)\s+)?(?:my\s+)?"
+        r"(?:order\s+)?(?:number\s+|no\s+|#\s*)?(?P<order_number>ord-?\s?\d+)(?:\s+(?:status|details))?",
+        "get_order_details",
+        _order_lookup
+    ),
+    Rule(
+        "orders_by_status",
+        _VERB + _ALL + _STATUS + r"\s+orders",
+        "search_orders",
+        _orders_by_status
+    ),
+    Rule(
+        "orders_with_status",
+        _VERB + _ALL + r"orders\s+(?:that are\s+|which are\s+|with status\s+|in\s+)?" + _STATUS,
+        "search_orders",
+        _orders_by_status
+    ),
+    Rule(
+        "orders_for_customer",
+        _VERB + _ALL + r"orders\s+(?:for|from|by|of|placed by)\s+"
+        r"(?P<customer_name>[a-z][a-z.'-]*(?:\s[a-z][a-z.'-]*){0,2})",
+        "search_orders",
+        _orders_for_customer
+    ),
+    Rule(
+        "all_orders",
+        _VERB + _ALL + r"orders",
+        "search_orders",
+        lambda slots: {}
+    ),
+    Rule(
+        "products_question",
+        r"what\s+(?:products\s+|items\s+|(?P<category>[a-z]+)\s+(?:(?:products|items)\s+)?)?"
+        r"do\s+you\s+(?:have|sell|carry)" + _PRICE,
+        "search_products",
+        _products
+    ),
+    Rule(
+        "products",
+        _VERB + _ALL + r"(?:products|items|(?P<category>[a-z]+)(?:\s+(?:products|items))?)" + _PRICE,
+        "search_products",
+        _products
+    ),
+]
+
+
+def clean_message(message: str) -> str:
+    """Lowercase, strip trailing punctuation and polite filler."""
+    text = message.lower().strip()
+    text = re.sub(r"[?!.,;:]+$", "", text).strip()
+    text = FILLER.sub("", text).strip()
+    return re.sub(r"\s+", " ", text)
+
+
+def route_message(message: str, min_confidence: float = FAST_PATH_MIN_CONFIDENCE) -> Optional[FastPathMatch]:
+    """
+    Map a message onto a read tool call, or return None to use the LLM.
+
+    Confidence is the share of the cleaned message covered by the rule's
+    match, so extra clauses ("...and why is it late?") send it to the LLM.
+    """
+    text = clean_message(message)
+    if not text or MUTATION_WORDS.search(text):
+        return None
+
+    best: Optional[FastPathMatch] = None
+
+    for rule in RULES:
+        for m in rule.pattern.finditer(text):
+            if m.end() == m.start():
+                continue
+
+            confidence = round((m.end() - m.start()) / len(text), 3)
+            if confidence < min_confidence or (best and confidence <= best.confidence):
+                continue
+
+            slots = {k: v for k, v in m.groupdict().items() if v}
+            tool_args = rule.build_args(slots)
+            if tool_args is not None:
+                best = FastPathMatch(rule.name, rule.tool_name, tool_args, confidence)
+
+    return best
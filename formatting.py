@@ -0,0 +1,153 @@
+"""
+Deterministic rendering of tool results and confirmation prompts.
+Shared by both agent implementations so they present data the same way.
+"""
+from typing import Any, Dict, List
+import json
+
+from tool_results import ToolResult
+from result_shaping import shape_for_llm
+from tools import preview_affected_rows
+
+
+def format_order(order: dict) -> str:
+    """Format one order row, rendering only the columns it contains."""
+    output = f"**Order {order['order_number']}**\n"
+    if "customer_name" in order:
+        output += f"  - Customer: {order['customer_name']}\n"
+    if "product_name" in order:
+        output += f"  - Product: {order['product_name']}\n"
+    if "quantity" in order:
+        output += f"  - Quantity: {order['quantity']}\n"
+    if "price" in order:
+        output += f"  - Price: ${order['price']:.2f}\n"
+    if "status" in order:
+        output += f"  - Status: {order['status']}\n"
+    return output
+
+
+def format_product(product: dict) -> str:
+    """Format one product row, rendering only the columns it contains."""
+    output = f"**{product['product_name']}**\n"
+    if "price" in product:
+        output += f"  - Price: ${product['price']:.2f}\n"
+    if "stock" in product:
+        output += f"  - Stock: {product['stock']} units\n"
+    if "category" in product:
+        output += f"  - Category: {product['category']}\n"
+    if product.get('description'):
+        output += f"  - Description: {product['description']}\n"
+    return output
+
+
+def format_truncation(result_data: dict) -> str:
+    """Describe the rows left out of a truncated or paged result."""
+    if "next_offset" not in result_data:
+        return ""
+
+    if result_data.get("truncated"):
+        summary = result_data["omitted_summary"]
+    else:
+        # A full page from the search tool, with more matches after it
+        summary = result_data.get("remaining_summary") or {
+            "count": result_data["total"] - result_data["next_offset"]
+        }
+
+    output = f"...and {summary['count']} more not shown.\n"
+    for key in ("by_status", "by_category"):
+        if key in summary:
+            counts = ", ".join(f"{name}: {count}" for name, count in summary[key].items())
+            output += f"  - {key[3:].title()}: {counts}\n"
+    if "price_range" in summary:
+        output += f"  - Price range: ${summary['price_range']['min']:.2f} - ${summary['price_range']['max']:.2f}\n"
+    output += f"  - Ask for more to see the next rows (offset {result_data['next_offset']}).\n"
+    return output
+
+
+def format_result(result_data: dict) -> str:
+    """Format a successful tool result for display."""
+    if "orders" in result_data:
+        # Format orders
+        orders = result_data["orders"]
+        output = f"Found {result_data.get('total', len(orders))} order(s):\n\n"
+        for order in orders:
+            output += format_order(order) + "\n"
+        return output + format_truncation(result_data)
+
+    elif "products" in result_data:
+        # Format products
+        products = result_data["products"]
+        output = f"Found {result_data.get('total', len(products))} product(s):\n\n"
+        for product in products:
+            output += format_product(product) + "\n"
+        return output + format_truncation(result_data)
+
+    elif "order" in result_data:
+        # Format single order
+        output = format_order(result_data["order"])
+        if result_data.get("message"):
+            output += f"\n✅ {result_data['message']}"
+        return output
+
+    elif "product" in result_data:
+        # Format single product
+        output = format_product(result_data["product"])
+        if result_data.get("message"):
+            output += f"\n✅ {result_data['message']}"
+        return output
+
+    elif result_data.get("message"):
+        return f"✅ {result_data['message']}"
+
+    else:
+        return f"Operation completed: {json.dumps(result_data, indent=2)}"
+
+
+def format_tool_result(result: ToolResult) -> str:
+    """Format a tool result for display, including failures."""
+    if result.success:
+        return format_result(result.to_dict())
+    return f"⚠️ {result.message or 'Operation failed'}"
+
+
+def render_tool_result(result: ToolResult) -> tuple:
+    """Return (display text, history text) for a tool result."""
+    formatted = format_tool_result(result)
+    if not result.success:
+        return formatted, formatted
+
+    # History keeps a version capped to the LLM token budget
+    shaped = shape_for_llm(result)
+    if shaped is not result:
+        return formatted, format_tool_result(shaped)
+    return formatted, formatted
+
+
+def format_confirmation(actions: List[Dict[str, Any]]) -> str:
+    """
+    Build the confirmation prompt for one or more destructive actions.
+
+    Each action is a dict with 'tool_name' and 'tool_args'.
+    """
+    if len(actions) == 1:
+        tool_name = actions[0]["tool_name"]
+        tool_args = actions[0]["tool_args"]
+        affected = preview_affected_rows(tool_name, tool_args)
+        affected_line = f"\n**Affected records**: {affected}" if affected is not None else ""
+        return f"""I'm about to perform the following action:
+
+**Action**: {tool_name.replace('_', ' ').title()}
+**Details**: {json.dumps(tool_args, indent=2)}{affected_line}
+
+This action will modify your data. Would you like me to proceed? (Please confirm with 'yes' or 'no')"""
+
+    output = f"I'm about to perform the following {len(actions)} actions:\n\n"
+    for i, action in enumerate(actions, 1):
+        tool_name = action["tool_name"]
+        affected = preview_affected_rows(tool_name, action["tool_args"])
+        output += f"{i}. **Action**: {tool_name.replace('_', ' ').title()}\n"
+        output += f"   **Details**: {json.dumps(action['tool_args'])}\n"
+        if affected is not None:
+            output += f"   **Affected records**: {affected}\n"
+    output += "\nThese actions will modify your data. Would you like me to proceed with all of them? (Please confirm with 'yes' or 'no')"
+    return output
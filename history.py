@@ -0,0 +1,211 @@
+"""
+Token-budgeted conversation history for the agents.
+
+The history sent to the LLM is cut down to the system prompt plus the most
+recent whole turns that fit a token budget. Turns that fall out of the
+window are folded into a short rolling summary, so names, order numbers and
+requests from earlier in the conversation stay available without resending
+every message. The turn with a pending confirmation is always kept.
+
+A turn starts at a user message and includes everything up to the next one,
+so an AI tool call is never separated from its tool results.
+"""
+from collections import deque
+from typing import Any, Dict, List, Optional
+import re
+from langchain_core.messages import (
+    BaseMessage, HumanMessage, SystemMessage, ToolMessage, messages_from_dict, messages_to_dict
+)
+from result_shaping import estimate_tokens
+
+# Budget for the messages kept verbatim (system prompt and summary excluded)
+HISTORY_TOKEN_BUDGET = 3000
+
+# Budget for the rolling summary of older turns
+SUMMARY_TOKEN_BUDGET = 400
+
+# Characters of each folded message kept in the summary
+SUMMARY_SNIPPET_CHARS = 160
+
+# Number of recent LLM prompts whose sizes are kept as metrics
+METRICS_WINDOW = 50
+
+# Identifiers worth keeping verbatim even when a message is cut short
+REFERENCE_PATTERN = re.compile(r"\bORD-\d+\b")
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimate the prompt tokens of one message, including tool calls."""
+    tokens = estimate_tokens(message.content or "") + MESSAGE_OVERHEAD_TOKENS
+    for call in getattr(message, "tool_calls", None) or ():
+        tokens += estimate_tokens({"name": call["name"], "args": call["args"]})
+    return tokens
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _snippet(message: BaseMessage) -> Optional[str]:
+    """One summary line for a message, or None if it adds nothing."""
+    if isinstance(message, ToolMessage):
+        return None  # The AI message answering from it is summarized instead
+
+    text = re.sub(r"\s+", " ", message.content or "").strip()
+    if not text:
+        calls = getattr(message, "tool_calls", None) or ()
+        if not calls:
+            return None
+        text = "called " + ", ".join(f"{c['name']}({c['args']})" for c in calls)
+
+    if len(text) > SUMMARY_SNIPPET_CHARS:
+        references = [ref for ref in REFERENCE_PATTERN.findall(text) if ref not in text[:SUMMARY_SNIPPET_CHARS]]
+        text = text[:SUMMARY_SNIPPET_CHARS].rstrip() + "..."
+        if references:
+            text += " (also mentions " + ", ".join(dict.fromkeys(references)) + ")"
+
+    role = "User" if isinstance(message, HumanMessage) else "Assistant"
+    return f"{role}: {text}"
+
+
+def dump_messages(messages: List[BaseMessage]) -> List[Dict[str, Any]]:
+    """Messages as plain data, without the empty fields LangChain fills in."""
+    return [
+        {"type": item["type"], "data": {k: v for k, v in item["data"].items() if k == "content" or (v and k != "type")}}
+        for item in messages_to_dict(messages)
+    ]
+
+
+def load_messages(data: List[Dict[str, Any]]) -> List[BaseMessage]:
+    """Messages from what dump_messages returned."""
+    return messages_from_dict(data)
+
+
+class ConversationHistory:
+    """Keeps one conversation's history within a token budget."""
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self._summary_lines: List[str] = []
+        self.folded_messages = 0
+        self.prompt_metrics = deque(maxlen=METRICS_WINDOW)
+
+    @property
+    def summary(self) -> str:
+        """Rolling summary of the turns no longer kept verbatim."""
+        return "\n".join(self._summary_lines)
+
+    def summary_message(self) -> Optional[SystemMessage]:
+        """The summary as a system message, or None when nothing was folded."""
+        if not self._summary_lines:
+            return None
+        return SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}")
+
+    def _fold(self, turns: List[List[BaseMessage]]):
+        for turn in turns:
+            for message in turn:
+                line = _snippet(message)
+                if line:
+                    self._summary_lines.append(line)
+                self.folded_messages += 1
+
+        # Oldest summary lines go first once the summary is over budget
+        while self._summary_lines and estimate_tokens(self.summary) > self.summary_budget:
+            self._summary_lines.pop(0)
+
+    def compact(self, messages: List[BaseMessage], keep_turns: int = 1) -> List[BaseMessage]:
+        """
+        Trim `messages` in place to the turns that fit the token budget.
+
+        The newest `keep_turns` turns are always kept (pass 2 while a
+        confirmation is pending, so the turn that asked for it survives).
+        Returns the list for convenience.
+        """
+        turns = split_turns(messages)
+        kept = 0
+        used = 0
+
+        for turn in reversed(turns):
+            tokens = sum(message_tokens(m) for m in turn)
+            if kept >= keep_turns and used + tokens > self.token_budget:
+                break
+            kept += 1
+            used += tokens
+
+        dropped = turns[:len(turns) - kept]
+        if dropped:
+            self._fold(dropped)
+            del messages[:sum(len(turn) for turn in dropped)]
+
+        return messages
+
+    def build_prompt(self, system_message: SystemMessage, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """System prompt, rolling summary (if any) and the kept messages."""
+        summary = self.summary_message()
+        return [system_message] + ([summary] if summary else []) + list(messages)
+
+    def record_prompt(self, prompt: List[BaseMessage], tool_tokens: int = 0, tool_tokens_saved: int = 0) -> Dict[str, Any]:
+        """
+        Record the size of a prompt about to be sent and return its metrics.
+
+        `tool_tokens` is the size of the bound tool schemas (included in
+        prompt_tokens) and `tool_tokens_saved` what binding a subset instead
+        of every tool saved.
+        """
+        metrics = {
+            "messages": len(prompt),
+            "prompt_tokens": sum(message_tokens(m) for m in prompt) + tool_tokens,
+            "tool_tokens": tool_tokens,
+            "tool_tokens_saved": tool_tokens_saved,
+            "summary_tokens": estimate_tokens(self.summary) if self._summary_lines else 0,
+            "folded_messages": self.folded_messages
+        }
+        self.prompt_metrics.append(metrics)
+        return metrics
+
+    def stats(self) -> Dict[str, Any]:
+        """Prompt-size metrics for the recent LLM calls."""
+        sizes = [m["prompt_tokens"] for m in self.prompt_metrics]
+        return {
+            "token_budget": self.token_budget,
+            "summary_budget": self.summary_budget,
+            "folded_messages": self.folded_messages,
+            "summary_lines": len(self._summary_lines),
+            "prompts": len(sizes),
+            "last_prompt_tokens": sizes[-1] if sizes else None,
+            "max_prompt_tokens": max(sizes) if sizes else None,
+            "avg_prompt_tokens": round(sum(sizes) / len(sizes), 1) if sizes else None,
+            "last_tool_tokens_saved": self.prompt_metrics[-1]["tool_tokens_saved"] if sizes else None,
+            "tool_tokens_saved": sum(m["tool_tokens_saved"] for m in self.prompt_metrics)
+        }
+
+    def export_state(self) -> Dict[str, Any]:
+        """The summary and metrics as plain data (see load_state)."""
+        return {
+            "summary_lines": list(self._summary_lines),
+            "folded_messages": self.folded_messages,
+            "prompt_metrics": list(self.prompt_metrics)
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        """Restore what export_state returned."""
+        self._summary_lines = list(state["summary_lines"])
+        self.folded_messages = state["folded_messages"]
+        self.prompt_metrics.clear()
+        self.prompt_metrics.extend(state["prompt_metrics"])
+
+    def reset(self):
+        """Forget the summary and metrics."""
+        self._summary_lines = []
+        self.folded_messages = 0
+        self.prompt_metrics.clear()
@@ -0,0 +1,256 @@
+"""
+Local intent classifier used before falling back to the LLM.
+
+A multinomial naive Bayes model over hashed word, word-bigram and character
+trigram features, trained at import time from the bundled labelled examples
+below (seeded with the examples in agent.py's INTENT_DETECTION_SYSTEM and
+expanded from verb/object templates).
+Scoring a message is one sparse dot product, so it takes microseconds. The
+caller falls back to the LLM when the confidence is below its threshold.
+"""
+from typing import Dict, List, Sequence, Tuple
+import re
+import threading
+import zlib
+
+import numpy as np
+
+# Number of hashed feature dimensions
+DIMENSIONS = 4096
+
+# Laplace smoothing of the per-intent feature counts
+ALPHA = 0.3
+
+# Naive Bayes is overconfident on long messages (its features are far from
+# independent), so scores are averaged per feature and then sharpened by this
+CALIBRATION_SCALE = 5.0
+
+# Predictions below this probability are handed to the LLM
+INTENT_MIN_CONFIDENCE = 0.75
+
+INTENTS = ("READ", "CREATE", "UPDATE", "DELETE", "GENERAL")
+
+TRAINING_EXAMPLES: List[Tuple[str, str]] = [
+    # READ
+    ("Show me my orders", "READ"),
+    ("What products do you have?", "READ"),
+    ("Check order status", "READ"),
+    ("Show me all orders", "READ"),
+    ("Find orders for John Doe", "READ"),
+    ("Show me electronics under $500", "READ"),
+    ("Check order ORD-1001", "READ"),
+    ("Where is my order?", "READ"),
+    ("What's the status of ORD-1042", "READ"),
+    ("List all products in accessories", "READ"),
+    ("How much does the laptop cost?", "READ"),
+    ("Is the wireless mouse in stock?", "READ"),
+    ("Do you sell keyboards", "READ"),
+    ("Which orders are still processing?", "READ"),
+    ("Look up the details of my last order", "READ"),
+    ("How many monitors do you have left", "READ"),
+    ("Track my package", "READ"),
+    ("Find a cheap gaming keyboard", "READ"),
+    ("Show shipped orders", "READ"),
+    ("what is the price of the 4K monitor", "READ"),
+    ("search for products under 100 dollars", "READ"),
+    ("view order details", "READ"),
+    # CREATE
+    ("I want to place an order", "CREATE"),
+    ("Add this to my cart", "CREATE"),
+    ("Create a new order", "CREATE"),
+    ("I want to place an order for a Laptop Pro 15", "CREATE"),
+    ("Create an order for 2 Wireless Mouse for Jane Smith", "CREATE"),
+    ("Add a new product: Tablet Pro, $599, 50 units", "CREATE"),
+    ("I'd like to buy a gaming keyboard", "CREATE"),
+    ("Order 3 USB-C hubs for Bob", "CREATE"),
+    ("Please purchase a 4K monitor for me", "CREATE"),
+    ("Add a product called Desk Lamp to the catalog", "CREATE"),
+    ("I want to order two mice", "CREATE"),
+    ("Can I buy the laptop?", "CREATE"),
+    ("Put in an order for Alice for one monitor", "CREATE"),
+    ("new order for John Doe", "CREATE"),
+    ("list a new item in the store priced at 20 dollars", "CREATE"),
+    # UPDATE
+    ("Change my order status", "UPDATE"),
+    ("Update the price", "UPDATE"),
+    ("Modify the quantity", "UPDATE"),
+    ("Change order ORD-1001 status to Shipped", "UPDATE"),
+    ("Update Laptop Pro 15 price to $1199", "UPDATE"),
+    ("Set stock for Wireless Mouse to 200", "UPDATE"),
+    ("Mark ORD-1003 as delivered", "UPDATE"),
+    ("Raise the price of the keyboard by 10 percent", "UPDATE"),
+    ("Discount all accessories by 15%", "UPDATE"),
+    ("Restock the monitors to 50 units", "UPDATE"),
+    ("Set the status of my order to shipped", "UPDATE"),
+    ("Lower the mouse price to 25 dollars", "UPDATE"),
+    ("Edit the stock level of the USB-C hub", "UPDATE"),
+    ("Mark all processing orders as shipped", "UPDATE"),
+    ("adjust the price of the laptop", "UPDATE"),
+    # DELETE
+    ("Cancel my order", "DELETE"),
+    ("Remove this product", "DELETE"),
+    ("Delete the item", "DELETE"),
+    ("Cancel order ORD-1002", "DELETE"),
+    ("Remove Gaming Keyboard from catalog", "DELETE"),
+    ("I don't want my order anymore, cancel it", "DELETE"),
+    ("Delete the wireless mouse product", "DELETE"),
+    ("Please cancel ORD-1042", "DELETE"),
+    ("Take the 4K monitor off the store", "DELETE"),
+    ("Discontinue the USB-C hub", "DELETE"),
+    ("cancel the order for Jane Smith", "DELETE"),
+    ("get rid of that product listing", "DELETE"),
+    ("drop the laptop from the catalog", "DELETE"),
+    # GENERAL
+    ("Hello", "GENERAL"),
+    ("Can you help me?", "GENERAL"),
+    ("Thank you", "GENERAL"),
+    ("Hi there", "GENERAL"),
+    ("Good morning", "GENERAL"),
+    ("What can you do?", "GENERAL"),
+    ("Thanks a lot, bye", "GENERAL"),
+    ("Who are you?", "GENERAL"),
+    ("How does this work", "GENERAL"),
+    ("That's great, thanks for your help", "GENERAL"),
+    ("What is your return policy?", "GENERAL"),
+    ("Are you a bot?", "GENERAL"),
+    ("hey", "GENERAL"),
+    ("I have a question", "GENERAL"),
+    ("goodbye", "GENERAL"),
+]
+
+
+# Verb phrases x objects expanded into more training examples per intent
+TEMPLATES: Dict[str, Tuple[List[str], List[str]]] = {
+    "READ": (
+        ["show me", "list", "find", "check", "what is", "where is", "look up", "search for",
+         "do you have", "how much is", "track", "view", "display", "can you show me", "i need to see"],
+        ["my orders", "order ORD-1001", "the status of my order", "your products", "electronics under $500",
+         "the wireless mouse", "stock of the monitor", "shipped orders", "orders for Jane Smith", "accessories",
+         "the price of the laptop"]
+    ),
+    "CREATE": (
+        ["i want to order", "place an order for", "buy", "purchase", "create an order for", "i'd like to get",
+         "order", "i want to buy", "can i order", "add to my cart"],
+        ["a laptop", "2 wireless mice", "the gaming keyboard", "a 4K monitor for Jane Smith",
+         "three USB-C hubs", "one monitor for John Doe"]
+    ),
+    "UPDATE": (
+        ["change", "update", "set", "modify", "adjust", "edit", "raise", "lower", "increase", "reduce"],
+        ["the status of ORD-1001 to shipped", "the price of the mouse to $25", "stock for the keyboard to 200",
+         "my order quantity", "the laptop price", "order ORD-1003 to delivered", "accessory prices by 10%"]
+    ),
+    "DELETE": (
+        ["cancel", "remove", "delete", "discontinue", "drop", "get rid of", "please cancel", "i want to cancel"],
+        ["my order", "order ORD-1002", "the gaming keyboard from the catalog", "this product",
+         "the order for Jane Smith", "the USB-C hub listing"]
+    ),
+}
+
+
+def _expand_templates() -> List[Tuple[str, str]]:
+    return [
+        (f"{verb} {obj}", intent)
+        for intent, (verbs, objects) in TEMPLATES.items()
+        for verb in verbs
+        for obj in objects
+    ]
+
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes (unlike hash())
+    return zlib.crc32(feature.encode()) % DIMENSIONS
+
+
+def features(text: str) -> Dict[int, float]:
+    """Hashed counts of word, word-bigram and character trigram features."""
+    text = re.sub(r"\bord-?\s?\d+\b", "ordnum", text.lower())
+    text = re.sub(r"\$?\d+(?:\.\d+)?%?", "num", text)
+    words = re.findall(r"[a-z']+", text)
+
+    counts: Dict[int, float] = {}
+    grams = ["w:" + w for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(["^"] + words, words + ["$"])]
+    for word in words:
+        padded = f"<{word}>"
+        grams += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    for gram in grams:
+        key = _bucket(gram)
+        counts[key] = counts.get(key, 0.0) + 1.0
+    return counts
+
+
+class IntentPrediction:
+    """The most likely intent of a message and its probability."""
+
+    def __init__(self, intent: str, confidence: float, scores: Dict[str, float]):
+        self.intent = intent
+        self.confidence = confidence
+        self.scores = scores
+
+    def __repr__(self) -> str:
+        return f"IntentPrediction({self.intent!r}, confidence={self.confidence})"
+
+
+class IntentClassifier:
+    """Multinomial naive Bayes over hashed n-gram features."""
+
+    def __init__(self, examples: Sequence[Tuple[str, str]] = None, intents: Sequence[str] = INTENTS):
+        self.intents = tuple(intents)
+        self._lock = threading.Lock()
+        self.local = 0
+        self.fallbacks = 0
+        self.fit(TRAINING_EXAMPLES + _expand_templates() if examples is None else examples)
+
+    def fit(self, examples: Sequence[Tuple[str, str]]):
+        """Train on (message, intent) pairs."""
+        counts = np.zeros((len(self.intents), DIMENSIONS))
+
+        for text, intent in examples:
+            row = self.intents.index(intent)
+            for key, value in features(text).items():
+                counts[row, key] += value
+
+        # Uniform priors: the templated examples over-represent some intents
+        counts += ALPHA
+        self._log_likelihood = np.log(counts / counts.sum(axis=1, keepdims=True))
+
+    def predict(self, message: str) -> IntentPrediction:
+        """Score a message against every intent."""
+        counts = features(message)
+        keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+        log_scores = self._log_likelihood[:, keys] @ values * (CALIBRATION_SCALE / values.sum())
+        probabilities = np.exp(log_scores - log_scores.max())
+        probabilities /= probabilities.sum()
+
+        best = int(probabilities.argmax())
+        return IntentPrediction(
+            self.intents[best],
+            round(float(probabilities[best]), 3),
+            {intent: round(float(p), 3) for intent, p in zip(self.intents, probabilities)}
+        )
+
+    def record(self, used_local: bool):
+        """Count whether a prediction was used or handed to the LLM."""
+        with self._lock:
+            if used_local:
+                self.local += 1
+            else:
+                self.fallbacks += 1
+
+    def stats(self) -> Dict[str, object]:
+        """How often the local prediction was confident enough to use."""
+        with self._lock:
+            total = self.local + self.fallbacks
+            return {
+                "local": self.local,
+                "llm_fallbacks": self.fallbacks,
+                "local_rate": round(self.local / total, 3) if total else None,
+                "min_confidence": INTENT_MIN_CONFIDENCE
+            }
+
+
+# Global classifier shared by all agents
+intent_classifier = IntentClassifier()
@@ -0,0 +1,244 @@
+"""
+Process-wide registry of LLM clients shared by every session and graph node.
+
+Building a ChatOpenAI per session (or per message) creates new HTTP clients,
+throws away keep-alive connections and re-converts the tool schemas on every
+bind_tools() call. The registry builds each model client once, on top of one
+pair of pooled httpx clients, and caches the tool-bound variants.
+
+Pooled async connections belong to the event loop that opened them, and
+callers don't all share one loop (asyncio.run() in the CLI, a loop per
+request in older app.py versions), so the async client keeps a separate
+pool per running loop.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+import asyncio
+import threading
+import weakref
+import httpx
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_openai import ChatOpenAI
+from result_shaping import estimate_tokens
+from accounting import accounting_handler
+from fake_llm import build_offline_model, llm_mode
+
+# Connection pool limits shared by all LLM clients
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60.0
+
+
+class ConnectionStats:
+    """Counts HTTP requests and newly opened connections to measure reuse."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the counters and the share of requests that reused a connection."""
+        with self._lock:
+            requests, new_connections = self.requests, self.new_connections
+        reused = max(requests - new_connections, 0)
+        return {
+            "requests": requests,
+            "new_connections": new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / requests, 3) if requests else None
+        }
+
+
+connection_stats = ConnectionStats()
+
+
+def _trace(event_name: str, info: dict):
+    if event_name == "connection.connect_tcp.complete":
+        connection_stats.record_connection()
+
+
+async def _atrace(event_name: str, info: dict):
+    _trace(event_name, info)
+
+
+def _on_request(request: httpx.Request):
+    connection_stats.record_request()
+    request.extensions["trace"] = _trace
+
+
+async def _on_async_request(request: httpx.Request):
+    connection_stats.record_request()
+    request.extensions["trace"] = _atrace
+
+
+class PerLoopAsyncClient(httpx.AsyncClient):
+    """
+    An httpx.AsyncClient that sends through a separate pooled client per event loop.
+
+    Reusing a connection opened on another loop fails (with "Event loop is
+    closed" once that loop is gone), so each running loop gets its own pool.
+    Pools of closed loops are dropped.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client_kwargs = kwargs
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._loop_lock = threading.Lock()
+
+    def client_for_running_loop(self) -> httpx.AsyncClient:
+        """The pooled client of the running event loop (created on first use)."""
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            client = self._loop_clients.get(loop)
+            if client is None:
+                for other in [other for other in self._loop_clients if other.is_closed()]:
+                    # Its connections can't be closed without their loop; just let them go
+                    del self._loop_clients[other]
+                client = self._loop_clients[loop] = httpx.AsyncClient(**self._client_kwargs)
+            return client
+
+    @property
+    def loop_pools(self) -> int:
+        with self._loop_lock:
+            return len(self._loop_clients)
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self.client_for_running_loop().send(request, **kwargs)
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            client = self._loop_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+        await super().aclose()
+
+
+_lock = threading.Lock()
+_http_clients: Dict[str, Any] = {}
+_models: Dict[Tuple[str, float], ChatOpenAI] = {}
+_bound_models: Dict[Tuple[str, float, Tuple[str, ...]], Any] = {}
+_schema_tokens: Dict[Tuple[str, ...], int] = {}
+
+# Builds chat models instead of ChatOpenAI when set, e.g. fake_llm.use_offline_models()
+_model_factory: Optional[Callable] = None
+
+
+def _get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Create the shared, pooled sync and async httpx clients on first use."""
+    if not _http_clients:
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+        _http_clients["sync"] = httpx.Client(limits=limits, event_hooks={"request": [_on_request]})
+        _http_clients["async"] = PerLoopAsyncClient(limits=limits, event_hooks={"request": [_on_async_request]})
+    return _http_clients["sync"], _http_clients["async"]
+
+
+def _build_openai(model: str, temperature: float, callbacks: Optional[list]) -> ChatOpenAI:
+    http_client, http_async_client = _get_http_clients()
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        stream_usage=True,  # Token usage for streamed responses too
+        max_retries=0,  # Retries, deadlines and hedging come from call_policy.py
+        callbacks=callbacks
+    )
+
+
+def _build_model(model: str, temperature: float):
+    # A recording's upstream model is not accounted: the recording model is
+    upstream = lambda: _build_openai(model, temperature, None)
+    if _model_factory is not None:
+        return _model_factory(model, temperature, [accounting_handler], upstream)
+
+    mode = llm_mode()
+    if mode != "openai":
+        return build_offline_model(
+            mode, model, [accounting_handler], upstream=upstream() if mode == "record" else None
+        )
+    return _build_openai(model, temperature, [accounting_handler])
+
+
+def get_llm(model: str = "gpt-4o", temperature: float = 0) -> ChatOpenAI:
+    """Return the shared chat model client for a model/temperature pair."""
+    key = (model, temperature)
+    with _lock:
+        if key not in _models:
+            _models[key] = _build_model(model, temperature)
+        return _models[key]
+
+
+def set_model_factory(factory: Optional[Callable]):
+    """
+    Build chat models with `factory(model, temperature, callbacks, upstream)`
+    instead of ChatOpenAI (None restores ChatOpenAI). `upstream()` builds the
+    real client. Models built so far are dropped from the registry.
+    """
+    global _model_factory
+    with _lock:
+        _model_factory = factory
+        _models.clear()
+        _bound_models.clear()
+
+
+def requires_api_key() -> bool:
+    """Whether the selected LLM backend calls OpenAI (everything but fake/replay)."""
+    return _model_factory is None and llm_mode() in ("openai", "record")
+
+
+def get_llm_with_tools(tools: Sequence, model: str = "gpt-4o", temperature: float = 0):
+    """Return the shared chat model with `tools` bound, converting the schemas only once."""
+    key = (model, temperature, tuple(t.name for t in tools))
+    llm = get_llm(model, temperature)
+    if not tools:
+        return llm
+    with _lock:
+        if key not in _bound_models:
+            _bound_models[key] = llm.bind_tools(list(tools))
+        return _bound_models[key]
+
+
+def prebuild_tool_variants(tool_sets: Iterable[Sequence], model: str = "gpt-4o", temperature: float = 0):
+    """Bind every tool subset up front so no request pays for the schema conversion."""
+    for tools in tool_sets:
+        get_llm_with_tools(tools, model, temperature)
+        tool_schema_tokens(tools)
+
+
+def tool_schema_tokens(tools: Sequence) -> int:
+    """Estimated prompt tokens the JSON schemas of `tools` add to every call."""
+    key = tuple(t.name for t in tools)
+    with _lock:
+        if key not in _schema_tokens:
+            _schema_tokens[key] = sum(estimate_tokens(convert_to_openai_tool(t)) for t in tools)
+        return _schema_tokens[key]
+
+
+def client_stats() -> Dict[str, Any]:
+    """Registry size and connection-reuse metrics, e.g. for the health endpoint."""
+    with _lock:
+        models = [f"{model}@{temperature}" for model, temperature in _models]
+        bound_variants = len(_bound_models)
+        async_client = _http_clients.get("async")
+    return {
+        "models": models,
+        "bound_tool_variants": bound_variants,
+        "async_loop_pools": async_client.loop_pools if async_client is not None else 0,
+        "connections": connection_stats.snapshot()
+    }
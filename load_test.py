@@ -0,0 +1,293 @@
+"""
+Load generator for the web API (/api/chat and /api/reset).
+
+Every virtual user is a separate cookie session that replays multi-turn
+conversation scripts (browsing, order lookups, changes that are confirmed or
+declined, small talk) with think time between turns, and resets its
+conversation at the end of each script.
+
+- Closed loop (--users N): N sessions run scripts back to back, so load
+  adapts to the server's speed
+- Open loop (--rate R): new sessions arrive as a Poisson process at R per
+  second regardless of how the server keeps up, which exposes queueing
+
+Without --url, app.py is started in-process on a scratch copy of the
+database with the offline model from fake_llm.py (LLM_MODE=fake unless set),
+so no API key or network is needed.
+
+Usage:
+    python load_test.py --users 500 --duration 60
+    python load_test.py --rate 20 --duration 60 --latency lognormal:0.8:0.5
+    python load_test.py --users 50 --url http://localhost:5000 --json results.json
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import httpx
+
+# Conversation scripts and how often users pick them
+SCRIPTS: Dict[str, Tuple[float, List[str]]] = {
+    "browse": (0.30, ["Show me all products", "Show me accessories", "How much is the 4K Monitor?"]),
+    "order_status": (0.25, ["Check order ORD-1001", "Show me orders that are processing"]),
+    "update_confirmed": (0.10, ["Mark ORD-1003 as delivered", "yes"]),
+    "cancel_declined": (0.10, ["Cancel order ORD-1002", "no"]),
+    "place_order": (0.10, ["Order 1 USB-C Hub for Load Tester", "yes"]),
+    "small_talk": (0.15, ["Hello", "What can you do?", "Thanks, bye"]),
+}
+
+# Mean think time between turns of one user, in seconds (exponentially distributed)
+DEFAULT_THINK_TIME = 1.0
+
+# Per-request timeout, in seconds
+DEFAULT_TIMEOUT = 60.0
+
+
+# ==================== METRICS ====================
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..1)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LoadStats:
+    """Latencies and errors per endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.sessions_started = 0
+        self.sessions_completed = 0
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str] = None):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if error:
+            counts = self.errors.setdefault(endpoint, {})
+            counts[error] = counts.get(error, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """Throughput, latency percentiles and error rates, overall and per endpoint."""
+        def describe(latencies: List[float], errors: Dict[str, int]) -> Dict[str, Any]:
+            failed = sum(errors.values())
+            return {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+                "p50_ms": _ms(percentile(latencies, 0.50)),
+                "p95_ms": _ms(percentile(latencies, 0.95)),
+                "p99_ms": _ms(percentile(latencies, 0.99)),
+                "max_ms": _ms(max(latencies) if latencies else None),
+                "errors": failed,
+                "error_rate": round(failed / len(latencies), 4) if latencies else None,
+                "error_kinds": errors
+            }
+
+        all_latencies = [s for values in self.latencies.values() for s in values]
+        all_errors: Dict[str, int] = {}
+        for counts in self.errors.values():
+            for kind, count in counts.items():
+                all_errors[kind] = all_errors.get(kind, 0) + count
+
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "sessions_started": self.sessions_started,
+            "sessions_completed": self.sessions_completed,
+            "overall": describe(all_latencies, all_errors),
+            "endpoints": {
+                endpoint: describe(latencies, self.errors.get(endpoint, {}))
+                for endpoint, latencies in sorted(self.latencies.items())
+            }
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+# ==================== VIRTUAL USERS ====================
+
+class VirtualUser:
+    """One cookie session replaying conversation scripts."""
+
+    def __init__(self, base_url: str, stats: LoadStats, rng: random.Random, think_time: float, timeout: float):
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+        self.stats = stats
+        self.rng = rng
+        self.think_time = think_time
+
+    async def _post(self, endpoint: str, payload: Optional[dict] = None):
+        start = time.monotonic()
+        error = None
+        try:
+            response = await self.client.post(endpoint, json=payload or {})
+            if response.status_code != 200:
+                error = f"http_{response.status_code}"
+            elif "error" in response.json():
+                error = "app_error"
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        self.stats.record(endpoint, time.monotonic() - start, error)
+
+    def pick_script(self) -> List[str]:
+        names = list(SCRIPTS)
+        weights = [SCRIPTS[name][0] for name in names]
+        return SCRIPTS[self.rng.choices(names, weights)[0]][1]
+
+    async def run_script(self, script: List[str]):
+        """Play one conversation, then reset it."""
+        for turn, message in enumerate(script):
+            if turn and self.think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+            await self._post("/api/chat", {"message": message})
+        await self._post("/api/reset")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def closed_loop(base_url: str, stats: LoadStats, users: int, duration: float,
+                      think_time: float, timeout: float, seed: int):
+    """`users` sessions, each running scripts back to back until the time is up."""
+    end = time.monotonic() + duration
+
+    async def user_loop(index: int):
+        user = VirtualUser(base_url, stats, random.Random(seed + index), think_time, timeout)
+        stats.sessions_started += 1
+        try:
+            while time.monotonic() < end:
+                await user.run_script(user.pick_script())
+        finally:
+            await user.close()
+            stats.sessions_completed += 1
+
+    await asyncio.gather(*(user_loop(i) for i in range(users)))
+
+
+async def open_loop(base_url: str, stats: LoadStats, rate: float, duration: float,
+                    think_time: float, timeout: float, seed: int):
+    """New single-script sessions arriving at `rate` per second for `duration` seconds."""
+    rng = random.Random(seed)
+    end = time.monotonic() + duration
+    sessions = []
+
+    async def session(index: int):
+        user = VirtualUser(base_url, stats, random.Random(seed + index), think_time, timeout)
+        try:
+            await user.run_script(user.pick_script())
+        finally:
+            await user.close()
+            stats.sessions_completed += 1
+
+    while time.monotonic() < end:
+        stats.sessions_started += 1
+        sessions.append(asyncio.ensure_future(session(len(sessions))))
+        await asyncio.sleep(rng.expovariate(rate))
+
+    # Let the sessions still in flight finish
+    await asyncio.gather(*sessions)
+
+
+# ==================== IN-PROCESS SERVER ====================
+
+def start_local_server(database: Optional[str]) -> Tuple[str, Any, str]:
+    """Serve app.py on a free local port; returns (base URL, server, scratch directory)."""
+    scratch = tempfile.mkdtemp(prefix="load-test-")
+    db_path = os.path.join(scratch, "ecommerce.db")
+    if database:
+        shutil.copyfile(database, db_path)
+
+    # Must be set before app (and with it database and llm_clients) is imported
+    os.environ["ECOMMERCE_DB"] = db_path
+    os.environ["SESSION_SPILL_DIR"] = os.path.join(scratch, "session_spill")
+    os.environ.setdefault("LLM_MODE", "fake")
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # One log line per request would drown the report
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server, scratch
+
+
+# ==================== REPORT ====================
+
+def print_report(summary: Dict[str, Any]):
+    print("\n" + "=" * 78)
+    print(f"Elapsed {summary['elapsed_seconds']}s, "
+          f"sessions {summary['sessions_started']} started / {summary['sessions_completed']} completed")
+    print("=" * 78)
+    print(f"{'endpoint':<14}{'requests':>9}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    rows = [("overall", summary["overall"])] + list(summary["endpoints"].items())
+    for name, row in rows:
+        print(f"{name:<14}{row['requests']:>9}{row['throughput_rps'] or 0:>9}"
+              f"{row['p50_ms'] or 0:>10}{row['p95_ms'] or 0:>10}{row['p99_ms'] or 0:>10}{row['max_ms'] or 0:>10}"
+              f"{row['error_rate'] or 0:>8.2%}")
+    if summary["overall"]["error_kinds"]:
+        print(f"\nErrors: {summary['overall']['error_kinds']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat web API with many concurrent sessions.")
+    loop = parser.add_mutually_exclusive_group()
+    loop.add_argument("--users", type=int, default=50, help="closed loop: concurrent sessions (default 50)")
+    loop.add_argument("--rate", type=float, help="open loop: new sessions per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to generate load (default 30)")
+    parser.add_argument("--think", type=float, default=DEFAULT_THINK_TIME, help="mean think time between turns")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="per-request timeout in seconds")
+    parser.add_argument("--url", help="base URL of a running server (default: start app.py in-process)")
+    parser.add_argument("--database", help="in-process only: database to copy for the run (default: fresh seed data)")
+    parser.add_argument("--latency", help="in-process only: fake model latency, e.g. lognormal:0.8:0.5")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    server = scratch = None
+    base_url = args.url
+    if base_url is None:
+        if args.latency:
+            os.environ["LLM_LATENCY"] = args.latency
+        base_url, server, scratch = start_local_server(args.database)
+
+    mode = f"open loop, {args.rate} sessions/s" if args.rate else f"closed loop, {args.users} users"
+    print(f"Load testing {base_url} ({mode}) for {args.duration}s...")
+
+    stats = LoadStats()
+    start = time.monotonic()
+    try:
+        if args.rate:
+            run = open_loop(base_url, stats, args.rate, args.duration, args.think, args.timeout, args.seed)
+        else:
+            run = closed_loop(base_url, stats, args.users, args.duration, args.think, args.timeout, args.seed)
+        asyncio.run(run)
+    finally:
+        if server is not None:
+            server.shutdown()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    summary = stats.summary(time.monotonic() - start)
+    summary["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print_report(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
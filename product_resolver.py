@@ -0,0 +1,160 @@
+"""
+In-memory fuzzy resolver for product names.
+
+Destructive tool calls are passed through tools.canonicalize_tool_args
+before the user confirms them, which uses this to turn approximate names
+("the gaming keybaord") into the canonical catalog name locally, instead of
+failing and making the LLM spend extra round trips searching for it. The
+tools themselves only accept exact names and suggest candidates otherwise.
+
+Candidates are found through a trigram index and ranked by trigram overlap
+and edit distance. The index is rebuilt lazily when the products table's
+data version changes (or after an explicit invalidate()).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import threading
+from database import db
+
+# Words that carry no information about which product is meant
+STOPWORDS = {"the", "a", "an", "my", "our", "your", "this", "that"}
+
+# A match is returned as canonical only above this score...
+MIN_SCORE = 0.6
+# ...and when it beats the runner-up by at least this much
+MIN_MARGIN = 0.08
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, drop punctuation and stopwords, collapse whitespace."""
+    name = re.sub(r"[^a-z0-9\s]", "", name.lower())
+    return " ".join(word for word in name.split() if word not in STOPWORDS)
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of text, padded so short words still produce some."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        previous = current
+    return previous[-1]
+
+
+class ProductNameIndex:
+    """Trigram index over product names with edit-distance ranking."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stale = True
+        self._version = None
+        self._names: List[str] = []
+        self._normalized: List[str] = []
+        self._grams: List[set] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._exact: Dict[str, str] = {}
+
+    def invalidate(self):
+        """Mark the index stale; it is rebuilt on the next lookup."""
+        self._stale = True
+
+    def _rebuild(self):
+        self._version = db.data_version("products")
+        names = [row["product_name"] for row in db.execute_query("SELECT product_name FROM products")]
+        normalized = [normalize_name(name) for name in names]
+        grams = [trigrams(n) for n in normalized]
+
+        postings: Dict[str, List[int]] = {}
+        for i, name_grams in enumerate(grams):
+            for gram in name_grams:
+                postings.setdefault(gram, []).append(i)
+
+        self._names = names
+        self._normalized = normalized
+        self._grams = grams
+        self._postings = postings
+        self._exact = {n: name for n, name in zip(normalized, names)}
+        self._stale = False
+
+    def _score(self, query: str, query_grams: set, i: int) -> float:
+        """Blend trigram overlap (Dice) with normalized edit distance."""
+        name = self._normalized[i]
+        shared = len(query_grams & self._grams[i])
+        dice = 2 * shared / (len(query_grams) + len(self._grams[i]))
+        similarity = 1 - edit_distance(query, name) / max(len(query), len(name))
+        return round((dice + similarity) / 2, 3)
+
+    def candidates(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Return up to `limit` (canonical name, score) pairs, best first."""
+        with self._lock:
+            if self._stale or self._version != db.data_version("products"):
+                self._rebuild()
+
+            query = normalize_name(name)
+            if not query:
+                return []
+
+            if query in self._exact:
+                return [(self._exact[query], 1.0)]
+
+            query_grams = trigrams(query)
+            hits: Dict[int, int] = {}
+            for gram in query_grams:
+                for i in self._postings.get(gram, ()):
+                    hits[i] = hits.get(i, 0) + 1
+
+            # Only rank the names sharing the most trigrams with the query
+            shortlist = sorted(hits, key=hits.get, reverse=True)[:limit * 4]
+            ranked = sorted(
+                ((self._names[i], self._score(query, query_grams, i)) for i in shortlist),
+                key=lambda item: item[1],
+                reverse=True
+            )
+            return ranked[:limit]
+
+    def _unique_containing(self, name: str) -> Optional[str]:
+        """Return the only product whose name contains every word of `name`, if any."""
+        words = set(normalize_name(name).split())
+        if not words:
+            return None
+        with self._lock:
+            containing = [
+                self._names[i] for i, n in enumerate(self._normalized)
+                if words <= set(n.split())
+            ]
+        return containing[0] if len(containing) == 1 else None
+
+    def resolve(self, name: str) -> Dict[str, Any]:
+        """
+        Resolve an approximate product name.
+
+        Returns a dict with 'match' (the canonical name, or None when there is
+        no confident match) and the ranked 'candidates'.
+        """
+        ranked = self.candidates(name)
+        match = self._unique_containing(name)
+
+        if ranked and match is None:
+            best_score = ranked[0][1]
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            if best_score >= MIN_SCORE and best_score - runner_up >= MIN_MARGIN:
+                match = ranked[0][0]
+
+        return {"query": name, "match": match, "candidates": ranked}
+
+
+# Global index shared by all tools
+product_index = ProductNameIndex()
@@ -0,0 +1,111 @@
+"""
+Response cache for read-only turns, shared by all sessions.
+
+Entries are keyed by a normalized form of the user's message plus the
+orders/products data version, so any write through tools.py makes older
+entries unreachable. Entries are evicted least-recently-used beyond
+`max_entries` and expire after `ttl_seconds` (which also bounds staleness
+from writes made by other processes).
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import re
+import threading
+import time
+
+from database import db
+from fast_path import clean_message
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 300
+
+# Messages that refer back to earlier turns can't be answered from the cache
+CONTEXT_WORDS = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|he|she|him|her|his|their|"
+    r"same|again|more|previous|last|above|one|ones|next|other)\b"
+)
+
+
+def normalize_query(message: str) -> str:
+    """Normalize a message for use as a cache key."""
+    text = clean_message(message)
+    text = re.sub(r"[^\w$.\- ]", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_cacheable_message(message: str) -> bool:
+    """Whether a message is self-contained enough to share an answer across sessions."""
+    text = normalize_query(message)
+    return bool(text) and not CONTEXT_WORDS.search(text)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry TTL and hit-rate metrics."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, message: str) -> Tuple:
+        """Cache key for a message at the current data version."""
+        return (normalize_query(message), db.data_version())
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Any):
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (metrics are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit-rate metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+# Global cache shared by all agent instances
+response_cache = ResponseCache()
@@ -0,0 +1,132 @@
+"""
+Token-budgeted shaping of tool results before they are sent to the LLM.
+
+Large result sets are cut down to the rows that fit an estimated token
+budget. The rows that were left out are replaced by summary statistics
+(counts by status/category, price range) and a `next_offset` the model can
+pass back to the search tool to see more.
+
+Search tools return one page of rows plus `total`, the number of rows that
+match the whole filter, and a `remaining_summary` of the matches after the
+page, so the hint and its summary cover every remaining match, not only the
+ones on this page.
+"""
+from typing import Any, Dict, List, Optional
+from tool_results import ToolResult, dumps
+
+# Rough average for English/JSON text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+# Default budget for the rows of a single LLM-bound tool result
+LLM_RESULT_TOKEN_BUDGET = 1500
+
+# Result fields that hold lists of rows
+ROW_FIELDS = ("orders", "products")
+
+# Columns summarized as value counts / numeric ranges
+COUNT_COLUMNS = ("status", "category")
+RANGE_COLUMNS = ("price",)
+
+
+def estimate_tokens(data: Any) -> int:
+    """Estimate the number of tokens data takes up once serialized to JSON."""
+    text = data if isinstance(data, str) else dumps(data)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def summarize_rows(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summary statistics for a list of order or product rows."""
+    summary: Dict[str, Any] = {"count": len(rows)}
+
+    for column in COUNT_COLUMNS:
+        counts: Dict[str, int] = {}
+        for row in rows:
+            if column in row:
+                counts[row[column]] = counts.get(row[column], 0) + 1
+        if counts:
+            summary[f"by_{column}"] = counts
+
+    for column in RANGE_COLUMNS:
+        values = [row[column] for row in rows if row.get(column) is not None]
+        if values:
+            summary[f"{column}_range"] = {"min": min(values), "max": max(values)}
+
+    return summary
+
+
+def merge_summaries(first: Dict[str, Any], second: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine two summaries of disjoint row sets into one."""
+    if not second:
+        return first
+
+    merged: Dict[str, Any] = {"count": first["count"] + second["count"]}
+
+    for column in COUNT_COLUMNS:
+        key = f"by_{column}"
+        counts = dict(first.get(key, {}))
+        for value, count in second.get(key, {}).items():
+            counts[value] = counts.get(value, 0) + count
+        if counts:
+            merged[key] = counts
+
+    for column in RANGE_COLUMNS:
+        key = f"{column}_range"
+        ranges = [summary[key] for summary in (first, second) if key in summary]
+        if ranges:
+            merged[key] = {
+                "min": min(r["min"] for r in ranges),
+                "max": max(r["max"] for r in ranges)
+            }
+
+    return merged
+
+
+def shape_for_llm(result: ToolResult, token_budget: Optional[int] = None) -> ToolResult:
+    """
+    Cap the rows of a result to an estimated token budget.
+
+    Returns the result unchanged when it already fits and no further matches
+    exist. Otherwise returns a new ToolResult with the rows that fit, a
+    summary of every match that was not shown (the rest of this page plus the
+    result's remaining_summary), how many there are and the offset to request
+    the next page with.
+    """
+    budget = LLM_RESULT_TOKEN_BUDGET if token_budget is None else token_budget
+    field = next((f for f in ROW_FIELDS if f in result.fields), None)
+
+    if field is None:
+        return result
+
+    rows = result.fields[field]
+    kept = []
+    used = 0
+
+    for row in rows:
+        cost = estimate_tokens(row)
+        if used + cost > budget and kept:
+            break
+        kept.append(row)
+        used += cost
+
+    offset = result.fields.get("offset") or 0
+    total = result.fields.get("total", offset + len(rows))
+
+    if len(kept) == len(rows) and offset + len(rows) >= total:
+        return result
+
+    next_offset = offset + len(kept)
+
+    fields = dict(result.fields)
+    remaining = fields.pop("remaining_summary", None)
+    fields[field] = kept
+    fields["truncated"] = True
+    fields["shown"] = len(kept)
+    fields["omitted"] = total - next_offset
+    fields["omitted_summary"] = merge_summaries(summarize_rows(rows[len(kept):]), remaining)
+    fields["next_offset"] = next_offset
+    fields["note"] = (
+        f"Showing rows {offset + 1}-{next_offset} of {total} matches. "
+        f"Call the tool again with offset={next_offset} to see more."
+    )
+
+    return ToolResult(result.success, **fields)
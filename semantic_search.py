@@ -0,0 +1,287 @@
+"""
+Offline semantic product search over hashed TF-IDF vectors.
+
+Each product's name, description and category are turned into word and
+character n-gram features, hashed into a fixed number of dimensions and
+TF-IDF weighted. The L2-normalized vectors live in one NumPy matrix, so a
+query (or a batch of queries) is a single matrix product followed by a
+top-k selection. No network, model download or GPU is needed.
+
+The index is built lazily on first use and updated incrementally when
+products are added or deleted, without copying the matrix.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from database import db
+
+# Number of hashed feature dimensions (memory is n_products * DIMENSIONS * 4 bytes)
+DIMENSIONS = 2048
+
+# Matches scoring below this cosine similarity are hash-collision noise
+MIN_RELEVANCE = 0.1
+
+# Character n-gram sizes taken from every word
+CHAR_NGRAMS = (3, 4)
+
+# Rebuild (recompute IDF) once the catalog grew or shrank this much since the last build
+REBUILD_RATIO = 0.25
+
+# Initial rows allocated for the matrix
+MIN_CAPACITY = 64
+
+# Compact the matrix once this share of its used rows belongs to deleted products
+COMPACT_RATIO = 0.25
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "do", "does", "for", "have", "i", "in", "is", "it",
+    "keep", "looking", "me", "my", "need", "of", "on", "or", "something", "that",
+    "the", "thing", "to", "want", "what", "with", "you", "your",
+}
+
+# Small query expansion table for everyday shopping vocabulary
+SYNONYMS = {
+    "tidy": ["organizer", "management", "cable"],
+    "organize": ["organizer"],
+    "messy": ["organizer", "management"],
+    "clutter": ["organizer", "management"],
+    "type": ["keyboard"],
+    "typing": ["keyboard"],
+    "music": ["headphones", "speaker"],
+    "listen": ["headphones", "speaker"],
+    "sound": ["headphones", "speaker"],
+    "light": ["lamp", "led"],
+    "sit": ["chair"],
+    "seat": ["chair"],
+    "back": ["lumbar", "ergonomic"],
+    "storage": ["ssd", "drive", "flash"],
+    "backup": ["ssd", "drive"],
+    "video": ["webcam", "monitor"],
+    "call": ["webcam"],
+    "screen": ["monitor", "display"],
+    "computer": ["laptop"],
+    "notebook": ["laptop"],
+    "carry": ["sleeve", "portable"],
+    "phone": ["phone", "stand"],
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with a light plural strip."""
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    tokens = []
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes (unlike hash())
+    return zlib.crc32(feature.encode()) % DIMENSIONS
+
+
+def features(text: str, expand: bool = False) -> Dict[int, float]:
+    """Hashed term counts of word and character n-gram features."""
+    counts: Dict[int, float] = {}
+    tokens = tokenize(text)
+
+    if expand:
+        tokens = tokens + [syn for token in tokens for syn in SYNONYMS.get(token, ())]
+
+    for token in tokens:
+        key = _bucket("w:" + token)
+        counts[key] = counts.get(key, 0.0) + 1.0
+
+        padded = f"<{token}>"
+        for n in CHAR_NGRAMS:
+            for i in range(len(padded) - n + 1):
+                key = _bucket("c:" + padded[i:i + n])
+                counts[key] = counts.get(key, 0.0) + 0.5
+
+    return counts
+
+
+def product_text(product: Dict[str, Any]) -> str:
+    """The text a product is indexed under (the name counts twice)."""
+    name = product.get("product_name") or ""
+    return f"{name} {name} {product.get('description') or ''} {product.get('category') or ''}"
+
+
+class ProductVectorIndex:
+    """
+    Dense hashed TF-IDF matrix over the product catalog.
+
+    Rows live in a preallocated matrix that grows by doubling, so adding a
+    product writes one row instead of copying the matrix. Deleting a product
+    only marks its row dead (a tombstone); dead rows are skipped by searches
+    and compacted away once they make up COMPACT_RATIO of the rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._names: List[Optional[str]] = []  # Per row; None for dead rows
+        self._counts: List[Optional[Dict[int, float]]] = []
+        self._rows: Dict[str, int] = {}  # Product name -> row of its live vector
+        self._df = np.zeros(DIMENSIONS, dtype=np.float32)
+        self._idf = np.ones(DIMENSIONS, dtype=np.float32)
+        self._matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._size_at_build = 0
+        self.compactions = 0
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt from the database on the next search."""
+        with self._lock:
+            self._built = False
+
+    def _vector(self, counts: Dict[int, float]) -> np.ndarray:
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        if counts:
+            keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            vector[keys] = (1 + np.log(values)) * self._idf[keys]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _rebuild(self, products: Optional[List[Dict[str, Any]]] = None):
+        if products is None:
+            products = db.execute_query("SELECT product_name, description, category FROM products")
+
+        self._names = [p["product_name"] for p in products]
+        self._counts = [features(product_text(p)) for p in products]
+
+        self._df = np.zeros(DIMENSIONS, dtype=np.float32)
+        for counts in self._counts:
+            self._df[list(counts)] += 1
+
+        self._recompute()
+        self._size_at_build = len(self._rows)
+        self._built = True
+
+    def _recompute(self):
+        """Recompute IDF and every vector, dropping dead rows."""
+        live = [i for i, name in enumerate(self._names) if name is not None]
+        self._names = [self._names[i] for i in live]
+        self._counts = [self._counts[i] for i in live]
+        self._rows = {name: i for i, name in enumerate(self._names)}
+
+        n = len(self._names)
+        self._idf = (np.log((1 + n) / (1 + self._df)) + 1).astype(np.float32)
+        capacity = max(MIN_CAPACITY, 2 * n)
+        self._matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        self._live = np.zeros(capacity, dtype=bool)
+        for i, counts in enumerate(self._counts):
+            self._matrix[i] = self._vector(counts)
+        self._live[:n] = True
+
+    def _ensure_built(self):
+        if not self._built:
+            self._rebuild()
+
+    def _maybe_recompute(self):
+        # IDF drifts as the catalog changes; refresh it after large changes
+        if abs(len(self._rows) - self._size_at_build) > REBUILD_RATIO * max(self._size_at_build, 1):
+            self._recompute()
+            self._size_at_build = len(self._rows)
+        elif len(self._names) - len(self._rows) > COMPACT_RATIO * max(len(self._names), MIN_CAPACITY):
+            self._compact()
+
+    def _compact(self):
+        """Move live rows to the front, keeping the current IDF."""
+        live = np.flatnonzero(self._live[:len(self._names)])
+        n = len(live)
+        self._matrix[:n] = self._matrix[live]
+        self._matrix[n:len(self._names)] = 0
+        self._live[:] = False
+        self._live[:n] = True
+        self._names = [self._names[i] for i in live]
+        self._counts = [self._counts[i] for i in live]
+        self._rows = {name: i for i, name in enumerate(self._names)}
+        self.compactions += 1
+
+    def add(self, product: Dict[str, Any]):
+        """Add (or replace) one product in the index."""
+        with self._lock:
+            if not self._built:
+                return  # Will be picked up by the first build
+            self._remove(product["product_name"])
+
+            row = len(self._names)
+            if row == len(self._matrix):
+                # Full: double the capacity (amortized O(1) per add)
+                capacity = max(MIN_CAPACITY, 2 * row)
+                matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+                matrix[:row] = self._matrix[:row]
+                live = np.zeros(capacity, dtype=bool)
+                live[:row] = self._live[:row]
+                self._matrix, self._live = matrix, live
+
+            counts = features(product_text(product))
+            self._names.append(product["product_name"])
+            self._counts.append(counts)
+            self._rows[product["product_name"]] = row
+            self._df[list(counts)] += 1
+            self._matrix[row] = self._vector(counts)
+            self._live[row] = True
+            self._maybe_recompute()
+
+    def _remove(self, product_name: str):
+        row = self._rows.pop(product_name, None)
+        if row is None:
+            return
+        self._df[list(self._counts[row])] -= 1
+        self._names[row] = None
+        self._counts[row] = None
+        self._matrix[row] = 0
+        self._live[row] = False
+
+    def remove(self, product_name: str):
+        """Remove one product from the index."""
+        with self._lock:
+            if self._built:
+                self._remove(product_name)
+                self._maybe_recompute()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_built()
+            return len(self._rows)
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Cosine top-k for several queries with one matrix product."""
+        with self._lock:
+            self._ensure_built()
+            if not self._rows or not queries:
+                return [[] for _ in queries]
+
+            used = len(self._names)
+            query_matrix = np.vstack([self._vector(features(q, expand=True)) for q in queries])
+            scores = self._matrix[:used] @ query_matrix.T  # (rows, n_queries)
+            scores[~self._live[:used]] = -np.inf
+            k = min(top_k, len(self._rows))
+
+            results = []
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k]
+                top = top[np.argsort(-column[top])]
+                results.append([
+                    (self._names[i], round(float(column[i]), 3)) for i in top if column[i] >= MIN_RELEVANCE
+                ])
+            return results
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Cosine top-k (product name, score) pairs for one query."""
+        return self.search_batch([query], top_k)[0]
+
+
+# Global index shared by all tools
+product_vectors = ProductVectorIndex()
@@ -0,0 +1,127 @@
+"""
+Per-session ordering of agent turns.
+
+An agent instance keeps conversation state (messages, pending_action,
+awaiting_confirmation) that one turn reads and writes across several awaits.
+When one session sent two requests at once (a double-submit, two tabs), both
+turns used to run interleaved on the same agent. The dispatcher queues
+requests per session behind an asyncio lock, so a session's turns run one
+at a time in arrival order. Different sessions have different locks and run
+fully in parallel.
+
+A session may have at most MAX_QUEUED_PER_SESSION requests waiting behind
+the running one; more are rejected with SessionBusy instead of piling up.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Coroutine, Dict
+import asyncio
+import threading
+import time
+
+# Requests allowed to wait behind the running one, per session
+MAX_QUEUED_PER_SESSION = 4
+
+# Number of recent wait times kept for percentiles
+WAIT_WINDOW = 1000
+
+
+class SessionBusy(Exception):
+    """A session already has the maximum number of queued requests."""
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class SessionDispatcher:
+    """Serializes turns within a session; lets sessions run in parallel."""
+
+    def __init__(self, max_queued: int = MAX_QUEUED_PER_SESSION):
+        self.max_queued = max_queued
+        # Both only touched on the event loop; _lock guards reads from other threads
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._depth: Dict[str, int] = {}  # Running + waiting requests per session
+        self._lock = threading.Lock()
+        self.waits = deque(maxlen=WAIT_WINDOW)
+        self.requests = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        """Hold the session's turn for the duration of the block."""
+        with self._lock:
+            depth = self._depth.get(session_id, 0)
+            if depth > self.max_queued:
+                self.rejected += 1
+                raise SessionBusy(f"Session has {depth - 1} requests waiting already")
+            self._depth[session_id] = depth + 1
+            self.requests += 1
+            if depth:
+                self.queued += 1
+            lock = self._locks.setdefault(session_id, asyncio.Lock())
+
+        arrived = time.monotonic()
+        try:
+            async with lock:
+                with self._lock:
+                    self.waits.append(time.monotonic() - arrived)
+                yield
+        finally:
+            with self._lock:
+                self._depth[session_id] -= 1
+                if not self._depth[session_id]:
+                    # Nobody holds or waits for the lock any more
+                    del self._depth[session_id]
+                    del self._locks[session_id]
+
+    async def run(self, session_id: str, coroutine: Coroutine) -> Any:
+        """Run a coroutine as the session's next turn."""
+        try:
+            async with self.turn(session_id):
+                return await coroutine
+        except SessionBusy:
+            coroutine.close()
+            raise
+
+    async def stream(self, session_id: str, iterator: AsyncIterator) -> AsyncIterator:
+        """Iterate a streamed turn, holding the session's turn until it ends."""
+        try:
+            async with self.turn(session_id):
+                async for item in iterator:
+                    yield item
+        finally:
+            await iterator.aclose()
+
+    def is_active(self, session_id: str) -> bool:
+        """Whether the session has a turn running or waiting."""
+        with self._lock:
+            return session_id in self._depth
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depths and wait times, e.g. for the health endpoint."""
+        with self._lock:
+            depths = list(self._depth.values())
+            waits = list(self.waits)
+            stats = {
+                "requests": self.requests,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "active_sessions": len(depths),
+                "waiting_now": sum(depth - 1 for depth in depths),
+                "max_queue_depth_now": max(depths, default=1) - 1,
+                "max_queued_per_session": self.max_queued
+            }
+        for name, q in (("p50", 0.5), ("p95", 0.95)):
+            value = _percentile(waits, q)
+            stats[f"wait_{name}_ms"] = round(value * 1000, 2) if value is not None else None
+        stats["wait_max_ms"] = round(max(waits) * 1000, 2) if waits else None
+        return stats
+
+
+# Global dispatcher used by the web app
+session_dispatcher = SessionDispatcher()
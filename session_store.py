@@ -0,0 +1,332 @@
+"""
+Bounded store of per-session agents, with idle sessions spilled to disk.
+
+app.py used to keep every session's agent in a plain dict forever. The
+store keeps at most MAX_RESIDENT_SESSIONS agents, and about
+MAX_RESIDENT_BYTES of conversation state, in memory. Least recently used
+sessions are evicted first, and sessions idle for SESSION_IDLE_TTL are
+evicted whatever the limits. An evicted agent's state (export_state) is
+written to SESSION_SPILL_DIR as zlib-compressed JSON, and it is rehydrated
+into a fresh agent (load_state) on the session's next request, so users
+see no difference. Spilled files not claimed within SPILL_TTL are deleted.
+
+The store runs on the shared event loop, so everything slow happens off it:
+serializing, compressing and writing a spilled session, and reading one
+back, run in worker threads (asyncio.to_thread), and the idle/expiry sweep
+runs periodically from a background thread (start_sweeper) instead of on
+lookups. Sizes are tracked incrementally with the agent's state_size(), re-checked
+only for the session being looked up. A session with a turn running or
+queued (see session_dispatch) is never evicted, because the spilled copy
+would miss what that turn still changes. Lookups of one session must not
+overlap; the dispatcher's per-session turns guarantee that.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from tool_results import dumps
+
+# Agents kept in memory at most
+MAX_RESIDENT_SESSIONS = int(os.getenv("MAX_RESIDENT_SESSIONS", "1000"))
+
+# Serialized conversation state kept in memory at most, in bytes
+MAX_RESIDENT_BYTES = int(os.getenv("MAX_RESIDENT_BYTES", str(64 * 1024 * 1024)))
+
+# Seconds a session may sit idle in memory before it is spilled
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+
+# Seconds a spilled session is kept on disk
+SPILL_TTL = float(os.getenv("SPILL_TTL", str(24 * 3600)))
+
+# Directory for spilled sessions
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "session_spill")
+
+# Seconds between sweeps for idle sessions and expired spill files
+SWEEP_INTERVAL = 30.0
+
+# Session ids become file names, so only simple ones are accepted
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class _Entry:
+    __slots__ = ("agent", "last_used", "size", "dirty")
+
+    def __init__(self, agent: Any, size: int = 0):
+        self.agent = agent
+        self.last_used = time.monotonic()
+        self.size = size
+        self.dirty = True  # Used since its size was last measured
+
+
+def _state_size(agent: Any) -> int:
+    """An agent's state size, serializing it only if the agent can't estimate it."""
+    if hasattr(agent, "state_size"):
+        return agent.state_size()
+    return len(dumps(agent.export_state()))
+
+
+class SessionStore:
+    """LRU/TTL-bounded map of session id to agent, spilling evicted agents to disk."""
+
+    def __init__(self, factory: Callable[[], Any], spill_dir: str = SESSION_SPILL_DIR,
+                 max_sessions: int = MAX_RESIDENT_SESSIONS, max_bytes: int = MAX_RESIDENT_BYTES,
+                 idle_ttl: float = SESSION_IDLE_TTL, spill_ttl: float = SPILL_TTL,
+                 is_busy: Optional[Callable[[str], bool]] = None):
+        self.factory = factory
+        self.spill_dir = spill_dir
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill_ttl = spill_ttl
+        self.is_busy = is_busy or (lambda session_id: False)
+        # Guards the maps and counters; never held during I/O or serialization
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, _Entry]" = OrderedDict()  # Least recently used first
+        self._resident_bytes = 0
+        self._spilled = set()
+        self._spilling: Dict[str, asyncio.Future] = {}  # Done once the session is on disk (or back)
+        self._tasks = set()
+        self.created = 0
+        self.rehydrated = 0
+        self.evictions = {"lru": 0, "memory": 0, "idle": 0}
+        self.spill_errors = 0
+        self.expired_spills = 0
+
+        os.makedirs(spill_dir, exist_ok=True)
+        for name in os.listdir(spill_dir):
+            if name.endswith(".json.z"):
+                self._spilled.add(name[:-len(".json.z")])
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id}.json.z")
+
+    # ==================== LOOKUP ====================
+
+    async def get(self, session_id: str, create: bool = True) -> Optional[Any]:
+        """
+        The session's agent: resident, rehydrated from disk, or new.
+
+        With create=False, returns None for a session that doesn't exist.
+        """
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+
+        # A session being spilled is read back once its file is complete
+        while session_id in self._spilling:
+            await asyncio.shield(self._spilling[session_id])
+
+        with self._lock:
+            entry = self._resident.get(session_id)
+            if entry is not None:
+                self._resident.move_to_end(session_id)
+                self._measure(entry)  # What its previous turn added
+            spilled = entry is None and session_id in self._spilled
+            self._spilled.discard(session_id)
+
+        if entry is None:
+            agent = await asyncio.to_thread(self._load, session_id) if spilled else None
+            rehydrated = agent is not None
+            if agent is None:
+                if not create:
+                    return None
+                agent = self.factory()
+            with self._lock:
+                if rehydrated:
+                    self.rehydrated += 1
+                else:
+                    self.created += 1
+                entry = self._resident[session_id] = _Entry(agent)
+                self._measure(entry)
+
+        with self._lock:
+            entry.last_used = time.monotonic()
+            entry.dirty = True
+            victims = self._over_limits(keep=session_id)
+        self._start_spills(victims)
+        return entry.agent
+
+    def _load(self, session_id: str) -> Optional[Any]:
+        """Read a spilled session back into a new agent (in a worker thread)."""
+        path = self._path(session_id)
+        try:
+            with open(path, "rb") as f:
+                state = json.loads(zlib.decompress(f.read()))
+            os.remove(path)
+        except (OSError, ValueError, zlib.error) as e:
+            # A lost conversation is better than a failed request
+            print(f"Warning: could not rehydrate session {session_id}: {e}")
+            with self._lock:
+                self.spill_errors += 1
+            return None
+        agent = self.factory()
+        agent.load_state(state)
+        return agent
+
+    # ==================== EVICTION ====================
+
+    def _measure(self, entry: _Entry):
+        if entry.dirty:
+            size = _state_size(entry.agent)
+            self._resident_bytes += size - entry.size
+            entry.size = size
+            entry.dirty = False
+
+    def _evict(self, session_id: str, reason: str) -> Tuple[str, _Entry, str]:
+        entry = self._resident.pop(session_id)
+        self._resident_bytes -= entry.size
+        self._spilling[session_id] = asyncio.get_running_loop().create_future()
+        return session_id, entry, reason
+
+    def _over_limits(self, keep: Optional[str] = None) -> List[Tuple[str, _Entry, str]]:
+        """Take sessions out of memory, oldest first, until within the limits (lock held)."""
+        victims = []
+        for session_id in list(self._resident):
+            if len(self._resident) <= self.max_sessions and self._resident_bytes <= self.max_bytes:
+                break
+            if session_id == keep or self.is_busy(session_id):
+                continue
+            reason = "lru" if len(self._resident) > self.max_sessions else "memory"
+            victims.append(self._evict(session_id, reason))
+        return victims
+
+    def _start_spills(self, victims: List[Tuple[str, _Entry, str]]) -> List[asyncio.Task]:
+        tasks = []
+        for session_id, entry, reason in victims:
+            task = asyncio.ensure_future(self._spill(session_id, entry, reason))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            tasks.append(task)
+        return tasks
+
+    async def _spill(self, session_id: str, entry: _Entry, reason: str):
+        try:
+            written = await asyncio.to_thread(self._write, session_id, entry.agent)
+        except Exception as e:
+            print(f"Warning: could not spill session {session_id}: {e}")
+            written = False
+        with self._lock:
+            if written:
+                self._spilled.add(session_id)
+                self.evictions[reason] += 1
+            else:
+                # Keep it in memory (first in line for the next eviction)
+                self.spill_errors += 1
+                self._resident[session_id] = entry
+                self._resident.move_to_end(session_id, last=False)
+                self._resident_bytes += entry.size
+            self._spilling.pop(session_id).set_result(None)
+
+    def _write(self, session_id: str, agent: Any) -> bool:
+        """Serialize, compress and write an evicted agent (in a worker thread)."""
+        blob = zlib.compress(dumps(agent.export_state()).encode(), 6)
+        path = self._path(session_id)
+        temp_path = f"{path}.tmp"
+        try:
+            # Write to a temporary file first so a crash never leaves half a session
+            with open(temp_path, "wb") as f:
+                f.write(blob)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: could not spill session {session_id}: {e}")
+            return False
+        return True
+
+    # ==================== SWEEPING ====================
+
+    async def sweep(self):
+        """Spill idle sessions, re-check the limits and delete spill files past their TTL."""
+        now = time.monotonic()
+        with self._lock:
+            victims = []
+            for session_id, entry in list(self._resident.items()):
+                if self.is_busy(session_id):
+                    continue
+                if now - entry.last_used > self.idle_ttl:
+                    victims.append(self._evict(session_id, "idle"))
+                else:
+                    self._measure(entry)  # Catch up on sessions not looked up since their last turn
+            victims += self._over_limits()
+            spilled = list(self._spilled)
+        spills = self._start_spills(victims)
+
+        expired = await asyncio.to_thread(self._delete_expired, spilled)
+        with self._lock:
+            self.expired_spills += expired
+        await asyncio.gather(*spills)
+
+    def _delete_expired(self, session_ids: List[str]) -> int:
+        """Delete spill files older than the TTL (in a worker thread)."""
+        cutoff = time.time() - self.spill_ttl
+        expired = 0
+        for session_id in session_ids:
+            path = self._path(session_id)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except OSError:
+                pass  # Already gone
+            with self._lock:
+                # Not if it was rehydrated meanwhile
+                if session_id not in self._spilled:
+                    continue
+                self._spilled.discard(session_id)
+            try:
+                os.remove(path)
+                expired += 1
+            except OSError:
+                pass
+        return expired
+
+    def start_sweeper(self, run: Callable[[Coroutine], Any], interval: float = SWEEP_INTERVAL) -> threading.Thread:
+        """
+        Sweep every `interval` seconds from a daemon thread.
+
+        `run` runs a coroutine on the store's event loop and waits for it
+        (e.g. BackgroundLoop.run); between sweeps nothing is left pending on
+        the loop.
+        """
+        def sweep_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    run(self.sweep())
+                except Exception as e:
+                    print(f"Warning: session sweep failed: {e}")
+
+        thread = threading.Thread(target=sweep_forever, name="session-sweeper", daemon=True)
+        thread.start()
+        return thread
+
+    async def flush(self):
+        """Wait for the spills in progress to finish."""
+        while self._spilling:
+            await asyncio.gather(*(asyncio.shield(f) for f in list(self._spilling.values())))
+
+    # ==================== STATS ====================
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._resident)
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident and spilled counts, memory use and eviction counters."""
+        with self._lock:
+            return {
+                "resident": len(self._resident),
+                "spilled": len(self._spilled),
+                "spilling": len(self._spilling),
+                "resident_bytes": self._resident_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "created": self.created,
+                "rehydrated": self.rehydrated,
+                "evictions": dict(self.evictions),
+                "expired_spills": self.expired_spills,
+                "spill_errors": self.spill_errors
+            }
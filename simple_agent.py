@@ -2,21 +2,40 @@
 Simplified conversational agent for e-commerce customer support.
 Uses direct LLM calls with tool integration and manual confirmation handling.
 """
-from langchain_openai import ChatOpenAI
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-import json
-from tools import ALL_TOOLS
+from llm_clients import get_llm, get_llm_with_tools, prebuild_tool_variants, tool_schema_tokens
+from tools import (
+    ALL_TOOLS, TOOLS_BY_NAME, DESTRUCTIVE_TOOL_NAMES, TOOLS_BY_INTENT, tools_for_turn,
+    ainvoke_structured, ainvoke_structured_batch, canonicalize_tool_args
+)
+from formatting import format_confirmation, format_result, render_tool_result
+from fast_path import route_message
+from response_cache import response_cache, is_cacheable_message
+from history import ConversationHistory, dump_messages, load_messages
+from intent_classifier import intent_classifier, INTENT_MIN_CONFIDENCE
+from streaming import Emit, astream_llm, stream_turn
+from accounting import SessionAccounting, accounted_turn, set_path
+from call_policy import get_policy
 
 
 class SimpleEcommerceAgent:
     """Simplified e-commerce support agent with CRUD operations."""
 
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
-        self.llm_with_tools = self.llm.bind_tools(ALL_TOOLS)
+    def __init__(self, use_fast_path: bool = True, use_response_cache: bool = True):
+        # Shared across sessions: pooled connections, tool schemas bound once
+        self.llm = get_llm("gpt-4o")
+        self.llm_with_tools = get_llm_with_tools(ALL_TOOLS, "gpt-4o")
+        prebuild_tool_variants(TOOLS_BY_INTENT.values(), "gpt-4o")
         self.messages = []
+        self.history = ConversationHistory()
+        self.accounting = SessionAccounting()
         self.pending_action = None
         self.awaiting_confirmation = False
+        self.turn_used_tools = False  # Whether the latest turn ran any tool
+        self.use_fast_path = use_fast_path
+        self.use_response_cache = use_response_cache
 
     def _get_system_message(self) -> SystemMessage:
         """Get the system message for the agent."""
@@ -35,93 +54,140 @@ IMPORTANT RULES:
 
 When you need to execute a tool, use the available tools. For read operations like searching or viewing data, call the tool directly. For create/update/delete operations, first explain what you will do and ask for confirmation.""")
 
-    async def process_message(self, user_message: str) -> str:
-        """Process a user message and return the agent's response."""
+    @accounted_turn
+    async def process_message(self, user_message: str, emit: Optional[Emit] = None) -> str:
+        """
+        Process a user message and return the agent's response.
+
+        When `emit` is given, LLM tokens and tool results are passed to it as
+        they become available (see streaming.py).
+        """
 
         # Add user message
         self.messages.append(HumanMessage(content=user_message))
+        previous_turn_used_tools, self.turn_used_tools = self.turn_used_tools, False
+
+        # Keep the history within its token budget (and the confirmation turn, if any)
+        self.history.compact(self.messages, keep_turns=2 if self.awaiting_confirmation else 1)
 
         # Check if we're awaiting confirmation
         if self.awaiting_confirmation:
+            set_path("confirmation")
             return await self._handle_confirmation(user_message)
 
-        # Build messages with system message
-        all_messages = [self._get_system_message()] + self.messages
-
-        # Call LLM with tools
-        response = await self.llm_with_tools.ainvoke(all_messages)
-
-        # Check if there are tool calls
-        if response.tool_calls:
-            return await self._handle_tool_calls(response)
+        # Serve self-contained read questions from the shared response cache
+        cache_key = None
+        if self.use_response_cache and is_cacheable_message(user_message):
+            cache_key = response_cache.make_key(user_message)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                set_path("cache")
+                reply, stored = cached
+                self.messages.append(AIMessage(content=stored))
+                self.turn_used_tools = True
+                return reply
+
+        # Answer simple read requests directly, without an LLM round trip
+        # (its rules query SQLite, so they run in a worker thread, off the event loop)
+        match = await asyncio.to_thread(route_message, user_message) if self.use_fast_path else None
+
+        if match:
+            set_path("fast_path")
+            reply = await self._execute_tool(match.tool_name, match.tool_args)
         else:
-            # No tool calls, just conversation
-            self.messages.append(response)
-            return response.content
-
-    async def _handle_tool_calls(self, response):
-        """Handle tool calls from the LLM."""
-        tool_call = response.tool_calls[0]
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-
-        # Determine if this is a destructive operation
-        destructive_tools = [
-            "create_order", "add_product",
-            "update_order_status", "update_product_price", "update_product_stock",
-            "cancel_order", "delete_product"
-        ]
-
-        if tool_name in destructive_tools:
-            # Ask for confirmation
-            self.pending_action = {
-                "tool_name": tool_name,
-                "tool_args": tool_args,
-                "tool_call": tool_call
-            }
+            set_path("llm")
+
+            # Build messages with system message and the summary of older turns
+            all_messages = self.history.build_prompt(self._get_system_message(), self.messages)
+            tools, llm = self._tools_for_message(user_message, previous_turn_used_tools)
+            tool_tokens = tool_schema_tokens(tools)
+            self.history.record_prompt(all_messages, tool_tokens, tool_schema_tokens(ALL_TOOLS) - tool_tokens)
+
+            # Call LLM with tools (streaming its tokens if requested)
+            response = await astream_llm(llm, all_messages, emit, get_policy("agent"))
+
+            # Check if there are tool calls
+            if not response.tool_calls:
+                # No tool calls, just conversation
+                self.messages.append(response)
+                return response.content
+
+            reply = await self._handle_tool_calls(response, emit)
+
+        # Only read-only turns are cached, never ones that ask for confirmation
+        if cache_key is not None and not self.awaiting_confirmation:
+            response_cache.put(cache_key, (reply, self.messages[-1].content))
+
+        return reply
+
+    def _tools_for_message(self, user_message: str, previous_turn_used_tools: bool = False) -> tuple:
+        """Return (tools, LLM) to use: the intent's tool subset when it clearly covers the message."""
+        prediction = intent_classifier.predict(user_message)
+        if prediction.confidence < INTENT_MIN_CONFIDENCE:
+            return ALL_TOOLS, self.llm_with_tools
+        tools = tools_for_turn(prediction.intent, user_message, previous_turn_used_tools)
+        if tools is ALL_TOOLS:
+            return ALL_TOOLS, self.llm_with_tools
+        return tools, get_llm_with_tools(tools, "gpt-4o")
+
+    def stream_message(self, user_message: str) -> AsyncIterator[Dict[str, Any]]:
+        """Process a user message, yielding streamed events and finally the response."""
+        return stream_turn(lambda emit: self.process_message(user_message, emit))
+
+    async def _handle_tool_calls(self, response, emit: Optional[Emit] = None):
+        """Handle all tool calls from one LLM response."""
+        read_calls = [c for c in response.tool_calls if c["name"] not in DESTRUCTIVE_TOOL_NAMES]
+        destructive_calls = [c for c in response.tool_calls if c["name"] in DESTRUCTIVE_TOOL_NAMES]
+
+        replies = []
+        history = []
+
+        if read_calls:
+            # Execute read operations immediately, concurrently
+            results = await ainvoke_structured_batch(read_calls)
+            self.turn_used_tools = True
+            for result in results:
+                display, stored = self._render_result(result)
+                replies.append(display)
+                history.append(stored)
+                if emit:
+                    emit("result", display)
+
+        if destructive_calls:
+            # Ask for a single confirmation covering every destructive call. Resolving
+            # product names and previewing bulk rows query SQLite, so both run off the loop.
+            actions = await asyncio.to_thread(lambda: [
+                {"tool_name": c["name"], "tool_args": canonicalize_tool_args(c["name"], c["args"]), "tool_call": c}
+                for c in destructive_calls
+            ])
+            self.pending_action = {"actions": actions}
             self.awaiting_confirmation = True
 
-            # Generate confirmation message
-            confirmation_msg = f"""I'm about to perform the following action:
+            confirmation_msg = await asyncio.to_thread(format_confirmation, actions)
+            replies.append(confirmation_msg)
+            history.append(confirmation_msg)
 
-**Action**: {tool_name.replace('_', ' ').title()}
-**Details**: {json.dumps(tool_args, indent=2)}
+        self.messages.append(AIMessage(content="\n".join(history)))
+        return "\n".join(replies)
 
-This action will modify your data. Would you like me to proceed? (Please confirm with 'yes' or 'no')"""
-
-            self.messages.append(AIMessage(content=confirmation_msg))
-            return confirmation_msg
-
-        else:
-            # Execute read operations immediately
-            return await self._execute_tool(tool_name, tool_args)
+    def _render_result(self, result) -> tuple:
+        """Return (display text, history text) for a tool result."""
+        return render_tool_result(result)
 
     async def _execute_tool(self, tool_name: str, tool_args: dict) -> str:
         """Execute a tool and return formatted results."""
-        # Find the tool
-        tool = next((t for t in ALL_TOOLS if t.name == tool_name), None)
-
-        if not tool:
+        if tool_name not in TOOLS_BY_NAME:
             return f"Error: Tool '{tool_name}' not found."
 
-        # Execute the tool
+        # Execute the tool in-process (no JSON round trip)
         try:
-            result = tool.invoke(tool_args)
-
-            # Parse result
-            result_data = json.loads(result)
+            result = await ainvoke_structured(tool_name, tool_args)
+            self.turn_used_tools = True
+            display, stored = self._render_result(result)
 
-            # Format the result
-            if result_data.get("success"):
-                formatted = self._format_result(tool_name, result_data)
-
-                # Add AI message to history
-                self.messages.append(AIMessage(content=formatted))
-                return formatted
-            else:
-                error_msg = result_data.get("message") or result_data.get("error") or "Operation failed"
-                self.messages.append(AIMessage(content=f"⚠️ {error_msg}"))
-                return f"⚠️ {error_msg}"
+            # Add AI message to history
+            self.messages.append(AIMessage(content=stored))
+            return display
 
         except Exception as e:
             error_msg = f"Error executing tool: {str(e)}"
@@ -130,64 +196,7 @@ This action will modify your data. Would you like me to proceed? (Please confirm
 
     def _format_result(self, tool_name: str, result_data: dict) -> str:
         """Format tool results for display."""
-        if "orders" in result_data:
-            # Format orders
-            orders = result_data["orders"]
-            output = f"Found {len(orders)} order(s):\n\n"
-            for order in orders:
-                output += f"**Order {order['order_number']}**\n"
-                output += f"  - Customer: {order['customer_name']}\n"
-                output += f"  - Product: {order['product_name']}\n"
-                output += f"  - Quantity: {order['quantity']}\n"
-                output += f"  - Price: ${order['price']:.2f}\n"
-                output += f"  - Status: {order['status']}\n\n"
-            return output
-
-        elif "products" in result_data:
-            # Format products
-            products = result_data["products"]
-            output = f"Found {len(products)} product(s):\n\n"
-            for product in products:
-                output += f"**{product['product_name']}**\n"
-                output += f"  - Price: ${product['price']:.2f}\n"
-                output += f"  - Stock: {product['stock']} units\n"
-                output += f"  - Category: {product['category']}\n"
-                if product.get('description'):
-                    output += f"  - Description: {product['description']}\n"
-                output += "\n"
-            return output
-
-        elif "order" in result_data:
-            # Format single order
-            order = result_data["order"]
-            output = f"**Order {order['order_number']}**\n"
-            output += f"  - Customer: {order['customer_name']}\n"
-            output += f"  - Product: {order['product_name']}\n"
-            output += f"  - Quantity: {order['quantity']}\n"
-            output += f"  - Price: ${order['price']:.2f}\n"
-            output += f"  - Status: {order['status']}\n"
-            if result_data.get("message"):
-                output += f"\n✅ {result_data['message']}"
-            return output
-
-        elif "product" in result_data:
-            # Format single product
-            product = result_data["product"]
-            output = f"**{product['product_name']}**\n"
-            output += f"  - Price: ${product['price']:.2f}\n"
-            output += f"  - Stock: {product['stock']} units\n"
-            output += f"  - Category: {product['category']}\n"
-            if product.get('description'):
-                output += f"  - Description: {product['description']}\n"
-            if result_data.get("message"):
-                output += f"\n✅ {result_data['message']}"
-            return output
-
-        elif result_data.get("message"):
-            return f"✅ {result_data['message']}"
-
-        else:
-            return f"Operation completed: {json.dumps(result_data, indent=2)}"
+        return format_result(result_data)
 
     async def _handle_confirmation(self, user_message: str) -> str:
         """Handle confirmation responses."""
@@ -196,16 +205,18 @@ This action will modify your data. Would you like me to proceed? (Please confirm
         denial_keywords = ["no", "cancel", "don't", "stop", "nevermind", "never mind"]
 
         if any(word in msg_lower for word in confirmation_keywords):
-            # User confirmed - execute the pending action
+            # User confirmed - execute the pending actions in order
             if self.pending_action:
-                tool_name = self.pending_action["tool_name"]
-                tool_args = self.pending_action["tool_args"]
+                actions = self.pending_action["actions"]
 
                 self.awaiting_confirmation = False
                 self.pending_action = None
 
-                result = await self._execute_tool(tool_name, tool_args)
-                return result
+                results = [
+                    await self._execute_tool(action["tool_name"], action["tool_args"])
+                    for action in actions
+                ]
+                return "\n".join(results)
             else:
                 self.awaiting_confirmation = False
                 return "No pending action to confirm."
@@ -225,5 +236,40 @@ This action will modify your data. Would you like me to proceed? (Please confirm
     def reset(self):
         """Reset conversation state."""
         self.messages = []
+        self.history.reset()
         self.pending_action = None
-        self.awaiting_confirmation = False
\ No newline at end of file
+        self.awaiting_confirmation = False
+        self.turn_used_tools = False
+
+    def export_state(self) -> Dict[str, Any]:
+        """The conversation as plain data, e.g. to park an idle session on disk."""
+        return {
+            "messages": dump_messages(self.messages),
+            "history": self.history.export_state(),
+            "accounting": self.accounting.export_state(),
+            "pending_action": self.pending_action,
+            "awaiting_confirmation": self.awaiting_confirmation,
+            "turn_used_tools": self.turn_used_tools
+        }
+
+    def state_size(self) -> int:
+        """
+        Approximate size of export_state() in bytes, without serializing it.
+
+        Messages and summary are bounded by the history budget and the
+        accounting keeps a running total, so this is cheap after every turn.
+        """
+        return (
+            sum(len(m.content) for m in self.messages if isinstance(m.content, str))
+            + len(self.history.summary)
+            + self.accounting.state_bytes
+        )
+
+    def load_state(self, state: Dict[str, Any]):
+        """Continue the conversation export_state captured."""
+        self.messages = load_messages(state["messages"])
+        self.history.load_state(state["history"])
+        self.accounting.load_state(state["accounting"])
+        self.pending_action = state["pending_action"]
+        self.awaiting_confirmation = state["awaiting_confirmation"]
+        self.turn_used_tools = state.get("turn_used_tools", False)
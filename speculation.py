@@ -0,0 +1,95 @@
+"""
+Speculative execution of work that depends on a not-yet-known value.
+
+The LangGraph agent normally waits for intent detection before calling the
+agent LLM, although the agent call only uses the intent as a prompt hint.
+With speculation, the agent call starts right away under an assumed intent
+(the local classifier's best guess) while the LLM detects the real one. If
+they agree, the speculative result is used and the turn saves
+min(intent latency, agent latency). Otherwise the speculative call is
+cancelled and the agent runs normally.
+"""
+from typing import Any, Awaitable, Dict, Optional
+import asyncio
+import threading
+import time
+
+
+class SpeculationStats:
+    """Hit rate and latency saved by speculative agent calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def record_start(self):
+        with self._lock:
+            self.attempts += 1
+
+    def record_hit(self, saved_seconds: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved_seconds
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus hit rate and average saving per hit."""
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / resolved, 3) if resolved else None,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "avg_saved_ms": round(self.saved_seconds / self.hits * 1000, 1) if self.hits else None
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    """A task started under an assumption, kept only if the assumption holds."""
+
+    def __init__(self, assumption: Any, work: Awaitable):
+        self.assumption = assumption
+        self.started = time.monotonic()
+        self.confirmed_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task = asyncio.ensure_future(work)
+        self.task.add_done_callback(self._on_done)
+        speculation_stats.record_start()
+
+    def _on_done(self, task):
+        self.finished_at = time.monotonic()
+
+    def confirm(self, actual: Any) -> bool:
+        """Check the assumption against the actual value; cancel the task if wrong."""
+        self.confirmed_at = time.monotonic()
+        if actual == self.assumption:
+            return True
+
+        # A miss costs the tokens of the cancelled call, not latency
+        speculation_stats.record_miss()
+        self.task.cancel()
+        return False
+
+    def cancel(self):
+        """Abandon the speculation without counting it as resolved."""
+        self.task.cancel()
+
+    async def result(self) -> Any:
+        """Wait for the (confirmed) speculative result and record the time saved."""
+        value = await self.task
+        verify_seconds = (self.confirmed_at or time.monotonic()) - self.started
+        work_seconds = (self.finished_at or time.monotonic()) - self.started
+        # Sequential cost is verify + work; speculative cost is max(verify, work)
+        speculation_stats.record_hit(min(verify_seconds, work_seconds))
+        return value
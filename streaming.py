@@ -0,0 +1,89 @@
+"""
+Streaming helpers shared by the agents, the web app and the CLI.
+
+An agent turn streams by passing an `emit(event_type, text)` callback to
+`process_message`. The callback receives LLM tokens as they arrive ("token")
+and each rendered tool result as soon as it is ready ("result").
+`stream_turn` turns that into an async iterator of event dicts ending with a
+"done" event carrying the complete response, and `sse_event` encodes an
+event for a Server-Sent Events response.
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio
+from langchain_core.messages import message_chunk_to_message
+from tool_results import dumps
+from call_policy import CallPolicy
+
+# Signature of the callback agents call with streamed output
+Emit = Callable[[str, str], None]
+
+
+async def astream_llm(llm, messages, emit: Optional[Emit] = None, policy: Optional[CallPolicy] = None):
+    """
+    Call a chat model, passing content tokens to `emit` as they arrive.
+
+    Returns the complete message (tool calls included), like ainvoke(). With
+    a call policy, the call gets its deadline and retries; streamed calls are
+    not hedged, and not retried once tokens have been emitted.
+    """
+    if emit is None:
+        if policy is None:
+            return await llm.ainvoke(messages)
+        return await policy.run(lambda: llm.ainvoke(messages))
+
+    emitted = False
+
+    async def stream():
+        nonlocal emitted
+        response = None
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                emitted = True
+                emit("token", chunk.content)
+            response = chunk if response is None else response + chunk
+
+        # Merge the chunks back into a regular message for the history
+        return message_chunk_to_message(response)
+
+    if policy is None:
+        return await stream()
+    return await policy.run(stream, hedge=False, can_retry=lambda: not emitted)
+
+
+async def stream_turn(run: Callable[[Emit], Awaitable[str]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run one agent turn and yield its events as they are emitted.
+
+    `run` receives the emit callback and returns the final response text,
+    which is yielded last as {"type": "done", "response": ...}. Exceptions
+    raised by the turn propagate to the consumer.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event_type: str, text: str):
+        queue.put_nowait({"type": event_type, "text": text})
+
+    task = asyncio.ensure_future(run(emit))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+
+            if getter in done:
+                yield getter.result()
+                continue
+
+            getter.cancel()
+            while not queue.empty():
+                yield queue.get_nowait()
+            break
+
+        yield {"type": "done", "response": task.result()}
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def sse_event(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message."""
+    return f"event: {event['type']}\ndata: {dumps(event)}\n\n"
@@ -0,0 +1,51 @@
+"""
+Shared fixtures for the unit tests.
+
+The app's modules create their globals (database, LLM clients, session
+store) on import, so the environment is pointed at scratch locations and the
+offline model before any test module imports them.
+"""
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+SCRATCH = tempfile.mkdtemp(prefix="ecommerce-tests-")
+os.environ["ECOMMERCE_DB"] = os.path.join(SCRATCH, "ecommerce.db")
+os.environ["SESSION_SPILL_DIR"] = os.path.join(SCRATCH, "session_spill")
+os.environ["LLM_MODE"] = "fake"
+os.environ.pop("LLM_LATENCY", None)
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """The global db, pointed at a newly seeded database for one test."""
+    from database import EcommerceDB, db, use_database
+
+    original = db.db_path
+    path = str(tmp_path / "ecommerce.db")
+    EcommerceDB(path)
+    use_database(path)
+    try:
+        yield db
+    finally:
+        use_database(original)
+
+
+@pytest.fixture
+def add_orders(fresh_db):
+    """Insert `count` orders ORD-<5000 + start>... into the test database."""
+    def add(count, customer="Page Tester", status="Processing", start=0):
+        now = datetime.now().isoformat()
+        conn = fresh_db.get_connection()
+        conn.executemany(
+            "INSERT INTO orders (order_number, customer_name, product_name, quantity, price, status, created_at, updated_at) "
+            "VALUES (?, ?, 'USB-C Hub', 1, 49.99, ?, ?, ?)",
+            [(f"ORD-{5000 + start + i}", customer, status, now, now) for i in range(count)]
+        )
+        conn.commit()
+        conn.close()
+        fresh_db.bump_version("orders")
+
+    return add
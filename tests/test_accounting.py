@@ -0,0 +1,51 @@
+"""Tests for per-turn token, cost, tool and query accounting."""
+import asyncio
+
+import pytest
+
+from accounting import SessionAccounting, TurnRecord, llm_cost, server_timing
+
+
+def test_llm_cost_matches_the_longest_model_prefix():
+    assert llm_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert llm_cost("gpt-4o", 0, 1_000_000) == pytest.approx(10.0)
+    assert llm_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_session_totals_add_up_turns():
+    accounting = SessionAccounting()
+    for _ in range(2):
+        record = TurnRecord("hello")
+        record.record_llm("gpt-4o", 100, 20, 0.5)
+        record.record_tool("search_orders", 0.01, True)
+        record.finish()
+        accounting.add(record)
+
+    summary = accounting.summary()
+    assert (summary["turns"], summary["llm_calls"], summary["prompt_tokens"], summary["tool_calls"]) == (2, 2, 200, 2)
+    assert summary["cost_usd"] == round(2 * llm_cost("gpt-4o", 100, 20), 6)
+    assert "llm;dur=500.0" in server_timing(accounting.last_turn)
+
+
+def test_state_round_trip_keeps_turns_and_totals():
+    accounting = SessionAccounting()
+    record = TurnRecord("hi")
+    record.finish()
+    accounting.add(record)
+
+    restored = SessionAccounting()
+    restored.load_state(accounting.export_state())
+    assert restored.export() == accounting.export()
+    assert restored.summary() == accounting.summary()
+
+
+def test_agent_turns_are_recorded_with_their_path_and_tools(fresh_db):
+    from simple_agent import SimpleEcommerceAgent
+
+    agent = SimpleEcommerceAgent(use_response_cache=False)
+    asyncio.run(agent.process_message("show order ORD-1000"))
+
+    turn = agent.accounting.last_turn
+    assert turn["path"] == "fast_path"
+    assert [tool["name"] for tool in turn["tools"]] == ["get_order_details"]
+    assert turn["db_queries"] >= 1
@@ -0,0 +1,97 @@
+"""Tests for the LangGraph agent's nodes."""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent import agent_node, call_agent_llm, tool_node
+from history import ConversationHistory
+from speculation import Speculation
+
+
+def _state(history, emit=None):
+    return {
+        "messages": [HumanMessage(content="hello there")],
+        "detected_intent": "GENERAL",
+        "pending_action": None,
+        "awaiting_confirmation": False,
+        "conversation_context": {"history": history, "emit": emit}
+    }
+
+
+def test_speculative_calls_do_not_record_their_prompt():
+    history = ConversationHistory()
+    asyncio.run(call_agent_llm(_state(history), "GENERAL", record=False))
+    assert len(history.prompt_metrics) == 0
+
+    asyncio.run(call_agent_llm(_state(history), "GENERAL"))
+    assert len(history.prompt_metrics) == 1
+
+
+def test_accepted_speculation_records_once_and_streams_its_reply():
+    history = ConversationHistory()
+    events = []
+    state = _state(history, emit=lambda kind, text: events.append((kind, text)))
+
+    async def turn():
+        async def reply():
+            return AIMessage(content="Hi! How can I help?")
+
+        speculation = Speculation("GENERAL", reply())
+        assert speculation.confirm("GENERAL")
+        state["conversation_context"]["speculation"] = speculation
+        return await agent_node(state)
+
+    result = asyncio.run(turn())
+    assert result["messages"][-1].content == "Hi! How can I help?"
+    assert events == [("token", "Hi! How can I help?")]
+    assert len(history.prompt_metrics) == 1
+
+
+def test_locally_rendered_results_show_in_full_but_are_stored_shaped(fresh_db, add_orders):
+    add_orders(80)
+    state = _state(ConversationHistory())
+    state["conversation_context"]["format_read_results"] = True
+    state["messages"].append(AIMessage(content="", tool_calls=[
+        {"name": "search_orders", "args": {"customer_name": "Page Tester"}, "id": "call_1"}
+    ]))
+
+    result = asyncio.run(tool_node(state))
+    display = result["conversation_context"]["display"]
+    stored = result["messages"][-1].content
+    assert display.count("**Order ORD-") == 80
+    assert stored.count("**Order ORD-") < 80
+
+
+def test_sqlite_work_runs_off_the_event_loop(fresh_db, monkeypatch):
+    import threading
+
+    import agent
+    import formatting
+    from agent import EcommerceAgent
+
+    threads = []
+    route_message = agent.route_message
+    preview = formatting.preview_affected_rows
+    monkeypatch.setattr(agent, "route_message", lambda m: threads.append(threading.current_thread()) or route_message(m))
+    monkeypatch.setattr(formatting, "preview_affected_rows",
+                        lambda *a: threads.append(threading.current_thread()) or preview(*a))
+
+    async def turn():
+        loop_thread = threading.current_thread()
+        await EcommerceAgent(use_response_cache=False).process_message("show order ORD-1001")
+        state = _state(ConversationHistory())
+        state["messages"].append(AIMessage(content="", tool_calls=[
+            {"name": "bulk_update_order_status", "args": {"new_status": "Shipped", "current_status": "Processing"},
+             "id": "call_1"}
+        ]))
+        monkeypatch.setattr(agent, "call_agent_llm", lambda *a, **k: _return(state["messages"][-1]))
+        await agent_node(state)
+        return loop_thread
+
+    loop_thread = asyncio.run(turn())
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+async def _return(value):
+    return value
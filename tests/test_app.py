@@ -0,0 +1,49 @@
+"""Tests for the web API's request handling."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def client(fresh_db):
+    from app import app
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def _events(response):
+    return [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).splitlines()
+            if line.startswith("data: ")]
+
+
+@pytest.mark.parametrize("endpoint", ["/api/chat", "/api/chat/stream"])
+@pytest.mark.parametrize("body", ["not json", "[1, 2]", '{"message": 5}'])
+def test_bad_bodies_are_rejected(client, endpoint, body):
+    response = client.post(endpoint, data=body, content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_chat_and_stream_answer(client):
+    response = client.post("/api/chat", json={"message": "show order ORD-1001"})
+    assert response.status_code == 200
+    assert "ORD-1001" in response.get_json()["response"]
+
+    response = client.post("/api/chat/stream", json={"message": "show order ORD-1001"})
+    assert response.status_code == 200
+    events = _events(response)
+    assert events[-1]["type"] == "done" and "ORD-1001" in events[-1]["response"]
+
+
+def test_full_session_queue_is_a_429(client, monkeypatch):
+    from session_dispatch import session_dispatcher
+
+    client.post("/api/chat", json={"message": "hello"})
+    monkeypatch.setattr(session_dispatcher, "max_queued", -1)  # Every request finds the queue full
+
+    assert client.post("/api/chat", json={"message": "hello"}).status_code == 429
+    assert client.post("/api/chat/stream", json={"message": "hello"}).status_code == 429
+    assert client.get("/api/accounting").status_code == 429
+    assert client.post("/api/reset").status_code == 429
+
+    monkeypatch.undo()
+    assert client.get("/api/accounting").status_code == 200
@@ -0,0 +1,31 @@
+"""Tests for the tools benchmark harness."""
+import sqlite3
+
+from benchmark_tools import Case, build_database, failed_cases, time_case
+
+
+def test_failing_case_is_reported_without_timings(fresh_db):
+    case = Case("get_order_details(missing)", "get_order_details", lambda data, i: {"order_number": "ORD-0"})
+    row = time_case(case, None, repeat=3, warmup=0, max_seconds=1.0)
+    assert row["failed"]
+    assert "median_ms" not in row
+    assert failed_cases({"sizes": {"1k": {"cases": {case.name: row}}}}) == [("1k", case.name, row["error"])]
+
+
+def test_successful_case_is_timed(fresh_db):
+    case = Case("get_order_details", "get_order_details", lambda data, i: {"order_number": "ORD-1001"})
+    row = time_case(case, None, repeat=3, warmup=1, max_seconds=1.0)
+    assert row["runs"] == 3
+    assert row["min_ms"] <= row["median_ms"] <= row["p95_ms"]
+
+
+def test_built_database_is_left_in_wal_mode(tmp_path):
+    path = str(tmp_path / "orders-50.db")
+    build_database(path, 50)
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 50
+    finally:
+        conn.close()
@@ -0,0 +1,90 @@
+"""Tests for the LLM call deadline, hedging and retry policy."""
+import asyncio
+
+import pytest
+
+from call_policy import CallPolicy
+
+
+def _fast_policy(**overrides):
+    settings = dict(deadline=2.0, attempt_timeout=1.0, max_retries=2, backoff=0.001, max_backoff=0.002, hedge=False)
+    settings.update(overrides)
+    return CallPolicy(**settings)
+
+
+def test_transient_errors_are_retried():
+    policy = _fast_policy()
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    assert asyncio.run(policy.run(call)) == "ok"
+    assert len(attempts) == 3
+    assert policy.snapshot()["retries"] == 2
+
+
+def test_retries_stop_at_the_limit():
+    policy = _fast_policy(max_retries=1)
+
+    async def call():
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.run(call))
+    assert (policy.retries, policy.timeouts) == (1, 1)
+
+
+def test_other_errors_are_not_retried():
+    policy = _fast_policy()
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(policy.run(call))
+    assert len(attempts) == 1
+    assert policy.failures == 1
+
+
+def test_can_retry_vetoes_retries():
+    policy = _fast_policy()
+
+    async def call():
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.run(call, can_retry=lambda: False))
+    assert policy.retries == 0
+
+
+def test_slow_attempt_is_hedged_and_the_duplicate_wins():
+    policy = _fast_policy(hedge=True, hedge_default_delay=0.01)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        await asyncio.sleep(0.5 if len(attempts) == 1 else 0)
+        return len(attempts)
+
+    assert asyncio.run(policy.run(call)) == 2
+    assert (policy.hedges, policy.hedge_wins) == (1, 1)
+
+
+def test_hedge_delay_follows_recent_latencies():
+    policy = _fast_policy(hedge=True, hedge_default_delay=1.0, min_samples=3)
+    assert policy.hedge_delay() == 1.0
+    policy.latencies.extend([0.1, 0.2, 0.3])
+    assert policy.hedge_delay() == pytest.approx(0.3)
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = CallPolicy(backoff=1.0, max_backoff=4.0)
+    for retry in range(1, 6):
+        ceiling = min(4.0, 2 ** (retry - 1))
+        assert ceiling / 2 <= policy.backoff_delay(retry) <= ceiling
@@ -0,0 +1,24 @@
+"""Tests for printing the rest of a streamed reply in the CLI."""
+from chat_interface import unprinted_text
+
+
+def test_plain_reply_prints_nothing_after_its_tokens():
+    assert unprinted_text("Hello there!", "Hello there!", []) == ""
+
+
+def test_plain_reply_prints_the_unstreamed_tail():
+    assert unprinted_text("Hello there!", "Hello", []) == " there!"
+
+
+def test_streamed_results_are_not_printed_again():
+    response = "Order ORD-1000: Alice\nOrder ORD-1001: Bob"
+    results = ["Order ORD-1000: Alice", "Order ORD-1001: Bob"]
+    assert unprinted_text(response, "", results) == ""
+
+
+def test_tokens_before_results_do_not_duplicate_the_results():
+    # The model's preamble is streamed but isn't part of the tool reply
+    response = "Order ORD-1000: Alice\nPlease confirm cancelling ORD-1001 (yes/no)"
+    tokens = "Let me look that up."
+    results = ["Order ORD-1000: Alice"]
+    assert unprinted_text(response, tokens, results) == "Please confirm cancelling ORD-1001 (yes/no)"
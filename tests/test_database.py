@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+def test_backup_writes_verified_snapshot(fresh_db, tmp_path):
+    result = fresh_db.backup(str(tmp_path / "backups"), pages_per_step=1)
+
+    assert result["verified"]
+    assert result["restarts"] == 0
+    assert not result["single_step"]
+    with sqlite3.connect(result["path"]) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 5
+
+
+@pytest.mark.parametrize("keep", [0, -1])
+def test_backup_rejects_keep_below_one(fresh_db, tmp_path, keep):
+    with pytest.raises(ValueError):
+        fresh_db.backup(str(tmp_path / "backups"), keep=keep)
+    with pytest.raises(ValueError):
+        fresh_db.prune_backups(str(tmp_path / "backups"), keep=keep)
+
+
+def test_prune_keeps_newest_snapshots(fresh_db, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    paths = [fresh_db.backup(backup_dir, keep=2)["path"] for _ in range(3)]
+
+    assert fresh_db.list_backups(backup_dir) == paths[1:]
+
+
+def test_prune_leaves_other_databases_snapshots_alone(fresh_db, tmp_path):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    other = backup_dir / "ecommerce-archive-20240101-000000-000000.db"
+    other.write_bytes(b"")
+    paths = [fresh_db.backup(str(backup_dir), keep=1)["path"] for _ in range(2)]
+
+    assert fresh_db.list_backups(str(backup_dir)) == paths[1:]
+    assert other.exists()
+
+
+def test_backup_falls_back_to_single_step_when_writes_keep_restarting_it(fresh_db, tmp_path, monkeypatch):
+    writes = []
+
+    def write_between_steps(seconds):
+        # Another connection writing between steps makes SQLite restart the copy
+        with sqlite3.connect(fresh_db.db_path) as conn:
+            conn.execute("UPDATE products SET stock = stock + 1 WHERE id = 1")
+        writes.append(seconds)
+
+    monkeypatch.setattr(database.time, "sleep", write_between_steps)
+    result = fresh_db.backup(str(tmp_path / "backups"), pages_per_step=1, step_pause=0.001, max_restarts=2)
+
+    assert writes
+    assert result["restarts"] == 3
+    assert result["single_step"]
+    assert result["verified"]
@@ -0,0 +1,67 @@
+"""Tests for the shared background event loop."""
+import asyncio
+
+import pytest
+
+from event_loop import BackgroundLoop
+
+
+@pytest.fixture
+def loop():
+    background = BackgroundLoop(name="test-loop")
+    yield background
+    background.stop()
+
+
+def test_run_returns_the_coroutine_result_from_another_thread(loop):
+    async def answer():
+        await asyncio.sleep(0)
+        return 42
+
+    assert loop.run(answer()) == 42
+    assert loop.run(answer()) == 42
+    stats = loop.stats()
+    assert (stats["submitted"], stats["in_flight"], stats["failed"]) == (2, 0, 0)
+    assert stats["lag_ms"] is not None
+
+
+def test_errors_propagate_and_are_counted(loop):
+    async def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        loop.run(fail())
+    assert loop.stats()["failed"] == 1
+
+
+def test_timed_out_work_is_cancelled(loop):
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(TimeoutError):
+        loop.run(slow(), timeout=0.05)
+    loop.run(asyncio.sleep(0.05))
+    assert cancelled == [True]
+
+
+def test_iterate_drives_an_async_generator_and_closes_it(loop):
+    closed = []
+
+    async def numbers():
+        try:
+            for i in range(3):
+                yield i
+        finally:
+            closed.append(True)
+
+    iterator = loop.iterate(numbers())
+    assert next(iterator) == 0
+    iterator.close()  # The consumer went away
+    assert closed == [True]
+    assert list(loop.iterate(numbers())) == [0, 1, 2]
@@ -0,0 +1,36 @@
+"""Tests for the offline scripted chat model and its cassettes."""
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from fake_llm import CassetteMiss, build_offline_model
+
+
+def _upstream(replies):
+    return build_offline_model("fake", "gpt-4o", script=replies)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_recordings_replay_the_same_reply(tmp_path, use_async):
+    cassette_path = str(tmp_path / f"cassette-{use_async}.json")
+    prompt = [HumanMessage(content="hello")]
+
+    recorder = build_offline_model("record", "gpt-4o", upstream=_upstream(["Hi there!"]), cassette_path=cassette_path)
+    recorded = asyncio.run(recorder.ainvoke(prompt)) if use_async else recorder.invoke(prompt)
+    assert recorded.content == "Hi there!"
+
+    replayer = build_offline_model("replay", "gpt-4o", cassette_path=cassette_path)
+    assert replayer.invoke(prompt).content == "Hi there!"
+
+
+def test_replay_of_an_unrecorded_prompt_fails(tmp_path):
+    replayer = build_offline_model("replay", "gpt-4o", cassette_path=str(tmp_path / "empty.json"))
+    with pytest.raises(CassetteMiss):
+        replayer.invoke([HumanMessage(content="never recorded")])
+
+
+def test_script_is_used_before_the_rules():
+    model = build_offline_model("fake", "gpt-4o", script=["first"])
+    assert model.invoke([HumanMessage(content="hello")]).content == "first"
+    assert model.invoke([HumanMessage(content="hello")]).content  # Rules take over
@@ -0,0 +1,42 @@
+import pytest
+
+from fast_path import clean_message, route_message
+
+
+def test_clean_message_strips_filler_and_punctuation():
+    assert clean_message("Hi, can you show me  processing orders please?") == "show me processing orders"
+
+
+@pytest.mark.parametrize("message, tool_name, tool_args", [
+    ("Check order ORD-1001", "get_order_details", {"order_number": "ORD-1001"}),
+    ("what is the status of ORD 1002", "get_order_details", {"order_number": "ORD-1002"}),
+    ("Show me shipped orders", "search_orders", {"status": "Shipped"}),
+    ("orders that are canceled", "search_orders", {"status": "Cancelled"}),
+    ("show orders for john doe", "search_orders", {"customer_name": "John Doe"}),
+    ("list all orders", "search_orders", {}),
+    ("Show me accessories under $60", "search_products", {"category": "Accessories", "max_price": 60.0}),
+    ("what electronics do you have", "search_products", {"category": "Electronics"}),
+])
+def test_routes_common_reads(fresh_db, message, tool_name, tool_args):
+    match = route_message(message)
+    assert match is not None
+    assert (match.tool_name, match.tool_args) == (tool_name, tool_args)
+
+
+@pytest.mark.parametrize("message", [
+    "Cancel order ORD-1001",  # Mutation
+    "Check order ORD-1001 and why is it late",  # Extra clause the rule doesn't cover
+    "orders for John Doe who is angry",  # Name slot would swallow the rest
+    "orders for someone we never sold to",  # Not a known customer
+    "show me furniture",  # Unknown category
+    "hello",
+])
+def test_falls_back_to_the_llm(fresh_db, message):
+    assert route_message(message) is None
+
+
+def test_customer_check_uses_the_name_index(fresh_db):
+    plan = fresh_db.execute_query(
+        "EXPLAIN QUERY PLAN SELECT 1 FROM orders WHERE customer_name LIKE ? LIMIT 1", ("john doe%",)
+    )
+    assert any("idx_orders_customer_name" in row["detail"] for row in plan)
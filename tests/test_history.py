@@ -0,0 +1,81 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from history import ConversationHistory, dump_messages, load_messages, message_tokens, split_turns
+
+
+def _turn(i, size=200):
+    return [HumanMessage(content=f"question {i} about ORD-{1000 + i} " + "x" * size),
+            AIMessage(content=f"answer {i} " + "y" * size)]
+
+
+def _conversation(turns, size=200):
+    return [m for i in range(turns) for m in _turn(i, size)]
+
+
+def test_split_turns_keeps_tool_calls_with_their_results():
+    messages = [
+        HumanMessage(content="check ORD-1001"),
+        AIMessage(content="", tool_calls=[{"name": "get_order_details", "args": {"order_number": "ORD-1001"}, "id": "c1"}]),
+        ToolMessage(content="{}", tool_call_id="c1"),
+        AIMessage(content="It shipped."),
+        HumanMessage(content="thanks"),
+    ]
+    assert [len(turn) for turn in split_turns(messages)] == [4, 1]
+
+
+def test_compact_keeps_recent_turns_within_budget_and_summarizes_the_rest():
+    history = ConversationHistory(token_budget=300, summary_budget=4000)
+    messages = _conversation(10)
+
+    history.compact(messages)
+
+    assert messages[-2:] == _turn(9)
+    assert sum(message_tokens(m) for m in messages) <= 300
+    assert history.folded_messages == 20 - len(messages)
+    assert "ORD-1000" in history.summary
+
+
+def test_compact_always_keeps_the_requested_turns():
+    history = ConversationHistory(token_budget=10)
+    messages = _conversation(3, size=500)
+
+    history.compact(messages, keep_turns=2)
+
+    assert messages == _turn(1, 500) + _turn(2, 500)
+
+
+def test_summary_stays_within_its_budget():
+    history = ConversationHistory(token_budget=50, summary_budget=60)
+    history.compact(_conversation(30))
+
+    assert history.summary_message() is not None
+    assert len(history.summary) // 4 <= 60
+    assert "question 29" not in history.summary  # Still verbatim, not folded
+
+
+def test_build_prompt_puts_the_summary_after_the_system_prompt():
+    history = ConversationHistory(token_budget=50)
+    messages = _conversation(5)
+    history.compact(messages)
+    system = SystemMessage(content="You are helpful.")
+
+    prompt = history.build_prompt(system, messages)
+
+    assert prompt[0] is system
+    assert prompt[1].content.startswith("Summary of the earlier conversation")
+    assert prompt[2:] == messages
+
+
+def test_state_and_messages_round_trip():
+    history = ConversationHistory(token_budget=100)
+    messages = _conversation(6)
+    history.compact(messages)
+    history.record_prompt(messages, tool_tokens=10)
+
+    restored = ConversationHistory(token_budget=100)
+    restored.load_state(history.export_state())
+    assert restored.summary == history.summary
+    assert restored.stats() == history.stats()
+
+    tool_call = AIMessage(content="", tool_calls=[{"name": "search_orders", "args": {}, "id": "c9"}])
+    assert load_messages(dump_messages(messages + [tool_call])) == messages + [tool_call]
@@ -0,0 +1,46 @@
+"""Tests for the local naive Bayes intent classifier."""
+import pytest
+
+from intent_classifier import INTENT_MIN_CONFIDENCE, INTENTS, IntentClassifier, features, intent_classifier
+
+
+@pytest.mark.parametrize("message,intent", [
+    ("Show me my orders", "READ"),
+    ("Cancel order ORD-1002", "DELETE"),
+    ("Update the price of the laptop to $999", "UPDATE"),
+    ("Create an order for 2 laptops for John Smith", "CREATE"),
+    ("Hello, how are you?", "GENERAL"),
+])
+def test_clear_messages_are_classified_confidently(message, intent):
+    prediction = intent_classifier.predict(message)
+    assert prediction.intent == intent
+    assert prediction.confidence >= INTENT_MIN_CONFIDENCE
+
+
+def test_scores_are_a_distribution_over_every_intent():
+    prediction = intent_classifier.predict("what did I order last week")
+    assert set(prediction.scores) == set(INTENTS)
+    assert sum(prediction.scores.values()) == pytest.approx(1.0, abs=0.01)
+    assert prediction.scores[prediction.intent] == prediction.confidence
+
+
+def test_order_numbers_and_amounts_share_features():
+    # Specific numbers mustn't matter, only that one was mentioned
+    assert features("cancel ORD-1002") == features("cancel ord 1234")
+    assert features("set it to $12.50") == features("set it to 99")
+
+
+def test_fit_on_custom_examples():
+    classifier = IntentClassifier([("ping", "READ"), ("pong", "GENERAL")], intents=("READ", "GENERAL"))
+    assert classifier.predict("ping").intent == "READ"
+    assert classifier.predict("pong").intent == "GENERAL"
+
+
+def test_stats_count_local_predictions_and_fallbacks():
+    classifier = IntentClassifier([("ping", "READ")], intents=("READ",))
+    classifier.record(True)
+    classifier.record(True)
+    classifier.record(False)
+    stats = classifier.stats()
+    assert (stats["local"], stats["llm_fallbacks"]) == (2, 1)
+    assert stats["local_rate"] == round(2 / 3, 3)
@@ -0,0 +1,43 @@
+import asyncio
+
+import httpx
+
+from llm_clients import PerLoopAsyncClient
+
+
+def _client():
+    return PerLoopAsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="ok")))
+
+
+def test_one_pool_per_event_loop():
+    client = _client()
+
+    async def send():
+        response = await client.get("http://llm.test/")
+        return response.text, client.client_for_running_loop(), client.loop_pools
+
+    text, first, _ = asyncio.run(send())
+    assert text == "ok"
+
+    # A new loop (asyncio.run, or a loop per request) must not reuse the dead loop's pool
+    text, second, pools = asyncio.run(send())
+    assert text == "ok"
+    assert second is not first
+    assert pools == 1  # The closed loop's pool was dropped
+
+
+def test_same_loop_reuses_its_pool():
+    client = _client()
+
+    async def pools():
+        await client.get("http://llm.test/")
+        await client.get("http://llm.test/")
+        return client.client_for_running_loop(), client.client_for_running_loop()
+
+    first, second = asyncio.run(pools())
+    assert first is second
+
+
+def test_is_an_httpx_async_client():
+    # The OpenAI SDK only accepts httpx.AsyncClient instances
+    assert isinstance(_client(), httpx.AsyncClient)
@@ -0,0 +1,24 @@
+"""Tests for the load generator's statistics."""
+from load_test import LoadStats, percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.5) == 51.0
+    assert percentile(values, 0.99) == 100.0
+    assert percentile([], 0.5) is None
+
+
+def test_summary_counts_requests_and_errors_per_endpoint():
+    stats = LoadStats()
+    for seconds in (0.1, 0.2, 0.3):
+        stats.record("/api/chat", seconds)
+    stats.record("/api/chat", 1.0, error="HTTP 500")
+    stats.record("/api/reset", 0.05)
+
+    summary = stats.summary(elapsed=2.0)
+    chat = summary["endpoints"]["/api/chat"]
+    assert (chat["requests"], chat["errors"], chat["error_rate"]) == (4, 1, 0.25)
+    assert chat["error_kinds"] == {"HTTP 500": 1}
+    assert summary["overall"]["requests"] == 5
+    assert summary["overall"]["throughput_rps"] == 2.5
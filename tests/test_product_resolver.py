@@ -0,0 +1,58 @@
+import pytest
+
+from product_resolver import edit_distance, normalize_name, product_index
+from tools import canonicalize_tool_args, invoke_structured
+
+
+def test_normalize_and_edit_distance():
+    assert normalize_name("The Gaming-Keyboard!") == "gamingkeyboard"
+    assert normalize_name("my  USB-C   hub") == "usbc hub"
+    assert edit_distance("keyboard", "keybaord") == 2
+    assert edit_distance("", "abc") == 3
+
+
+def test_resolves_typos_and_partial_names(fresh_db):
+    assert product_index.resolve("gaming keybaord")["match"] == "Gaming Keyboard"
+    assert product_index.resolve("the wireless mouse")["match"] == "Wireless Mouse"
+    assert product_index.resolve("completely unrelated")["match"] is None
+
+
+def test_index_follows_catalog_changes(fresh_db):
+    assert invoke_structured("add_product", {"product_name": "Standing Desk", "price": 300, "stock": 5}).success
+    assert product_index.resolve("standing dsk")["match"] == "Standing Desk"
+
+
+def test_canonicalize_only_touches_product_name_tools(fresh_db):
+    args = canonicalize_tool_args("update_product_stock", {"product_name": "wireless mose", "new_stock": 3})
+    assert args == {"product_name": "Wireless Mouse", "new_stock": 3}
+
+    names = canonicalize_tool_args("bulk_update_product_price", {"percent_change": 5, "product_names": ["usb c hub"]})
+    assert names["product_names"] == ["USB-C Hub"]
+
+    untouched = {"order_number": "ORD-1001"}
+    assert canonicalize_tool_args("cancel_order", untouched) is untouched
+
+
+@pytest.mark.parametrize("tool_name, args", [
+    ("update_product_price", {"product_name": "Laptop Pro 16", "new_price": 1.0}),
+    ("update_product_stock", {"product_name": "Laptop Pro 16", "new_stock": 0}),
+    ("delete_product", {"product_name": "Laptop Pro 16"}),
+    ("create_order", {"customer_name": "Ann", "product_name": "Laptop Pro 16", "quantity": 1}),
+])
+def test_destructive_tools_require_exact_names(fresh_db, tool_name, args):
+    before = fresh_db.execute_query("SELECT * FROM products WHERE product_name = 'Laptop Pro 15'")
+
+    result = invoke_structured(tool_name, args)
+
+    assert not result.success
+    assert "Laptop Pro 15" in result.fields["candidates"]
+    assert fresh_db.execute_query("SELECT * FROM products WHERE product_name = 'Laptop Pro 15'") == before
+
+
+def test_bulk_price_change_reports_unknown_names(fresh_db):
+    result = invoke_structured(
+        "bulk_update_product_price",
+        {"percent_change": 10, "product_names": ["USB-C Hub", "usb c hubb"]}
+    )
+    assert result.fields["affected"] == 1
+    assert "Not found: usb c hubb" in result.message
@@ -0,0 +1,46 @@
+import response_cache as response_cache_module
+from response_cache import ResponseCache, is_cacheable_message, normalize_query
+from tools import invoke_structured
+
+
+def test_equivalent_messages_share_a_key(fresh_db):
+    cache = ResponseCache()
+    assert normalize_query("Hi, show me all products please!") == normalize_query("show me all products")
+    assert cache.make_key("Show me all products?") == cache.make_key("show me  all products")
+
+
+def test_context_dependent_messages_are_not_cacheable():
+    assert is_cacheable_message("show me all products")
+    assert not is_cacheable_message("cancel it")
+    assert not is_cacheable_message("show me the same again")
+    assert not is_cacheable_message("   ")
+
+
+def test_writes_make_old_entries_unreachable(fresh_db):
+    cache = ResponseCache()
+    key = cache.make_key("show me all products")
+    cache.put(key, "five products")
+    assert cache.get(cache.make_key("show me all products")) == "five products"
+
+    invoke_structured("update_product_stock", {"product_name": "USB-C Hub", "new_stock": 1})
+
+    assert cache.get(cache.make_key("show me all products")) is None
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl_seconds=10)
+
+    cache.put(("a",), 1)
+    cache.put(("b",), 2)
+    cache.get(("a",))
+    cache.put(("c",), 3)  # Evicts b, the least recently used
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+
+    now[0] += 11
+    assert cache.get(("c",)) is None
+
+    stats = cache.stats()
+    assert (stats["evictions"], stats["expirations"], stats["hits"]) == (1, 1, 2)
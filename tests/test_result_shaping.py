@@ -0,0 +1,55 @@
+from result_shaping import estimate_tokens, shape_for_llm, summarize_rows
+from tool_results import ToolResult
+
+
+def _orders(n, start=0):
+    return [
+        {"order_number": f"ORD-{2000 + i}", "status": "Shipped" if i % 2 else "Processing", "price": float(i)}
+        for i in range(start, start + n)
+    ]
+
+
+def test_small_result_is_unchanged():
+    result = ToolResult(True, count=2, total=2, offset=0, orders=_orders(2))
+    assert shape_for_llm(result) is result
+
+
+def test_rows_are_cut_to_the_budget_with_a_summary_of_the_rest():
+    rows = _orders(50)
+    budget = estimate_tokens(rows[0]) * 10
+    shaped = shape_for_llm(ToolResult(True, count=50, total=50, offset=0, orders=rows), token_budget=budget)
+
+    assert shaped.fields["shown"] == 10
+    assert shaped.fields["orders"] == rows[:10]
+    assert shaped.fields["omitted"] == 40
+    assert shaped.fields["next_offset"] == 10
+    assert shaped.fields["omitted_summary"] == summarize_rows(rows[10:])
+
+
+def test_hint_counts_matches_beyond_the_page():
+    # Second page of 100 rows out of 250 matches, cut to 10 rows by the budget
+    rows = _orders(100, start=100)
+    budget = estimate_tokens(rows[0]) * 10
+    result = ToolResult(True, count=100, total=250, offset=100, orders=rows, next_offset=200)
+    shaped = shape_for_llm(result, token_budget=budget)
+
+    assert shaped.fields["next_offset"] == 110
+    assert shaped.fields["omitted"] == 140
+    assert "rows 101-110 of 250" in shaped.fields["note"]
+
+
+def test_full_page_that_fits_still_points_to_the_next_page():
+    result = ToolResult(True, count=5, total=12, offset=0, orders=_orders(5), next_offset=5)
+    shaped = shape_for_llm(result)
+
+    assert shaped.fields["omitted"] == 7
+    assert shaped.fields["next_offset"] == 5
+
+
+def test_summarize_rows_counts_and_ranges():
+    summary = summarize_rows(_orders(4))
+    assert summary == {
+        "count": 4,
+        "by_status": {"Processing": 2, "Shipped": 2},
+        "price_range": {"min": 0.0, "max": 3.0}
+    }
@@ -0,0 +1,59 @@
+import semantic_search
+from semantic_search import ProductVectorIndex, tokenize
+
+
+def _product(i):
+    return {"product_name": f"Widget {i}", "description": f"Gadget number {i} for the desk", "category": "Accessories"}
+
+
+def test_finds_products_by_description(fresh_db):
+    index = ProductVectorIndex()
+    names = [name for name, score in index.search("something to type on")]
+    assert names[0] == "Gaming Keyboard"
+    assert index.search("zzzz qqqq") == []
+
+
+def test_adds_and_removes_without_rebuilding(fresh_db):
+    index = ProductVectorIndex()
+    assert len(index) == 5
+
+    index.add({"product_name": "Desk Lamp", "description": "LED light for your desk", "category": "Accessories"})
+    assert index.search("desk light", top_k=1)[0][0] == "Desk Lamp"
+
+    index.remove("Desk Lamp")
+    assert "Desk Lamp" not in [name for name, score in index.search("desk light")]
+    assert len(index) == 5
+
+
+def test_capacity_grows_and_dead_rows_are_compacted(fresh_db, monkeypatch):
+    # Keep IDF fixed so only growth and compaction are exercised
+    monkeypatch.setattr(semantic_search, "REBUILD_RATIO", 1000)
+    index = ProductVectorIndex()
+    len(index)  # Build
+
+    for i in range(200):
+        index.add(_product(i))
+    assert index._matrix.shape[0] >= 205
+
+    for i in range(150):
+        index.remove(f"Widget {i}")
+
+    assert index.compactions >= 1
+    assert len(index) == 55
+    assert len(index._names) - len(index) <= semantic_search.COMPACT_RATIO * len(index._names) + 1
+    results = index.search("gadget widget 175", top_k=60)
+    assert "Widget 175" in [name for name, score in results]
+    assert not any(name in {f"Widget {i}" for i in range(150)} for name, score in results)
+
+
+def test_replacing_a_product_keeps_one_row(fresh_db):
+    index = ProductVectorIndex()
+    len(index)
+    index.add({"product_name": "USB-C Hub", "description": "Docking station with HDMI", "category": "Accessories"})
+
+    assert len(index) == 5
+    assert [name for name, score in index.search("docking station hdmi", top_k=5)].count("USB-C Hub") == 1
+
+
+def test_tokenize_drops_stopwords():
+    assert "the" not in tokenize("The keyboard for my desk")
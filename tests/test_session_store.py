@@ -0,0 +1,141 @@
+"""Tests for the bounded session store and its disk spill."""
+import asyncio
+import os
+
+import pytest
+
+from session_store import SessionStore
+
+
+class _Agent:
+    """Just enough of an agent for the store: state in, state out, a size."""
+
+    def __init__(self):
+        self.notes = []
+
+    def export_state(self):
+        return {"notes": list(self.notes)}
+
+    def load_state(self, state):
+        self.notes = list(state["notes"])
+
+    def state_size(self):
+        return sum(len(note) for note in self.notes)
+
+
+def _store(tmp_path, **limits):
+    return SessionStore(_Agent, spill_dir=str(tmp_path / "spill"), **limits)
+
+
+def test_lru_session_is_spilled_and_rehydrated(tmp_path):
+    store = _store(tmp_path, max_sessions=1)
+
+    async def scenario():
+        (await store.get("alice")).notes.append("hello from alice")
+        await store.get("bob")
+        await store.flush()
+        assert os.path.exists(store._path("alice"))
+
+        alice = await store.get("alice")
+        assert alice.notes == ["hello from alice"]
+        await store.flush()
+
+    asyncio.run(scenario())
+    stats = store.stats()
+    assert (stats["resident"], stats["spilled"], stats["created"], stats["rehydrated"]) == (1, 1, 2, 1)
+    assert stats["evictions"]["lru"] == 2
+    assert not os.path.exists(store._path("alice"))
+
+
+def test_agent_state_survives_the_round_trip(tmp_path, fresh_db):
+    from simple_agent import SimpleEcommerceAgent
+
+    store = SessionStore(SimpleEcommerceAgent, spill_dir=str(tmp_path / "spill"), max_sessions=1)
+
+    async def scenario():
+        agent = await store.get("alice")
+        await agent.process_message("show order ORD-1001")
+        before = agent.export_state()
+        await store.get("bob")
+        await store.flush()
+        return before, (await store.get("alice")).export_state()
+
+    before, after = asyncio.run(scenario())
+    assert after == before
+
+
+def test_sizes_are_tracked_from_each_lookup(tmp_path):
+    store = _store(tmp_path, max_bytes=10)
+
+    async def scenario():
+        (await store.get("alice")).notes.append("x" * 8)
+        (await store.get("bob")).notes.append("y" * 8)
+        # A session's growth is measured on its next lookup
+        await store.get("alice")
+        assert store.stats()["resident_bytes"] == 8
+        await store.get("bob")
+        await store.flush()
+
+    asyncio.run(scenario())
+    stats = store.stats()
+    assert stats["evictions"]["memory"] == 1
+    assert stats["resident_bytes"] == 8
+
+
+def test_busy_sessions_are_not_evicted(tmp_path):
+    store = SessionStore(_Agent, spill_dir=str(tmp_path / "spill"), max_sessions=1,
+                         is_busy=lambda session_id: session_id == "alice")
+
+    async def scenario():
+        await store.get("alice")
+        await store.get("bob")
+        await store.flush()
+
+    asyncio.run(scenario())
+    assert store.stats()["resident"] == 2
+
+
+def test_lookup_during_a_spill_waits_for_it(tmp_path):
+    store = _store(tmp_path, max_sessions=1)
+
+    async def scenario():
+        (await store.get("alice")).notes.append("kept")
+        await store.get("bob")  # Starts spilling alice in the background
+        assert store.stats()["spilling"] == 1
+        return (await store.get("alice")).notes
+
+    assert asyncio.run(scenario()) == ["kept"]
+
+
+def test_sweep_spills_idle_sessions_and_deletes_expired_files(tmp_path):
+    store = _store(tmp_path, idle_ttl=0.0, spill_ttl=3600)
+
+    async def scenario():
+        await store.get("alice")
+        await asyncio.sleep(0.01)
+        await store.sweep()
+        assert store.stats()["evictions"]["idle"] == 1
+
+        store.spill_ttl = -1  # Everything on disk is now past its TTL
+        await store.sweep()
+
+    asyncio.run(scenario())
+    stats = store.stats()
+    assert (stats["resident"], stats["spilled"], stats["expired_spills"]) == (0, 0, 1)
+    assert not os.path.exists(store._path("alice"))
+
+
+def test_unreadable_spill_file_starts_a_new_conversation(tmp_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    (spill_dir / "alice.json.z").write_bytes(b"not zlib")
+    store = SessionStore(_Agent, spill_dir=str(spill_dir))
+
+    agent = asyncio.run(store.get("alice"))
+    assert agent.notes == []
+    assert store.stats()["spill_errors"] == 1
+
+
+def test_invalid_session_ids_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(_store(tmp_path).get("../etc/passwd"))
@@ -0,0 +1,35 @@
+import json
+
+from tool_results import ToolResult, dumps
+from tools import TOOLS_BY_NAME, invoke_structured
+
+
+def test_to_dict_and_json_round_trip():
+    result = ToolResult(True, count=1, orders=[{"order_number": "ORD-1001", "price": 9.5}])
+    assert result.to_dict() == {"success": True, "count": 1, "orders": [{"order_number": "ORD-1001", "price": 9.5}]}
+    assert json.loads(result.to_json()) == result.to_dict()
+
+
+def test_message_prefers_message_over_error():
+    assert ToolResult(False, error="boom").message == "boom"
+    assert ToolResult(True, message="done", error="ignored").message == "done"
+    assert ToolResult(True).message is None
+
+
+def test_dumps_falls_back_for_values_orjson_rejects():
+    assert json.loads(dumps({1: "non-str key"})) == {"1": "non-str key"}
+    assert json.loads(dumps({"big": 2 ** 70})) == {"big": 2 ** 70}
+
+
+def test_in_process_result_matches_langchain_tool_json(fresh_db):
+    structured = invoke_structured("get_order_details", {"order_number": "ORD-1001"})
+    as_json = TOOLS_BY_NAME["get_order_details"].invoke({"order_number": "ORD-1001"})
+
+    assert structured.success
+    assert json.loads(as_json) == structured.to_dict()
+
+
+def test_unknown_tool():
+    result = invoke_structured("no_such_tool", {})
+    assert not result.success
+    assert "not found" in result.message
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+import tools
+from formatting import format_result
+from result_shaping import estimate_tokens, shape_for_llm
+from tools import ALL_TOOLS, READ_TOOLS, TOOLS_BY_INTENT, invoke_structured, tools_for_turn
+
+
+def test_search_pages_in_sql_and_reports_total(fresh_db, add_orders):
+    add_orders(250)
+
+    first = invoke_structured("search_orders", {"customer_name": "Page Tester"})
+    assert first.fields["count"] == tools.SEARCH_PAGE_SIZE
+    assert first.fields["total"] == 250
+    assert first.fields["next_offset"] == 100
+
+    last = invoke_structured("search_orders", {"customer_name": "Page Tester", "offset": 200})
+    assert last.fields["count"] == 50
+    assert last.fields["total"] == 250
+    assert "next_offset" not in last.fields
+    assert last.fields["orders"][0]["order_number"] == "ORD-5200"
+
+
+def test_truncation_summary_covers_every_remaining_match(fresh_db, add_orders):
+    add_orders(850, customer="Bulk Buyer")
+    add_orders(150, customer="Bulk Buyer", status="Shipped", start=850)
+
+    result = invoke_structured("search_orders", {"customer_name": "Bulk Buyer"})
+    shaped = shape_for_llm(result, token_budget=estimate_tokens(result.fields["orders"][0]) * 10)
+
+    shown = shaped.fields["shown"]
+    assert shown < 100
+    assert shaped.fields["omitted"] == 1000 - shown
+    assert shaped.fields["omitted_summary"]["count"] == 1000 - shown
+    assert shaped.fields["omitted_summary"]["by_status"] == {"Processing": 850 - shown, "Shipped": 150}
+    assert "remaining_summary" not in shaped.fields
+    assert f"...and {1000 - shown} more not shown." in format_result(shaped.fields)
+    assert "Shipped: 150" in format_result(shaped.fields)
+
+    # Rendered locally, the untruncated page summarizes the matches after it
+    assert "...and 900 more not shown." in format_result(result.fields)
+    assert "Processing: 750, Shipped: 150" in format_result(result.fields)
+
+
+def test_search_limit_is_capped(fresh_db, add_orders):
+    add_orders(150)
+    result = invoke_structured("search_orders", {"customer_name": "Page Tester", "limit": 1000})
+    assert result.fields["count"] == tools.SEARCH_PAGE_SIZE
+
+
+def test_short_page_skips_the_count_query(fresh_db, monkeypatch):
+    queries = []
+    execute_query = fresh_db.execute_query
+    monkeypatch.setattr(fresh_db, "execute_query", lambda q, p=(): queries.append(q) or execute_query(q, p))
+
+    result = invoke_structured("search_products", {"category": "Accessories"})
+
+    assert result.fields["total"] == result.fields["count"]
+    assert not any("COUNT(*)" in q for q in queries)
+
+
+def test_search_fields_are_whitelisted(fresh_db):
+    result = invoke_structured("search_orders", {"fields": ["status; DROP TABLE orders"]})
+    assert not result.success
+    assert "Unknown field" in result.message
+
+
+def test_llm_json_of_a_large_search_points_past_the_page(fresh_db, add_orders):
+    add_orders(250)
+    shaped = tools.shape_for_llm(invoke_structured("search_orders", {"customer_name": "Page Tester"}))
+
+    assert shaped.fields["truncated"]
+    assert shaped.fields["omitted"] == 250 - shaped.fields["shown"]
+
+
+@pytest.mark.parametrize("name", ["search_orders", "search_products"])
+def test_no_matches(fresh_db, name):
+    args = {"customer_name": "Nobody"} if name == "search_orders" else {"product_name": "Nothing"}
+    assert not invoke_structured(name, args).success
+
+
+def test_fields_project_columns_and_keep_the_key(fresh_db):
+    result = invoke_structured("get_order_details", {"order_number": "ORD-1001", "fields": ["status"]})
+    assert set(result.fields["order"]) == {"order_number", "status"}
+
+    result = invoke_structured("search_products", {"fields": ["price", "price"]})
+    assert all(set(row) == {"product_name", "price"} for row in result.fields["products"])
+
+
+def test_bulk_status_update_reports_missing_orders(fresh_db):
+    result = invoke_structured(
+        "bulk_update_order_status",
+        {"new_status": "Delivered", "order_numbers": ["ORD-1001", "ORD-1002", "ORD-9999"]}
+    )
+
+    assert result.success
+    assert result.fields["affected"] == 2
+    assert "Not found: ORD-9999" in result.message
+    statuses = fresh_db.execute_query("SELECT status FROM orders WHERE order_number IN ('ORD-1001', 'ORD-1002')")
+    assert {row["status"] for row in statuses} == {"Delivered"}
+
+
+def test_bulk_update_needs_a_selection_and_preview_counts_rows(fresh_db):
+    assert not invoke_structured("bulk_update_order_status", {"new_status": "Shipped"}).success
+    assert tools.preview_affected_rows("bulk_update_product_price", {"category": "Accessories"}) == 3
+    assert tools.preview_affected_rows("cancel_order", {"order_number": "ORD-1001"}) is None
+
+
+def test_bulk_status_update_refuses_to_cancel(fresh_db):
+    stock = fresh_db.execute_query("SELECT SUM(stock) AS total FROM products")[0]["total"]
+    result = invoke_structured("bulk_update_order_status", {"new_status": "Cancelled", "current_status": "Processing"})
+
+    assert not result.success
+    assert "cancel_order" in result.message
+    assert fresh_db.execute_query("SELECT COUNT(*) AS n FROM orders WHERE status = 'Cancelled'")[0]["n"] == 0
+    assert fresh_db.execute_query("SELECT SUM(stock) AS total FROM products")[0]["total"] == stock
+
+
+def test_bulk_update_that_matches_nothing_keeps_the_data_version(fresh_db):
+    version = fresh_db.data_version("orders", "products")
+
+    assert not invoke_structured("bulk_update_order_status", {"new_status": "Shipped", "order_numbers": ["ORD-9999"]}).success
+    assert not invoke_structured("bulk_update_product_price", {"percent_change": 5, "category": "Nope"}).success
+    assert fresh_db.data_version("orders", "products") == version
+
+
+def test_bulk_price_change(fresh_db):
+    before = fresh_db.execute_query("SELECT price FROM products WHERE product_name = 'USB-C Hub'")[0]["price"]
+    result = invoke_structured("bulk_update_product_price", {"percent_change": -10, "category": "Accessories"})
+    after = fresh_db.execute_query("SELECT price FROM products WHERE product_name = 'USB-C Hub'")[0]["price"]
+
+    assert result.fields["affected"] == 3
+    assert after == round(before * 0.9, 2)
+    assert not invoke_structured("bulk_update_product_price", {"percent_change": -100, "category": "Accessories"}).success
+
+
+def test_batch_keeps_call_order_and_isolates_failures(fresh_db):
+    calls = [
+        {"name": "get_order_details", "args": {"order_number": "ORD-1002"}},
+        {"name": "get_order_details", "args": {}},  # Fails schema validation
+        {"name": "get_order_details", "args": {"order_number": "ORD-1001"}},
+    ]
+    results = asyncio.run(tools.ainvoke_structured_batch(calls, max_concurrency=2))
+
+    assert [r.success for r in results] == [True, False, True]
+    assert results[0].fields["order"]["order_number"] == "ORD-1002"
+    assert results[2].fields["order"]["order_number"] == "ORD-1001"
+
+
+def test_tools_for_turn_binds_the_intent_subset():
+    assert tools_for_turn("READ", "show me my orders") is TOOLS_BY_INTENT["READ"]
+    assert tools_for_turn("DELETE", "cancel order ORD-1002") is TOOLS_BY_INTENT["DELETE"]
+
+
+def test_general_messages_can_still_read():
+    assert tools_for_turn("GENERAL", "hi, what do you sell?") == READ_TOOLS
+
+
+def test_mutation_outside_the_intent_binds_every_tool():
+    assert tools_for_turn("READ", "show my orders and cancel the last one") is ALL_TOOLS
+    assert tools_for_turn("CREATE", "add a mouse to my order and remove the keyboard") is ALL_TOOLS
+
+
+def test_follow_up_after_a_tool_turn_binds_every_tool():
+    assert tools_for_turn("READ", "and the second one?", previous_turn_used_tools=True) is ALL_TOOLS
+
+
+def test_simple_agent_binds_every_tool_after_a_tool_turn(fresh_db):
+    from simple_agent import SimpleEcommerceAgent
+
+    agent = SimpleEcommerceAgent(use_response_cache=False)
+    assert agent._tools_for_message("show me my orders")[0] is TOOLS_BY_INTENT["READ"]
+
+    # A fast-path lookup counts as a tool turn for the next message
+    asyncio.run(agent.process_message("show order ORD-1000"))
+    assert agent.turn_used_tools
+    agent2 = SimpleEcommerceAgent()
+    agent2.load_state(agent.export_state())
+    assert agent2.turn_used_tools
+
+
+def test_order_numbers_continue_past_9999(fresh_db, add_orders):
+    add_orders(20, customer="Numbering Tester", start=4990)  # ORD-9990 ... ORD-10009
+
+    # As text, "ORD-9999" is the maximum; by value it is ORD-10009
+    for expected in ("ORD-10010", "ORD-10011"):
+        result = invoke_structured("create_order", {"customer_name": "Numbering Tester", "product_name": "USB-C Hub", "quantity": 1})
+        assert result.success, result.message
+        assert result.to_dict()["order"]["order_number"] == expected
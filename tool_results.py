@@ -0,0 +1,51 @@
+"""
+Structured tool results and fast JSON serialization.
+
+Tools build a ToolResult in-process. It is only turned into a JSON string
+at the LLM/HTTP boundary, so in-process callers (like SimpleEcommerceAgent)
+can read the data directly without a dumps/loads round trip.
+"""
+from typing import Any, Dict, Optional
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data: Any) -> str:
+    """Serialize data to a JSON string, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            # orjson is stricter (e.g. big ints, non-str keys); fall back to json
+            pass
+    return json.dumps(data)
+
+
+class ToolResult:
+    """Result of a tool call, kept as Python data until it leaves the process."""
+
+    __slots__ = ("success", "fields")
+
+    def __init__(self, success: bool, **fields: Any):
+        self.success = success
+        self.fields = fields
+
+    @property
+    def message(self) -> Optional[str]:
+        """The result's message or error text, if any."""
+        return self.fields.get("message") or self.fields.get("error")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result as a plain dict (the shape of the JSON payload)."""
+        return {"success": self.success, **self.fields}
+
+    def to_json(self) -> str:
+        """Serialize the result for the LLM or an HTTP response."""
+        return dumps(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"ToolResult(success={self.success!r}, fields={list(self.fields)!r})"
@@ -1,21 +1,187 @@
 """
 Database tools for CRUD operations with LangChain integration.
 """
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from langchain_core.tools import tool
 from datetime import datetime
-import json
+import asyncio
+import functools
+import re
+import time
 from database import db
+from tool_results import ToolResult
+from result_shaping import COUNT_COLUMNS, RANGE_COLUMNS, shape_for_llm
+from product_resolver import product_index
+from semantic_search import product_vectors
+from accounting import record_tool
+
+
+# In-process tool functions, keyed by tool name. They return ToolResult objects;
+# the LangChain tools built from them return the same data as a JSON string,
+# with large row lists capped to the LLM token budget.
+STRUCTURED_TOOLS: Dict[str, Callable[..., ToolResult]] = {}
+
+
+def structured_tool(func: Callable[..., ToolResult]):
+    """Register a ToolResult-returning function and wrap it as a LangChain tool."""
+    STRUCTURED_TOOLS[func.__name__] = func
+
+    @functools.wraps(func)
+    def as_json(*args, **kwargs) -> str:
+        return shape_for_llm(func(*args, **kwargs)).to_json()
+
+    as_json.__annotations__ = {**func.__annotations__, "return": str}
+    return tool(as_json)
+
+
+# Columns the read tools may project with their `fields` argument
+ORDER_FIELDS = (
+    "id", "order_number", "customer_name", "product_name",
+    "quantity", "price", "status", "created_at", "updated_at"
+)
+PRODUCT_FIELDS = (
+    "id", "product_name", "description", "price", "stock", "category", "created_at"
+)
+
+
+def _select_list(fields: Optional[List[str]], allowed: tuple, key: str) -> str:
+    """Build a SELECT column list from whitelisted fields (key column always included)."""
+    if not fields:
+        return "*"
+
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Allowed fields: {', '.join(allowed)}")
+
+    columns = [key] + [f for f in dict.fromkeys(fields) if f != key]
+    return ", ".join(columns)
+
+
+def _find_product(product_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a product by its exact catalog name.
+
+    Approximate names are resolved by canonicalize_tool_args, before the user
+    confirms. Resolving them here as well would let callers that skip the
+    confirmation (fast path, direct tool use) change a product nobody named.
+    """
+    results = db.execute_query("SELECT * FROM products WHERE product_name = ?", (product_name,))
+    return results[0] if results else None
+
+
+def _product_not_found(product_name: str, reason: str = "not found") -> ToolResult:
+    """Not-found result that suggests the closest catalog names."""
+    candidates = [name for name, score in product_index.candidates(product_name, limit=3)]
+    message = f"Product '{product_name}' {reason}."
+    if candidates:
+        message += f" Did you mean: {', '.join(candidates)}?"
+    return ToolResult(False, message=message, candidates=candidates)
+
+
+# Tools whose product name arguments must match an existing catalog entry
+PRODUCT_NAME_TOOLS = (
+    "create_order", "update_product_price", "update_product_stock",
+    "delete_product", "bulk_update_product_price"
+)
+
+
+def canonicalize_tool_args(tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace approximate product names in tool arguments with catalog names.
+
+    Used before asking for confirmation, so the user confirms the exact
+    product that will be changed.
+    """
+    if tool_name not in PRODUCT_NAME_TOOLS:
+        return tool_args
+
+    args = dict(tool_args)
+    if isinstance(args.get("product_name"), str):
+        args["product_name"] = product_index.resolve(args["product_name"])["match"] or args["product_name"]
+    if isinstance(args.get("product_names"), list):
+        args["product_names"] = [
+            product_index.resolve(name)["match"] or name for name in args["product_names"]
+        ]
+    return args
+
+
+# Most rows a search returns per call; the rest are paged with `offset`
+SEARCH_PAGE_SIZE = 100
+
+
+def _search_page(table: str, columns: str, where: str, params: list, offset: int, limit: int) -> tuple:
+    """
+    One page of a filtered search, plus the number of rows matching the filter.
+
+    The COUNT(*) is skipped when the page itself shows where the matches end.
+    """
+    limit = max(1, min(limit, SEARCH_PAGE_SIZE))
+    offset = max(0, offset)
+    rows = db.execute_query(
+        f"SELECT {columns} FROM {table} WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+        tuple(params) + (limit, offset)
+    )
+
+    if (rows and len(rows) < limit) or (not rows and not offset):
+        total = offset + len(rows)
+    else:
+        total = db.execute_query(f"SELECT COUNT(*) AS total FROM {table} WHERE {where}", tuple(params))[0]["total"]
+
+    return rows, total
+
+
+def _remaining_summary(table: str, where: str, params: list, start: int, total: int) -> Dict[str, Any]:
+    """
+    Summary statistics (as result_shaping.summarize_rows builds them) of the
+    matches after the first `start` rows, computed in SQL over the whole filter.
+    """
+    table_fields = ORDER_FIELDS if table == "orders" else PRODUCT_FIELDS
+    remaining = f"(SELECT * FROM {table} WHERE {where} ORDER BY id LIMIT -1 OFFSET ?)"
+    args = tuple(params) + (start,)
+    summary: Dict[str, Any] = {"count": total - start}
+
+    for column in COUNT_COLUMNS:
+        if column in table_fields:
+            counts = db.execute_query(
+                f"SELECT {column} AS value, COUNT(*) AS n FROM {remaining} GROUP BY {column} ORDER BY n DESC",
+                args
+            )
+            summary[f"by_{column}"] = {row["value"]: row["n"] for row in counts}
+
+    for column in RANGE_COLUMNS:
+        if column in table_fields:
+            bounds = db.execute_query(
+                f"SELECT MIN({column}) AS min, MAX({column}) AS max FROM {remaining}", args
+            )[0]
+            if bounds["min"] is not None:
+                summary[f"{column}_range"] = bounds
+
+    return summary
+
+
+def _page_fields(rows: list, total: int, offset: int, table: str, where: str, params: list) -> Dict[str, Any]:
+    """
+    count/total/offset fields of a search result. When more rows match, adds
+    next_offset and a remaining_summary of every match after this page.
+    """
+    fields = {"count": len(rows), "total": total, "offset": offset}
+    if offset + len(rows) < total:
+        fields["next_offset"] = offset + len(rows)
+        fields["remaining_summary"] = _remaining_summary(table, where, params, offset + len(rows), total)
+    return fields
 
 
 # ==================== READ OPERATIONS ====================
 
-@tool
+@structured_tool
 def search_orders(
     order_number: Optional[str] = None,
     customer_name: Optional[str] = None,
-    status: Optional[str] = None
-) -> str:
+    status: Optional[str] = None,
+    offset: int = 0,
+    limit: int = SEARCH_PAGE_SIZE,
+    fields: Optional[List[str]] = None
+) -> ToolResult:
     """
     Search for orders in the database. Can filter by order number, customer name, or status.
 
@@ -23,42 +189,50 @@ def search_orders(
         order_number: Filter by order number (e.g., 'ORD-1001')
         customer_name: Filter by customer name (partial match supported)
         status: Filter by order status (e.g., 'Shipped', 'Processing', 'Delivered', 'Cancelled')
+        offset: Number of matching orders to skip (use the 'next_offset' of a previous result)
+        limit: Maximum number of orders to return (at most 100)
+        fields: Only return these columns (e.g., ['status']). One of: id, order_number,
+            customer_name, product_name, quantity, price, status, created_at, updated_at
 
     Returns:
         JSON string with matching orders or error message
     """
     try:
-        query = "SELECT * FROM orders WHERE 1=1"
+        columns = _select_list(fields, ORDER_FIELDS, 'order_number')
+        where = "1=1"
         params = []
 
         if order_number:
-            query += " AND order_number = ?"
+            where += " AND order_number = ?"
             params.append(order_number)
 
         if customer_name:
-            query += " AND customer_name LIKE ?"
+            where += " AND customer_name LIKE ?"
             params.append(f"%{customer_name}%")
 
         if status:
-            query += " AND status = ?"
+            where += " AND status = ?"
             params.append(status)
 
-        results = db.execute_query(query, tuple(params))
+        results, total = _search_page("orders", columns, where, params, offset, limit)
 
         if not results:
-            return json.dumps({"success": False, "message": "No orders found matching the criteria."})
+            return ToolResult(False, message="No orders found matching the criteria.")
 
-        return json.dumps({"success": True, "count": len(results), "orders": results})
+        return ToolResult(True, **_page_fields(results, total, offset, "orders", where, params), orders=results)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
-@tool
+@structured_tool
 def search_products(
     product_name: Optional[str] = None,
     category: Optional[str] = None,
-    max_price: Optional[float] = None
-) -> str:
+    max_price: Optional[float] = None,
+    offset: int = 0,
+    limit: int = SEARCH_PAGE_SIZE,
+    fields: Optional[List[str]] = None
+) -> ToolResult:
     """
     Search for products in the catalog. Can filter by name, category, or price.
 
@@ -66,70 +240,112 @@ def search_products(
         product_name: Filter by product name (partial match supported)
         category: Filter by category (e.g., 'Electronics', 'Accessories')
         max_price: Filter by maximum price
+        offset: Number of matching products to skip (use the 'next_offset' of a previous result)
+        limit: Maximum number of products to return (at most 100)
+        fields: Only return these columns (e.g., ['price', 'stock']). One of: id, product_name,
+            description, price, stock, category, created_at
 
     Returns:
         JSON string with matching products or error message
     """
     try:
-        query = "SELECT * FROM products WHERE 1=1"
+        columns = _select_list(fields, PRODUCT_FIELDS, 'product_name')
+        where = "1=1"
         params = []
 
         if product_name:
-            query += " AND product_name LIKE ?"
+            where += " AND product_name LIKE ?"
             params.append(f"%{product_name}%")
 
         if category:
-            query += " AND category = ?"
+            where += " AND category = ?"
             params.append(category)
 
         if max_price:
-            query += " AND price <= ?"
+            where += " AND price <= ?"
             params.append(max_price)
 
-        results = db.execute_query(query, tuple(params))
+        results, total = _search_page("products", columns, where, params, offset, limit)
 
         if not results:
-            return json.dumps({"success": False, "message": "No products found matching the criteria."})
+            return ToolResult(False, message="No products found matching the criteria.")
 
-        return json.dumps({"success": True, "count": len(results), "products": results})
+        return ToolResult(True, **_page_fields(results, total, offset, "products", where, params), products=results)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
+
+
+@structured_tool
+def find_products(query: str, top_k: int = 5) -> ToolResult:
+    """
+    Find products matching a free-text description of what the customer needs
+    (e.g., 'something to keep my desk tidy'), even when no product name or
+    category word appears in it. Use search_products for exact filters.
 
+    Args:
+        query: Natural-language description of the product wanted
+        top_k: Maximum number of products to return (best match first)
 
-@tool
-def get_order_details(order_number: str) -> str:
+    Returns:
+        JSON string with the best matching products and their relevance scores
+    """
+    try:
+        matches = product_vectors.search(query, top_k=max(1, min(top_k, 20)))
+
+        if not matches:
+            return ToolResult(False, message=f"No products found matching '{query}'.")
+
+        names = [name for name, score in matches]
+        rows = db.execute_query(
+            f"SELECT * FROM products WHERE product_name IN ({', '.join('?' * len(names))})",
+            tuple(names)
+        )
+        by_name = {row["product_name"]: row for row in rows}
+        products = [
+            dict(by_name[name], relevance=score) for name, score in matches if name in by_name
+        ]
+
+        return ToolResult(True, count=len(products), total=len(products), offset=0, products=products)
+    except Exception as e:
+        return ToolResult(False, error=str(e))
+
+
+@structured_tool
+def get_order_details(order_number: str, fields: Optional[List[str]] = None) -> ToolResult:
     """
     Get detailed information about a specific order.
 
     Args:
         order_number: The order number to look up (e.g., 'ORD-1001')
+        fields: Only return these columns (e.g., ['status']). One of: id, order_number,
+            customer_name, product_name, quantity, price, status, created_at, updated_at
 
     Returns:
         JSON string with order details or error message
     """
     try:
         results = db.execute_query(
-            "SELECT * FROM orders WHERE order_number = ?",
+            f"SELECT {_select_list(fields, ORDER_FIELDS, 'order_number')} FROM orders WHERE order_number = ?",
             (order_number,)
         )
 
         if not results:
-            return json.dumps({"success": False, "message": f"Order {order_number} not found."})
+            return ToolResult(False, message=f"Order {order_number} not found.")
 
-        return json.dumps({"success": True, "order": results[0]})
+        return ToolResult(True, order=results[0])
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
 # ==================== CREATE OPERATIONS ====================
 
-@tool
+@structured_tool
 def create_order(
     customer_name: str,
     product_name: str,
     quantity: int,
     order_number: Optional[str] = None
-) -> str:
+) -> ToolResult:
     """
     Create a new order in the system. REQUIRES USER CONFIRMATION before execution.
 
@@ -144,30 +360,28 @@ def create_order(
     """
     try:
         # First, check if product exists and get price
-        product_results = db.execute_query(
-            "SELECT * FROM products WHERE product_name = ?",
-            (product_name,)
-        )
+        product = _find_product(product_name)
 
-        if not product_results:
-            return json.dumps({"success": False, "message": f"Product '{product_name}' not found in catalog."})
+        if not product:
+            return _product_not_found(product_name, "not found in catalog")
 
-        product = product_results[0]
+        product_name = product['product_name']
 
         # Check stock availability
         if product['stock'] < quantity:
-            return json.dumps({
-                "success": False,
-                "message": f"Insufficient stock. Only {product['stock']} units available."
-            })
+            return ToolResult(
+                False,
+                message=f"Insufficient stock. Only {product['stock']} units available."
+            )
 
         # Generate order number if not provided
         if not order_number:
-            # Get max order number
-            max_order = db.execute_query("SELECT MAX(order_number) as max_num FROM orders")
+            # Highest order number by value: as text "ORD-9999" sorts after "ORD-10000"
+            max_order = db.execute_query(
+                "SELECT MAX(CAST(SUBSTR(order_number, 5) AS INTEGER)) as max_num FROM orders"
+            )
             if max_order[0]['max_num']:
-                last_num = int(max_order[0]['max_num'].split('-')[1])
-                order_number = f"ORD-{last_num + 1:04d}"
+                order_number = f"ORD-{max_order[0]['max_num'] + 1:04d}"
             else:
                 order_number = "ORD-1001"
 
@@ -178,6 +392,7 @@ def create_order(
             INSERT INTO orders (order_number, customer_name, product_name, quantity, price, status, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (order_number, customer_name, product_name, quantity, product['price'], 'Processing', now, now))
+        db.bump_version("orders")
 
         # Update product stock
         new_stock = product['stock'] - quantity
@@ -185,6 +400,7 @@ def create_order(
             "UPDATE products SET stock = ? WHERE product_name = ?",
             (new_stock, product_name)
         )
+        db.bump_version("products")
 
         # Get the created order
         result = db.execute_query(
@@ -192,23 +408,23 @@ def create_order(
             (order_number,)
         )
 
-        return json.dumps({
-            "success": True,
-            "message": f"Order {order_number} created successfully!",
-            "order": result[0]
-        })
+        return ToolResult(
+            True,
+            message=f"Order {order_number} created successfully!",
+            order=result[0]
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
-@tool
+@structured_tool
 def add_product(
     product_name: str,
     price: float,
     stock: int,
     description: Optional[str] = None,
     category: Optional[str] = None
-) -> str:
+) -> ToolResult:
     """
     Add a new product to the catalog. REQUIRES USER CONFIRMATION before execution.
 
@@ -230,10 +446,10 @@ def add_product(
         )
 
         if existing:
-            return json.dumps({
-                "success": False,
-                "message": f"Product '{product_name}' already exists in the catalog."
-            })
+            return ToolResult(
+                False,
+                message=f"Product '{product_name}' already exists in the catalog."
+            )
 
         now = datetime.now().isoformat()
 
@@ -241,26 +457,28 @@ def add_product(
             INSERT INTO products (product_name, description, price, stock, category, created_at)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (product_name, description or "", price, stock, category or "General", now))
+        db.bump_version("products")
 
         # Get the created product
         result = db.execute_query(
             "SELECT * FROM products WHERE product_name = ?",
             (product_name,)
         )
+        product_vectors.add(result[0])
 
-        return json.dumps({
-            "success": True,
-            "message": f"Product '{product_name}' added successfully!",
-            "product": result[0]
-        })
+        return ToolResult(
+            True,
+            message=f"Product '{product_name}' added successfully!",
+            product=result[0]
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
 # ==================== UPDATE OPERATIONS ====================
 
-@tool
-def update_order_status(order_number: str, new_status: str) -> str:
+@structured_tool
+def update_order_status(order_number: str, new_status: str) -> ToolResult:
     """
     Update the status of an existing order. REQUIRES USER CONFIRMATION before execution.
 
@@ -279,10 +497,10 @@ def update_order_status(order_number: str, new_status: str) -> str:
         )
 
         if not existing:
-            return json.dumps({
-                "success": False,
-                "message": f"Order {order_number} not found."
-            })
+            return ToolResult(
+                False,
+                message=f"Order {order_number} not found."
+            )
 
         now = datetime.now().isoformat()
 
@@ -290,6 +508,7 @@ def update_order_status(order_number: str, new_status: str) -> str:
             "UPDATE orders SET status = ?, updated_at = ? WHERE order_number = ?",
             (new_status, now, order_number)
         )
+        db.bump_version("orders")
 
         # Get updated order
         result = db.execute_query(
@@ -297,17 +516,17 @@ def update_order_status(order_number: str, new_status: str) -> str:
             (order_number,)
         )
 
-        return json.dumps({
-            "success": True,
-            "message": f"Order {order_number} status updated to '{new_status}'.",
-            "order": result[0]
-        })
+        return ToolResult(
+            True,
+            message=f"Order {order_number} status updated to '{new_status}'.",
+            order=result[0]
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
-@tool
-def update_product_price(product_name: str, new_price: float) -> str:
+@structured_tool
+def update_product_price(product_name: str, new_price: float) -> ToolResult:
     """
     Update the price of a product. REQUIRES USER CONFIRMATION before execution.
 
@@ -320,21 +539,18 @@ def update_product_price(product_name: str, new_price: float) -> str:
     """
     try:
         # Check if product exists
-        existing = db.execute_query(
-            "SELECT * FROM products WHERE product_name = ?",
-            (product_name,)
-        )
+        product = _find_product(product_name)
 
-        if not existing:
-            return json.dumps({
-                "success": False,
-                "message": f"Product '{product_name}' not found."
-            })
+        if not product:
+            return _product_not_found(product_name)
+
+        product_name = product['product_name']
 
         db.execute_update(
             "UPDATE products SET price = ? WHERE product_name = ?",
             (new_price, product_name)
         )
+        db.bump_version("products")
 
         # Get updated product
         result = db.execute_query(
@@ -342,17 +558,17 @@ def update_product_price(product_name: str, new_price: float) -> str:
             (product_name,)
         )
 
-        return json.dumps({
-            "success": True,
-            "message": f"Product '{product_name}' price updated to ${new_price:.2f}.",
-            "product": result[0]
-        })
+        return ToolResult(
+            True,
+            message=f"Product '{product_name}' price updated to ${new_price:.2f}.",
+            product=result[0]
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
-@tool
-def update_product_stock(product_name: str, new_stock: int) -> str:
+@structured_tool
+def update_product_stock(product_name: str, new_stock: int) -> ToolResult:
     """
     Update the stock quantity of a product. REQUIRES USER CONFIRMATION before execution.
 
@@ -365,21 +581,18 @@ def update_product_stock(product_name: str, new_stock: int) -> str:
     """
     try:
         # Check if product exists
-        existing = db.execute_query(
-            "SELECT * FROM products WHERE product_name = ?",
-            (product_name,)
-        )
+        product = _find_product(product_name)
 
-        if not existing:
-            return json.dumps({
-                "success": False,
-                "message": f"Product '{product_name}' not found."
-            })
+        if not product:
+            return _product_not_found(product_name)
+
+        product_name = product['product_name']
 
         db.execute_update(
             "UPDATE products SET stock = ? WHERE product_name = ?",
             (new_stock, product_name)
         )
+        db.bump_version("products")
 
         # Get updated product
         result = db.execute_query(
@@ -387,19 +600,19 @@ def update_product_stock(product_name: str, new_stock: int) -> str:
             (product_name,)
         )
 
-        return json.dumps({
-            "success": True,
-            "message": f"Product '{product_name}' stock updated to {new_stock} units.",
-            "product": result[0]
-        })
+        return ToolResult(
+            True,
+            message=f"Product '{product_name}' stock updated to {new_stock} units.",
+            product=result[0]
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
 # ==================== DELETE OPERATIONS ====================
 
-@tool
-def cancel_order(order_number: str) -> str:
+@structured_tool
+def cancel_order(order_number: str) -> ToolResult:
     """
     Cancel an order and restore product stock. REQUIRES USER CONFIRMATION before execution.
 
@@ -417,10 +630,10 @@ def cancel_order(order_number: str) -> str:
         )
 
         if not order_results:
-            return json.dumps({
-                "success": False,
-                "message": f"Order {order_number} not found."
-            })
+            return ToolResult(
+                False,
+                message=f"Order {order_number} not found."
+            )
 
         order = order_results[0]
 
@@ -429,6 +642,7 @@ def cancel_order(order_number: str) -> str:
             "UPDATE products SET stock = stock + ? WHERE product_name = ?",
             (order['quantity'], order['product_name'])
         )
+        db.bump_version("products")
 
         # Update order status to Cancelled instead of deleting
         now = datetime.now().isoformat()
@@ -436,17 +650,18 @@ def cancel_order(order_number: str) -> str:
             "UPDATE orders SET status = 'Cancelled', updated_at = ? WHERE order_number = ?",
             (now, order_number)
         )
+        db.bump_version("orders")
 
-        return json.dumps({
-            "success": True,
-            "message": f"Order {order_number} has been cancelled. Stock restored."
-        })
+        return ToolResult(
+            True,
+            message=f"Order {order_number} has been cancelled. Stock restored."
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
 
 
-@tool
-def delete_product(product_name: str) -> str:
+@structured_tool
+def delete_product(product_name: str) -> ToolResult:
     """
     Remove a product from the catalog. REQUIRES USER CONFIRMATION before execution.
     WARNING: This will permanently delete the product.
@@ -459,16 +674,12 @@ def delete_product(product_name: str) -> str:
     """
     try:
         # Check if product exists
-        existing = db.execute_query(
-            "SELECT * FROM products WHERE product_name = ?",
-            (product_name,)
-        )
+        product = _find_product(product_name)
 
-        if not existing:
-            return json.dumps({
-                "success": False,
-                "message": f"Product '{product_name}' not found."
-            })
+        if not product:
+            return _product_not_found(product_name)
+
+        product_name = product['product_name']
 
         # Check if there are active orders for this product
         active_orders = db.execute_query(
@@ -477,28 +688,199 @@ def delete_product(product_name: str) -> str:
         )
 
         if active_orders[0]['count'] > 0:
-            return json.dumps({
-                "success": False,
-                "message": f"Cannot delete '{product_name}'. There are {active_orders[0]['count']} active orders for this product."
-            })
+            return ToolResult(
+                False,
+                message=f"Cannot delete '{product_name}'. There are {active_orders[0]['count']} active orders for this product."
+            )
 
         db.execute_update(
             "DELETE FROM products WHERE product_name = ?",
             (product_name,)
         )
+        db.bump_version("products")
+        product_vectors.remove(product_name)
 
-        return json.dumps({
-            "success": True,
-            "message": f"Product '{product_name}' has been removed from the catalog."
-        })
+        return ToolResult(
+            True,
+            message=f"Product '{product_name}' has been removed from the catalog."
+        )
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return ToolResult(False, error=str(e))
+
+
+# ==================== BULK OPERATIONS ====================
+
+def _bulk_order_filter(order_numbers: Optional[List[str]], current_status: Optional[str]) -> tuple:
+    """Build the WHERE clause shared by bulk order updates and their preview."""
+    if not order_numbers and not current_status:
+        raise ValueError("Provide order_numbers and/or current_status to select the orders to update.")
+
+    where = "1=1"
+    params: List[Any] = []
+
+    if order_numbers:
+        where += f" AND order_number IN ({', '.join('?' * len(order_numbers))})"
+        params.extend(order_numbers)
+
+    if current_status:
+        where += " AND status = ?"
+        params.append(current_status)
+
+    return where, params
+
+
+def _bulk_product_filter(product_names: Optional[List[str]], category: Optional[str]) -> tuple:
+    """Build the WHERE clause shared by bulk product updates and their preview."""
+    if not product_names and not category:
+        raise ValueError("Provide product_names and/or category to select the products to update.")
+
+    where = "1=1"
+    params: List[Any] = []
+
+    if product_names:
+        where += f" AND product_name IN ({', '.join('?' * len(product_names))})"
+        params.extend(product_names)
+
+    if category:
+        where += " AND category = ?"
+        params.append(category)
+
+    return where, params
+
+
+@structured_tool
+def bulk_update_order_status(
+    new_status: str,
+    order_numbers: Optional[List[str]] = None,
+    current_status: Optional[str] = None
+) -> ToolResult:
+    """
+    Update the status of many orders at once in a single transaction. REQUIRES USER CONFIRMATION before execution.
+    Use this instead of calling update_order_status repeatedly.
+
+    Args:
+        new_status: New status (e.g., 'Processing', 'Shipped', 'Delivered'). Not 'Cancelled':
+            cancel orders with cancel_order, which also restores their stock
+        order_numbers: Order numbers to update (e.g., ['ORD-1001', 'ORD-1002'])
+        current_status: Only update orders currently in this status (e.g., 'Processing')
+
+    Returns:
+        JSON string with the number of updated orders or error message
+    """
+    try:
+        if new_status.strip().lower() in ("cancelled", "canceled"):
+            # A status change alone would leave the ordered units out of stock
+            return ToolResult(
+                False,
+                message="Orders can't be cancelled with a status update. "
+                        "Use cancel_order for each order so its stock is restored."
+            )
+
+        where, params = _bulk_order_filter(order_numbers, current_status)
+        now = datetime.now().isoformat()
+
+        affected = db.execute_update(
+            f"UPDATE orders SET status = ?, updated_at = ? WHERE {where}",
+            (new_status, now, *params)
+        )
+
+        if affected == 0:
+            return ToolResult(False, message="No orders matched the selection. Nothing was updated.")
+
+        db.bump_version("orders")
+        message = f"{affected} order(s) updated to '{new_status}'."
+
+        if order_numbers and affected < len(set(order_numbers)):
+            found = db.execute_query(
+                f"SELECT order_number FROM orders WHERE order_number IN ({', '.join('?' * len(order_numbers))})",
+                tuple(order_numbers)
+            )
+            missing = sorted(set(order_numbers) - {row['order_number'] for row in found})
+            if missing:
+                message += f" Not found: {', '.join(missing)}."
+
+        return ToolResult(True, message=message, affected=affected)
+    except Exception as e:
+        return ToolResult(False, error=str(e))
+
+
+@structured_tool
+def bulk_update_product_price(
+    percent_change: float,
+    product_names: Optional[List[str]] = None,
+    category: Optional[str] = None
+) -> ToolResult:
+    """
+    Change the price of many products by a percentage in a single transaction. REQUIRES USER CONFIRMATION before execution.
+    Use this instead of calling update_product_price repeatedly.
+
+    Args:
+        percent_change: Percentage to change prices by (e.g., -10 for a 10% discount, 5 for a 5% increase)
+        product_names: Names of the products to reprice
+        category: Reprice every product in this category (e.g., 'Accessories')
+
+    Returns:
+        JSON string with the number of repriced products or error message
+    """
+    try:
+        if percent_change <= -100:
+            return ToolResult(False, message="Price change must be greater than -100%.")
+
+        where, params = _bulk_product_filter(product_names, category)
+
+        affected = db.execute_update(
+            f"UPDATE products SET price = ROUND(price * (1 + ? / 100.0), 2) WHERE {where}",
+            (percent_change, *params)
+        )
+
+        if affected == 0:
+            return ToolResult(False, message="No products matched the selection. Nothing was updated.")
+
+        db.bump_version("products")
+
+        message = f"{affected} product price(s) changed by {percent_change:+g}%."
+
+        if product_names and affected < len(set(product_names)):
+            found = db.execute_query(
+                f"SELECT product_name FROM products WHERE product_name IN ({', '.join('?' * len(product_names))})",
+                tuple(product_names)
+            )
+            missing = sorted(set(product_names) - {row['product_name'] for row in found})
+            if missing:
+                message += f" Not found: {', '.join(missing)}."
+
+        return ToolResult(True, message=message, affected=affected)
+    except Exception as e:
+        return ToolResult(False, error=str(e))
+
+
+def preview_affected_rows(tool_name: str, tool_args: Dict[str, Any]) -> Optional[int]:
+    """
+    Count the rows a bulk tool call would modify, for its confirmation message.
+
+    Returns None for tools that are not bulk operations or invalid selections.
+    """
+    try:
+        if tool_name == "bulk_update_order_status":
+            where, params = _bulk_order_filter(tool_args.get("order_numbers"), tool_args.get("current_status"))
+            table = "orders"
+        elif tool_name == "bulk_update_product_price":
+            where, params = _bulk_product_filter(tool_args.get("product_names"), tool_args.get("category"))
+            table = "products"
+        else:
+            return None
+
+        result = db.execute_query(f"SELECT COUNT(*) as count FROM {table} WHERE {where}", tuple(params))
+        return result[0]['count']
+    except Exception:
+        return None
 
 
 # Export all tools
 ALL_TOOLS = [
     search_orders,
     search_products,
+    find_products,
     get_order_details,
     create_order,
     add_product,
@@ -507,4 +889,104 @@ ALL_TOOLS = [
     update_product_stock,
     cancel_order,
     delete_product,
-]
\ No newline at end of file
+    bulk_update_order_status,
+    bulk_update_product_price,
+]
+
+# Tools that only read data run immediately; everything else needs confirmation
+READ_TOOL_NAMES = ("search_orders", "search_products", "find_products", "get_order_details")
+DESTRUCTIVE_TOOL_NAMES = tuple(t.name for t in ALL_TOOLS if t.name not in READ_TOOL_NAMES)
+
+TOOLS_BY_NAME = {t.name: t for t in ALL_TOOLS}
+
+# Tools bound to the LLM per detected intent. Mutations usually need a lookup
+# first ("cancel my latest order"), so their subsets include the read tools.
+READ_TOOLS = [TOOLS_BY_NAME[name] for name in READ_TOOL_NAMES]
+TOOLS_BY_INTENT = {
+    "READ": READ_TOOLS,
+    "CREATE": READ_TOOLS + [create_order, add_product],
+    "UPDATE": READ_TOOLS + [
+        update_order_status, update_product_price, update_product_stock,
+        bulk_update_order_status, bulk_update_product_price
+    ],
+    "DELETE": READ_TOOLS + [cancel_order, delete_product],
+    # Small talk often turns into a question about the data
+    "GENERAL": READ_TOOLS,
+}
+
+# Verbs asking for each kind of change. A message using one outside its
+# predicted intent ("show my orders and cancel the last one") gets every tool.
+MUTATION_VERBS = {
+    "CREATE": re.compile(r"\b(create|place|add|buy|purchase)\b"),
+    "UPDATE": re.compile(r"\b(update|change|set|mark|raise|lower|increase|decrease|reduce|restock|ship)\b"),
+    "DELETE": re.compile(r"\b(cancel|remove|delete|discontinue)\b"),
+}
+
+
+def tools_for_intent(intent: Optional[str]) -> list:
+    """Tools to bind for an intent; every tool when the intent is unknown."""
+    return TOOLS_BY_INTENT.get(intent, ALL_TOOLS)
+
+
+def tools_for_turn(intent: Optional[str], message: str, previous_turn_used_tools: bool = False) -> list:
+    """
+    Tools to bind for a turn: the intent's subset unless it may not cover it.
+
+    Every tool is bound when the message asks for a change outside the
+    intent, and after a turn that used tools, since the message may follow
+    up on its results ("now cancel the second one").
+    """
+    if previous_turn_used_tools:
+        return ALL_TOOLS
+    text = message.lower()
+    if any(other != intent and pattern.search(text) for other, pattern in MUTATION_VERBS.items()):
+        return ALL_TOOLS
+    return tools_for_intent(intent)
+
+
+def invoke_structured(tool_name: str, tool_args: Dict[str, Any]) -> ToolResult:
+    """
+    Run a tool in-process and return its ToolResult.
+
+    Arguments are validated against the tool's schema, exactly as tool.invoke()
+    would, but the result is never serialized to JSON.
+    """
+    if tool_name not in TOOLS_BY_NAME:
+        return ToolResult(False, error=f"Tool '{tool_name}' not found.")
+
+    start = time.monotonic()
+    validated = TOOLS_BY_NAME[tool_name].args_schema.model_validate(tool_args)
+    result = STRUCTURED_TOOLS[tool_name](**validated.model_dump())
+    record_tool(tool_name, time.monotonic() - start, result.success)
+    return result
+
+
+# Upper bound on tool calls from one LLM response that run at the same time
+MAX_CONCURRENT_TOOL_CALLS = 4
+
+
+async def ainvoke_structured(tool_name: str, tool_args: Dict[str, Any]) -> ToolResult:
+    """Run a tool in a worker thread so several calls can overlap."""
+    return await asyncio.to_thread(invoke_structured, tool_name, tool_args)
+
+
+async def ainvoke_structured_batch(
+    tool_calls: List[Dict[str, Any]],
+    max_concurrency: int = MAX_CONCURRENT_TOOL_CALLS
+) -> List[ToolResult]:
+    """
+    Run several tool calls concurrently and return their results in call order.
+
+    Each call is a dict with 'name' and 'args' (the shape of AIMessage.tool_calls).
+    A failing call yields an error ToolResult instead of failing the batch.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(call):
+        async with semaphore:
+            try:
+                return await ainvoke_structured(call["name"], call["args"])
+            except Exception as e:
+                return ToolResult(False, error=str(e))
+
+    return list(await asyncio.gather(*(run(call) for call in tool_calls)))